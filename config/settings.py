@@ -49,7 +49,10 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.tenancy.ProjectMiddleware',
+    'core.replica.ReplicaStickinessMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_htmx.middleware.HtmxMiddleware',
 ]
@@ -67,6 +70,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'core.tenancy.project_context',
             ],
         },
     },
@@ -86,6 +90,109 @@ DATABASES = {
 }
 
 
+# Per-project databases (core.tenancy)
+# Each Project's data lives in PROJECT_DATABASE_DIR/<slug>.sqlite3, created when the
+# project is added in the admin (or by `manage.py migrate_projects`). To keep a project
+# elsewhere, e.g. in its own PostgreSQL schema, add a 'project_<slug>' entry to DATABASES.
+# 'default' holds the project registry, users and sessions, and the shared workspace.
+
+DATABASE_ROUTERS = ['core.tenancy.ProjectRouter']
+PROJECT_DATABASE_DIR = BASE_DIR / 'projects'
+
+
+# Read replicas (core.replica)
+# Views marked @replica_reads read core models from '<alias>_replica'. For SQLite that is
+# a copy under READ_REPLICA_DIR, refreshed with the online backup API at most every
+# READ_REPLICA_REFRESH seconds (only after the primary changed) by whichever worker process
+# holds the lock file next to it; in-memory databases get none. On PostgreSQL, add a
+# '<alias>_replica' DATABASES entry for the streaming standby instead. A client that
+# wrote reads the primary for READ_REPLICA_STICKY seconds, which must cover the lag.
+
+READ_REPLICA_ENABLED = True
+READ_REPLICA_DIR = BASE_DIR / 'replicas'
+READ_REPLICA_REFRESH = 2.0  # seconds
+READ_REPLICA_STICKY = 10  # seconds
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+# Holds per-row table fragments (keyed by equipment id and row_version), so the
+# entry cap must comfortably exceed the number of stations. Keys include the
+# current project's database alias, so projects never see each other's rows.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'KEY_FUNCTION': 'core.tenancy.make_cache_key',
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    }
+}
+
+
+# Device reachability sweep (core.network.sweep_devices)
+# TCP ports tried per device: S7comm (102), HTTP (80), Modbus/TCP (502).
+# A refused connection still counts as online - the host answered.
+
+DEVICE_SWEEP_PORTS = [102, 80, 502]
+DEVICE_SWEEP_TIMEOUT = 1.0  # seconds per host
+DEVICE_SWEEP_CONCURRENCY = 100
+
+
+# Dashboard KPI summary (core.kpi)
+# Writes schedule a rebuild this many seconds later; a burst of writes triggers one rebuild.
+
+KPI_REFRESH_DELAY = 2.0
+
+# Checklist failure analytics (core.analytics)
+# Cached per validation data version, which moves with every result change; the timeout
+# only bounds how long renamed stations or checklist items keep their old labels.
+VALIDATION_ANALYTICS_CACHE_TIMEOUT = 3600
+
+
+# Document delivery (core.files.serve_file)
+# Set SENDFILE_HEADER to 'X-Sendfile' (Apache mod_xsendfile, lighttpd) or 'X-Accel-Redirect' (nginx)
+# to let the front web server stream documents. For nginx, add an `internal` location at
+# SENDFILE_URL_PREFIX that aliases SENDFILE_ROOT; files outside it are still served by Django.
+
+SENDFILE_HEADER = None
+SENDFILE_ROOT = BASE_DIR / 'static' / 'documents'
+SENDFILE_URL_PREFIX = '/protected/documents/'
+
+
+# Project document uploads (core.documents)
+# Uploads stream to a temp file beside the document and are renamed into place;
+# the replaced file is kept under versions/. First-page previews need PyMuPDF or
+# poppler's pdftoppm on PATH - without either the page simply shows no thumbnail.
+
+PROJECT_DOCUMENT_MAX_SIZE = 25 * 1024 * 1024  # bytes
+PROJECT_DOCUMENT_VERSIONS_KEPT = 10
+
+
+# Profiling and slow-query log (core.profiling)
+# Staff add ?profile=1 (or an X-Profile: 1 header) to any request to save a cProfile dump
+# to PROFILE_DIR; browse them at /profiles/. Every query slower than SLOW_QUERY_THRESHOLD,
+# and any SQL one request runs REPEATED_QUERY_THRESHOLD times (an N+1 loop), is logged
+# to 'core.profiling' with its view and the application frames that issued it.
+
+PROFILE_DIR = BASE_DIR / 'profiles'
+PROFILES_KEPT = 50
+SLOW_QUERY_THRESHOLD = 0.1  # seconds
+REPEATED_QUERY_THRESHOLD = 20
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.profiling': {'handlers': ['console'], 'level': 'WARNING', 'propagate': False},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
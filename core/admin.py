@@ -1,36 +1,237 @@
 from django.contrib import admin
-from .models import Equipment, ValidationCategory, ValidationChecklistItem, ValidationResult, EquipmentDevice
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+from django.utils.html import format_html
+from .models import (
+    BomItem, BomItemVariant, DocHistoryItem, DocumentationCategory, DocumentationChecklistItem,
+    DocumentationResult, Equipment, EquipmentDevice, KpiSummary, Project, ValidationCategory,
+    ValidationChecklistItem, ValidationEvent, ValidationResult, ValidationSnapshot, Variant,
+)
+from . import kpi
+from .tenancy import PROJECT_PARAM, copy_catalogs, migrate_project, register_database
+
+
+# Below this many rows an exact COUNT(*) is cheap enough
+ESTIMATED_COUNT_MIN = 10000
+
+
+def estimated_row_count(queryset):
+    """Row count of the queryset's table without scanning it, or None if the backend can't tell.
+
+    SQLite: the rowid span (two index seeks), exact until rows are deleted and
+    an over-estimate after. PostgreSQL: the planner's pg_class.reltuples.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"SELECT MAX(rowid) - MIN(rowid) + 1 FROM {connection.ops.quote_name(table)}")
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        else:
+            return None
+        row = cursor.fetchone()
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Counts unfiltered changelists of large tables from statistics instead of a full COUNT(*)."""
+
+    @cached_property
+    def count(self):
+        query = self.object_list.query
+        if not query.where and not query.distinct:
+            estimate = estimated_row_count(self.object_list)
+            if estimate is not None and estimate >= ESTIMATED_COUNT_MIN:
+                return estimate
+        return super().count
+
+
+class CoreModelAdmin(admin.ModelAdmin):
+    """Changelists in a constant number of queries, however many rows the table holds."""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False  # no second COUNT(*) when a filter is active
+
+
+class ReadOnlyAdmin(CoreModelAdmin):
+    """For rows only the application writes (audit log, materialized KPIs)."""
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Project)
+class ProjectAdmin(admin.ModelAdmin):
+    """Lists every project with counts read from its own database; the other admins show the selected one."""
+    list_display = ['name', 'slug', 'is_archived', 'station_count', 'bom_item_count', 'open_link']
+    list_filter = ['is_archived']
+    search_fields = ['name', 'slug']
+    prepopulated_fields = {'slug': ['name']}
+
+    def get_readonly_fields(self, request, obj=None):
+        return ['slug'] if obj else []  # the slug names the database file
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if not change:
+            migrate_project(obj)
+            copy_catalogs(obj)
+
+    @admin.display(description="Stations")
+    def station_count(self, obj):
+        return Equipment.objects.using(register_database(obj)).count()
+
+    @admin.display(description="BOM items")
+    def bom_item_count(self, obj):
+        return BomItem.objects.using(register_database(obj)).count()
+
+    @admin.display(description="")
+    def open_link(self, obj):
+        return format_html('<a href="/?{}={}">Open</a>', PROJECT_PARAM, obj.slug)
 
 
 @admin.register(Equipment)
-class EquipmentAdmin(admin.ModelAdmin):
+class EquipmentAdmin(CoreModelAdmin):
     list_display = ['station', 'owner', 'eq_number', 'power_supply']
     list_filter = ['owner']
     search_fields = ['station', 'eq_number']
 
 
 @admin.register(ValidationCategory)
-class ValidationCategoryAdmin(admin.ModelAdmin):
+class ValidationCategoryAdmin(CoreModelAdmin):
     list_display = ['code', 'title', 'order']
     ordering = ['order']
 
 
 @admin.register(ValidationChecklistItem)
-class ValidationChecklistItemAdmin(admin.ModelAdmin):
+class ValidationChecklistItemAdmin(CoreModelAdmin):
     list_display = ['category', 'ref_iatf', 'ref_vda', 'order']
     list_filter = ['category']
+    list_select_related = ['category']
+    search_fields = ['ref_iatf', 'ref_vda', 'test']
     ordering = ['category__order', 'order']
 
 
+# Result and device changelists filter by station through search: a station
+# list filter would load every Equipment row on each page view.
+
 @admin.register(ValidationResult)
-class ValidationResultAdmin(admin.ModelAdmin):
+class ValidationResultAdmin(CoreModelAdmin):
     list_display = ['equipment', 'checklist_item', 'status', 'validated_at']
-    list_filter = ['status', 'equipment']
+    list_filter = ['status']
+    list_select_related = ['equipment', 'checklist_item__category']
     search_fields = ['equipment__station']
+    autocomplete_fields = ['equipment', 'checklist_item']
+    ordering = ['-id']  # primary key order: a page is an index range, not a sort of the whole table
 
 
 @admin.register(EquipmentDevice)
-class EquipmentDeviceAdmin(admin.ModelAdmin):
+class EquipmentDeviceAdmin(CoreModelAdmin):
     list_display = ['equipment', 'device_type', 'name', 'ip_address']
-    list_filter = ['device_type', 'equipment']
-    search_fields = ['name', 'ip_address']
+    list_select_related = ['equipment']
+    # device_type is free text: a list filter would run a DISTINCT over every device per page view
+    search_fields = ['name', 'ip_address', 'device_type', 'equipment__station']
+    autocomplete_fields = ['equipment']
+
+
+@admin.register(DocumentationCategory)
+class DocumentationCategoryAdmin(CoreModelAdmin):
+    list_display = ['code', 'title_key', 'order', 'is_highlighted']
+    ordering = ['order']
+
+
+@admin.register(DocumentationChecklistItem)
+class DocumentationChecklistItemAdmin(CoreModelAdmin):
+    list_display = ['category', 'item_key', 'order']
+    list_filter = ['category']
+    list_select_related = ['category']
+    search_fields = ['item_key']
+
+
+@admin.register(DocumentationResult)
+class DocumentationResultAdmin(CoreModelAdmin):
+    list_display = ['equipment', 'checklist_item', 'is_checked', 'updated_at']
+    list_filter = ['is_checked']
+    list_select_related = ['equipment', 'checklist_item__category']
+    search_fields = ['equipment__station']
+    autocomplete_fields = ['equipment', 'checklist_item']
+    ordering = ['-id']
+
+
+@admin.register(ValidationEvent)
+class ValidationEventAdmin(ReadOnlyAdmin):
+    list_display = ['created_at', 'equipment_id', 'kind', 'item_id', 'value']
+    list_filter = ['kind']
+    search_fields = ['=equipment__id']
+    ordering = ['-id']
+
+
+@admin.register(ValidationSnapshot)
+class ValidationSnapshotAdmin(ReadOnlyAdmin):
+    list_display = ['taken_at', 'equipment_id', 'last_event_id']
+    search_fields = ['=equipment__id']
+    ordering = ['-id']
+    exclude = ['state']  # can be large; replay it with core.audit.state_at instead
+
+
+class KpiMetricFilter(admin.SimpleListFilter):
+    """The metrics core.kpi writes, listed without a DISTINCT over the table."""
+    title = 'metric'
+    parameter_name = 'metric'
+
+    def lookups(self, request, model_admin):
+        return [(metric, metric) for metric in kpi.METRICS]
+
+    def queryset(self, request, queryset):
+        return queryset.filter(metric=self.value()) if self.value() else queryset
+
+
+@admin.register(KpiSummary)
+class KpiSummaryAdmin(ReadOnlyAdmin):
+    list_display = ['metric', 'label', 'value', 'total', 'refreshed_at']
+    list_filter = [KpiMetricFilter]
+
+
+@admin.register(Variant)
+class VariantAdmin(CoreModelAdmin):
+    list_display = ['name', 'color', 'order', 'planned_volume']
+    list_editable = ['planned_volume']
+    search_fields = ['name']
+
+
+class BomItemVariantInline(admin.TabularInline):
+    model = BomItemVariant
+    extra = 0
+    autocomplete_fields = ['variant']
+
+
+@admin.register(BomItem)
+class BomItemAdmin(CoreModelAdmin):
+    list_display = ['part_number', 'equipment', 'description', 'quantity', 'order']
+    list_select_related = ['equipment']
+    search_fields = ['part_number', 'description', 'equipment__station']
+    autocomplete_fields = ['equipment']
+    inlines = [BomItemVariantInline]
+
+
+@admin.register(BomItemVariant)
+class BomItemVariantAdmin(CoreModelAdmin):
+    list_display = ['bom_item', 'variant', 'is_applicable']
+    list_filter = ['is_applicable', 'variant']
+    list_select_related = ['bom_item__equipment', 'variant']
+    search_fields = ['bom_item__part_number']
+    autocomplete_fields = ['bom_item', 'variant']
+    ordering = ['-id']
+
+
+@admin.register(DocHistoryItem)
+class DocHistoryItemAdmin(CoreModelAdmin):
+    list_display = ['version', 'register', 'created_by', 'date_created', 'released_by', 'date_released']
+    search_fields = ['version', 'register', 'changes']
@@ -0,0 +1,151 @@
+"""Checklist failure analytics across the plant: NOK rates and time-to-OK per item, grouped results.
+
+Everything is SQL aggregates: counts over ValidationResult for the current
+picture, and over the ValidationEvent audit log for how long NOK findings
+took to be fixed. The result is cached under the validation data version, so
+it is computed once per change to the results or stations rather than once per
+request.
+"""
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count, Max, Q, Sum
+from django.utils import timezone
+
+from .models import Equipment, ValidationChecklistItem, ValidationEvent, ValidationResult
+
+
+CACHE_KEY_PREFIX = 'validation-analytics'
+
+_compute_lock = threading.Lock()
+
+
+def validation_data_version():
+    """Changes whenever a validation result or a station is added, changed or removed (two aggregate queries).
+
+    Stations count through their number, names and owners; every save bumps
+    Equipment.row_version, so its sum moves with any change to them.
+    """
+    stats = ValidationResult.objects.aggregate(count=Count('id'), last_id=Max('id'), changed=Max('validated_at'))
+    changed = stats['changed'].timestamp() if stats['changed'] else 0
+    stations = Equipment.objects.aggregate(count=Count('id'), last_id=Max('id'), versions=Sum('row_version'))
+    return (
+        f"{stats['count']}.{stats['last_id'] or 0}.{changed:.6f}"
+        f"-{stations['count']}.{stations['last_id'] or 0}.{stations['versions'] or 0}"
+    )
+
+
+def failure_analytics():
+    """The analytics for the current data version, from the cache or computed (once) now."""
+    version = validation_data_version()
+    key = f'{CACHE_KEY_PREFIX}:{version}'
+    analytics = cache.get(key)
+    if analytics is None:
+        with _compute_lock:  # concurrent misses wait for the first computation instead of repeating it
+            analytics = cache.get(key)
+            if analytics is None:
+                analytics = dict(compute_failure_analytics(), version=version)
+                cache.set(key, analytics, settings.VALIDATION_ANALYTICS_CACHE_TIMEOUT)
+    return analytics
+
+
+def _rate(nok, ok):
+    return round(nok / (ok + nok), 4) if ok + nok else 0.0
+
+
+def _group(results, key_field, label_field=None):
+    label_field = label_field or key_field
+    groups = results.values(*{key_field: None, label_field: None}).annotate(
+        ok=Count('id', filter=Q(status='OK')),
+        nok=Count('id', filter=Q(status='NOK')),
+    ).order_by()
+    rows = [
+        {'key': group[key_field], 'label': group[label_field] or '—', 'ok': group['ok'], 'nok': group['nok'],
+         'nok_rate': _rate(group['nok'], group['ok'])}
+        for group in groups
+    ]
+    return sorted(rows, key=lambda row: (-row['nok_rate'], -row['nok'], str(row['label'])))
+
+
+def compute_failure_analytics():
+    """Item rankings and per category/owner/station groups (a handful of aggregate queries)."""
+    station_count = Equipment.objects.count()
+    items = ValidationChecklistItem.objects.annotate(
+        ok=Count('results', filter=Q(results__status='OK')),
+        nok=Count('results', filter=Q(results__status='NOK')),
+    ).values_list('id', 'category__code', 'order', 'test', 'ok', 'nok')
+    nok_recorded = dict(
+        ValidationEvent.objects.filter(kind=ValidationEvent.KIND_VALIDATION, value=False)
+        .values_list('item_id').annotate(count=Count('id')).order_by()
+    )
+    fixes = time_to_ok()
+    rows = []
+    for item_id, code, order, test, ok, nok in items:
+        fixed, average, longest = fixes.get(item_id, (0, None, None))
+        rows.append({
+            'id': item_id,
+            'label': f'{code}_{order}',
+            'test': test,
+            'ok': ok,
+            'nok': nok,
+            'missing': station_count - ok - nok,
+            'nok_rate': _rate(nok, ok),
+            'nok_recorded': nok_recorded.get(item_id, 0),
+            'fixed': fixed,
+            'avg_hours_to_ok': round(average / 3600, 2) if average is not None else None,
+            'max_hours_to_ok': round(longest / 3600, 2) if longest is not None else None,
+        })
+
+    results = ValidationResult.objects.all()
+    return {
+        'computed_at': timezone.now().isoformat(),
+        'stations': station_count,
+        'items_by_nok_rate': sorted(rows, key=lambda row: (-row['nok_rate'], -row['nok_recorded'], row['label'])),
+        'items_by_time_to_ok': sorted(
+            (row for row in rows if row['fixed']), key=lambda row: (-row['avg_hours_to_ok'], row['label']),
+        ),
+        'by_category': _group(results, 'checklist_item__category_id', 'checklist_item__category__title'),
+        'by_owner': _group(results, 'equipment__owner'),
+        'by_station': _group(results, 'equipment_id', 'equipment__station'),
+    }
+
+
+def time_to_ok():
+    """{item id: (fixes, average seconds, longest seconds)} from the audit log.
+
+    A fix is the first OK recorded for a station and item after its first NOK;
+    stations deleted since are left out. Backends other than SQLite and
+    PostgreSQL get an empty result.
+    """
+    connection = connections[ValidationEvent.objects.db]
+    if connection.vendor == 'sqlite':
+        seconds = '(julianday(fix.ok_at) - julianday(fix.first_nok)) * 86400.0'
+    elif connection.vendor == 'postgresql':
+        seconds = 'EXTRACT(EPOCH FROM fix.ok_at - fix.first_nok)'
+    else:
+        return {}
+    events = connection.ops.quote_name(ValidationEvent._meta.db_table)
+    equipment = connection.ops.quote_name(Equipment._meta.db_table)
+    sql = f"""
+        SELECT fix.item_id, COUNT(*), AVG({seconds}), MAX({seconds})
+        FROM (
+            SELECT nok.equipment_id, nok.item_id, nok.first_nok, MIN(ok.created_at) AS ok_at
+            FROM (
+                SELECT equipment_id, item_id, MIN(created_at) AS first_nok
+                FROM {events}
+                WHERE kind = %s AND value = %s
+                GROUP BY equipment_id, item_id
+            ) nok
+            JOIN {equipment} station ON station.id = nok.equipment_id
+            JOIN {events} ok ON ok.equipment_id = nok.equipment_id AND ok.item_id = nok.item_id
+                AND ok.kind = %s AND ok.value = %s AND ok.created_at > nok.first_nok
+            GROUP BY nok.equipment_id, nok.item_id, nok.first_nok
+        ) fix
+        GROUP BY fix.item_id
+    """
+    kind = ValidationEvent.KIND_VALIDATION
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [kind, False, kind, True])
+        return {item_id: (fixes, average, longest) for item_id, fixes, average, longest in cursor.fetchall()}
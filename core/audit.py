@@ -0,0 +1,128 @@
+"""Append-only validation audit log: recording events and replaying state at a point in time."""
+from datetime import timedelta
+
+from django.db.models import OuterRef, PositiveBigIntegerField, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import ValidationEvent, ValidationSnapshot
+from .tenancy import atomic
+
+
+# A snapshot is written once an equipment has this many events after its latest one,
+# so any point-in-time read replays at most SNAPSHOT_INTERVAL events.
+SNAPSHOT_INTERVAL = 50
+
+KIND_VALIDATION = ValidationEvent.KIND_VALIDATION
+KIND_DOCUMENTATION = ValidationEvent.KIND_DOCUMENTATION
+
+
+def empty_state():
+    return {KIND_VALIDATION: {}, KIND_DOCUMENTATION: {}}
+
+
+def _load_state(snapshot):
+    """Snapshot JSON (string keys) -> {kind: {item_id: bool}}."""
+    state = empty_state()
+    if snapshot is not None:
+        for kind, items in snapshot.state.items():
+            state[kind] = {int(item_id): value for item_id, value in items.items()}
+    return state
+
+
+def _apply(state, event):
+    state[event.kind][event.item_id] = event.value
+
+
+@atomic(savepoint=False)  # callers' transactions roll back as a whole anyway
+def record_event(equipment_id, kind, item_id, value):
+    """Append one state change; writes a snapshot every SNAPSHOT_INTERVAL events per equipment."""
+    event = ValidationEvent.objects.create(equipment_id=equipment_id, kind=kind, item_id=item_id, value=value)
+    snapshot = latest_snapshot(equipment_id)
+    pending = list(
+        ValidationEvent.objects.filter(
+            equipment_id=equipment_id, id__gt=snapshot.last_event_id if snapshot else 0
+        ).order_by('id')[:SNAPSHOT_INTERVAL]
+    )
+    if len(pending) >= SNAPSHOT_INTERVAL:
+        state = _load_state(snapshot)
+        for pending_event in pending:
+            _apply(state, pending_event)
+        ValidationSnapshot.objects.create(
+            equipment_id=equipment_id,
+            last_event_id=pending[-1].id,
+            taken_at=pending[-1].created_at,
+            state=state,
+        )
+    return event
+
+
+def latest_snapshot(equipment_id, at=None):
+    snapshots = ValidationSnapshot.objects.filter(equipment_id=equipment_id)
+    if at is not None:
+        snapshots = snapshots.filter(taken_at__lte=at)
+    return snapshots.order_by('-last_event_id').first()
+
+
+def _newest_snapshot(at, field='id'):
+    """Subquery: `field` of the newest snapshot taken by `at` of the outer row's equipment."""
+    return Subquery(
+        ValidationSnapshot.objects.filter(equipment_id=OuterRef('equipment_id'), taken_at__lte=at)
+        .order_by('-last_event_id').values(field)[:1]
+    )
+
+
+def state_at(equipment_id, at):
+    """Validation/documentation state of one equipment as of `at`: one snapshot read + bounded replay."""
+    snapshot = latest_snapshot(equipment_id, at)
+    state = _load_state(snapshot)
+    events = ValidationEvent.objects.filter(
+        equipment_id=equipment_id,
+        id__gt=snapshot.last_event_id if snapshot else 0,
+        created_at__lte=at,
+    ).order_by('id')
+    for event in events:
+        _apply(state, event)
+    return state
+
+
+def progress_series(start, end, step=timedelta(days=1), equipment_ids=None):
+    """Line-wide totals sampled every `step` from `start` to `end`.
+
+    Returns a list of (timestamp, validation OK count, documentation checked
+    count). Each equipment starts from its newest snapshot before `start` and
+    only the events after that snapshot are read, replayed once, in order, in
+    a single pass: fewer than SNAPSHOT_INTERVAL per equipment before `start`,
+    then those of the window, however long the history.
+    """
+    snapshots = ValidationSnapshot.objects.filter(taken_at__lte=start, id=_newest_snapshot(start))
+    events = ValidationEvent.objects.filter(
+        created_at__lte=end,
+        id__gt=Coalesce(_newest_snapshot(start, 'last_event_id'), 0, output_field=PositiveBigIntegerField()),
+    ).order_by('id')
+    if equipment_ids is not None:
+        snapshots = snapshots.filter(equipment_id__in=equipment_ids)
+        events = events.filter(equipment_id__in=equipment_ids)
+
+    states = {snapshot.equipment_id: _load_state(snapshot) for snapshot in snapshots}
+
+    ok_count = sum(sum(state[KIND_VALIDATION].values()) for state in states.values())
+    checked_count = sum(sum(state[KIND_DOCUMENTATION].values()) for state in states.values())
+    series = []
+    sample_at = start
+    for event in events.iterator(chunk_size=2000):
+        while event.created_at > sample_at and sample_at <= end:
+            series.append((sample_at, ok_count, checked_count))
+            sample_at += step
+        state = states.setdefault(event.equipment_id, empty_state())
+        previous = state[event.kind].get(event.item_id, False)
+        if event.value != previous:
+            delta = 1 if event.value else -1
+            if event.kind == KIND_VALIDATION:
+                ok_count += delta
+            else:
+                checked_count += delta
+        _apply(state, event)
+    while sample_at <= end:
+        series.append((sample_at, ok_count, checked_count))
+        sample_at += step
+    return series
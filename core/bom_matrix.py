@@ -0,0 +1,117 @@
+"""The BOM page's item × variant matrix, rendered straight to HTML instead of one template include per row.
+
+A 3,000 × 30 matrix is 90,000 cells; through the template engine every one of
+them cost a filter lookup and a contrast calculation. Here the per-variant
+markup is built once per request, rows come from one values query as tuples,
+and a cell is one of two prebuilt strings.
+"""
+import re
+from collections import defaultdict, namedtuple
+
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import BomItem, BomItemVariant, Variant
+from .templatetags.validation_extras import contrast_color
+
+
+VariantColumn = namedtuple('VariantColumn', 'id name color contrast planned_volume')
+MatrixRow = namedtuple('MatrixRow', 'id equipment_id station part_number description quantity applicable')
+
+HEX_COLOR_RE = re.compile(r'^#[0-9a-fA-F]{6}$')
+ROW_CLASS = 'group hover:bg-blue-50 dark:hover:bg-gray-700 transition-colors'
+ZEBRA_CLASSES = ('bg-white dark:bg-gray-900', 'bg-gray-50 dark:bg-gray-800')  # odd, even rows
+
+
+def is_hex_color(value):
+    """Variant colours end up in a CSS rule, so only #rrggbb is accepted."""
+    return bool(HEX_COLOR_RE.match(value))
+
+
+def variant_column(variant):
+    return VariantColumn(variant.id, variant.name, variant.color, contrast_color(variant.color), variant.planned_volume)
+
+
+def variant_columns():
+    """The matrix columns in display order, with their text colour worked out once."""
+    return [
+        VariantColumn(variant_id, name, color, contrast_color(color), planned_volume)
+        for variant_id, name, color, planned_volume in Variant.objects.values_list('id', 'name', 'color', 'planned_volume')
+    ]
+
+
+def variant_cell(variant_id, applicable):
+    """One variant cell; colours come from the variant's CSS rule (partials/bom_variant_style.html)."""
+    return f'<td class="bom-v" data-v="{variant_id}">{"X" if applicable else ""}</td>'
+
+
+def matrix_rows(item_ids=None):
+    """BOM rows ordered by station as MatrixRow tuples; `applicable` is the set of variant ids marked X."""
+    items = BomItem.objects.order_by('equipment__station', 'order')
+    marks = BomItemVariant.objects.filter(is_applicable=True)
+    if item_ids is not None:
+        items, marks = items.filter(pk__in=item_ids), marks.filter(bom_item_id__in=item_ids)
+    applicable = defaultdict(set)
+    for item_id, variant_id in marks.values_list('bom_item_id', 'variant_id'):
+        applicable[item_id].add(variant_id)
+    return [
+        MatrixRow(item_id, equipment_id, station or '', part_number, description, quantity, applicable.get(item_id, ()))
+        for item_id, equipment_id, station, part_number, description, quantity in items.values_list(
+            'id', 'equipment_id', 'equipment__station', 'part_number', 'description', 'quantity',
+        )
+    ]
+
+
+class BomMatrix:
+    """Renders `<tr>` rows of the BOM table for a fixed list of VariantColumns.
+
+    A variant cell is only `<td class="bom-v" data-v="<variant id>">`, plus an X
+    when applicable: its colours come from one CSS rule per variant and clicks
+    from one listener on the table body. The station dropdown only carries the
+    row's own station; the page holds the full list once in
+    <template id="bom-station-options"> and copies it into a dropdown when it
+    is first focused.
+    """
+
+    def __init__(self, columns):
+        self.columns = columns
+        self._cells = [(variant_cell(column.id, False), variant_cell(column.id, True)) for column in columns]
+
+    def row(self, row, position=1):
+        """HTML of one row; `position` (1-based) picks the zebra stripe."""
+        item_id = str(row.id)
+        update = f'hx-post="/bom/update/{item_id}/"'
+        selected = (
+            f'<option value="{row.equipment_id}" selected>{escape(row.station)}</option>' if row.equipment_id else ''
+        )
+        applicable = row.applicable
+        cells = ''.join([
+            marked if column.id in applicable else empty
+            for column, (empty, marked) in zip(self.columns, self._cells)
+        ])
+        return (
+            f'<tr id="bom-row-{item_id}" class="{ROW_CLASS} {ZEBRA_CLASSES[position % 2 == 0]}">'
+            '<td class="p-1 text-center bg-gray-100 dark:bg-gray-800 sticky left-0 z-10">'
+            f'<button hx-post="/bom/delete/{item_id}/" hx-confirm="Ștergeți acest rând?" '
+            f'hx-target="#bom-row-{item_id}" hx-swap="outerHTML" '
+            'class="text-red-400 hover:text-red-600 transition-colors p-1" title="Șterge rândul">'
+            '<i data-lucide="trash-2" class="w-4 h-4"></i></button></td>'
+            '<td class="p-1 border-r dark:border-gray-700">'
+            f'<select name="equipment" data-station-options {update} hx-trigger="change" hx-swap="none" '
+            'class="w-full bg-transparent p-2 focus:outline-none dark:text-white dark:bg-gray-800 font-medium cursor-pointer">'
+            f'<option value="">-- Selectează --</option>{selected}</select></td>'
+            '<td class="p-1 border-r dark:border-gray-700">'
+            f'<input value="{escape(row.part_number)}" name="part_number" {update} hx-trigger="blur changed" hx-swap="none" '
+            'class="w-full bg-transparent p-2 focus:outline-none dark:text-white font-mono" /></td>'
+            '<td class="p-1 border-r dark:border-gray-700">'
+            f'<input value="{escape(row.description)}" name="description" {update} hx-trigger="blur changed" hx-swap="none" '
+            'class="w-full bg-transparent p-2 focus:outline-none dark:text-white" /></td>'
+            '<td class="p-1 border-r dark:border-gray-700">'
+            f'<input type="number" value="{row.quantity}" name="quantity" {update} hx-trigger="blur changed" hx-swap="none" '
+            'class="w-full bg-transparent p-2 text-center focus:outline-none dark:text-white" /></td>'
+            f'{cells}</tr>'
+        )
+
+    def render(self, rows, start=1):
+        """HTML of consecutive rows, the first at position `start`."""
+        return mark_safe('\n'.join([self.row(row, position) for position, row in enumerate(rows, start)]))
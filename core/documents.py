@@ -0,0 +1,257 @@
+"""Project documents: streamed, validated uploads published by atomic rename, with versions and previews."""
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from datetime import datetime
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, SkipFile
+from django.template.defaultfilters import filesizeformat
+
+from .files import file_etag
+
+
+PDF_MAGIC = b'%PDF-'
+# Multipart boundaries and headers around the file; a request larger than the
+# size limit plus this much cannot hold an acceptable document.
+MULTIPART_OVERHEAD = 64 * 1024
+VERSIONS_DIRNAME = 'versions'
+PREVIEWS_DIRNAME = 'previews'
+PREVIEW_DPI = 60
+PREVIEW_TIMEOUT = 60  # seconds for the pdftoppm fallback
+
+
+class StagedDocument(UploadedFile):
+    """A fully received upload, still sitting in its temp file next to the destination."""
+
+    def __init__(self, path, name, content_type, size):
+        super().__init__(None, name, content_type, size)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+class PdfUploadHandler(FileUploadHandler):
+    """Streams an uploaded PDF to a temp file in `directory`; nothing is held in memory.
+
+    The request's Content-Length, the %PDF- magic and the running size are
+    checked while the body arrives, so a rejected upload stops being written as
+    soon as it is known to be bad. The reason ends up in `error`.
+    """
+
+    def __init__(self, request=None, directory=None, max_size=None):
+        super().__init__(request)
+        self.directory = directory
+        self.max_size = max_size or settings.PROJECT_DOCUMENT_MAX_SIZE
+        self.error = None
+        self.temp_path = None
+        self._head = b''
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.error = self._too_large_message()
+
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        if self.error is None and content_length and content_length > self.max_size:
+            self.error = self._too_large_message()
+        if self.error or self.temp_path:  # one document per request
+            raise SkipFile
+        os.makedirs(self.directory, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(prefix='.upload-', suffix='.pdf', dir=self.directory)
+        self.file = os.fdopen(fd, 'wb')
+        self._head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        if len(self._head) < len(PDF_MAGIC):
+            self._head += raw_data[:len(PDF_MAGIC) - len(self._head)]
+            if not PDF_MAGIC.startswith(self._head):
+                self._reject(f'"{self.file_name}" is not a PDF document.')
+        if start + len(raw_data) > self.max_size:
+            self._reject(self._too_large_message())
+        self.file.write(raw_data)
+        return None  # consumed; no later handler sees the data
+
+    def file_complete(self, file_size):
+        self.file.close()
+        if self._head != PDF_MAGIC:  # shorter than the magic itself
+            self.error = f'"{self.file_name}" is not a PDF document.'
+            self.discard()
+            return None
+        return StagedDocument(self.temp_path, self.file_name, self.content_type, file_size)
+
+    def upload_interrupted(self):
+        self.discard()
+
+    def discard(self):
+        """Remove the temp file unless it has been published; safe to call more than once."""
+        if hasattr(self, 'file'):  # set by new_file; the parser also closes it on SkipFile
+            self.file.close()
+        if self.temp_path:
+            try:
+                os.remove(self.temp_path)
+            except FileNotFoundError:
+                pass
+            self.temp_path = None
+
+    def _reject(self, message):
+        self.error = message
+        self.discard()
+        raise SkipFile
+
+    def _too_large_message(self):
+        return f'The document exceeds the {filesizeformat(self.max_size)} upload limit.'
+
+
+_publish_lock = threading.Lock()
+
+
+def publish_document(staged_path, path):
+    """Move a staged upload over `path` atomically, keeping the replaced file as a version.
+
+    Readers see either the old or the new document, never a partial one: the
+    temp file lives in the same directory, so os.replace is a single rename.
+    """
+    versions_dir = os.path.join(os.path.dirname(path), VERSIONS_DIRNAME)
+    with _publish_lock:
+        if os.path.exists(path):
+            os.makedirs(versions_dir, exist_ok=True)
+            _archive(path, versions_dir)
+        os.chmod(staged_path, 0o644)  # mkstemp creates files private to the server user
+        os.replace(staged_path, path)
+        _prune_versions(path, settings.PROJECT_DOCUMENT_VERSIONS_KEPT)
+    start_preview(path)
+
+
+def _archive(path, versions_dir):
+    """Hard-link (or copy) the current document into versions/, named after its publish time."""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    stamp = datetime.fromtimestamp(os.stat(path).st_mtime).strftime('%Y%m%d-%H%M%S')
+    target = os.path.join(versions_dir, f'{stem}-{stamp}{ext}')
+    counter = 1
+    while os.path.exists(target):
+        target = os.path.join(versions_dir, f'{stem}-{stamp}-{counter}{ext}')
+        counter += 1
+    try:
+        os.link(path, target)  # no copy: the upcoming rename only swaps the directory entry
+    except OSError:
+        shutil.copy2(path, target)
+
+
+def list_versions(path):
+    """Previous versions of `path`, newest first: [{'name', 'size', 'modified'}]."""
+    versions_dir = os.path.join(os.path.dirname(path), VERSIONS_DIRNAME)
+    stem, ext = os.path.splitext(os.path.basename(path))
+    try:
+        entries = [
+            entry for entry in os.scandir(versions_dir)
+            if entry.is_file() and entry.name.startswith(stem + '-') and entry.name.endswith(ext)
+        ]
+    except FileNotFoundError:
+        return []
+    # Names carry the publish time, so they sort chronologically
+    return [
+        {
+            'name': entry.name,
+            'size': entry.stat().st_size,
+            'modified': datetime.fromtimestamp(entry.stat().st_mtime),
+        }
+        for entry in sorted(entries, key=lambda entry: entry.name, reverse=True)
+    ]
+
+
+def version_path(path, name):
+    """Filesystem path of the version called `name`, or None if there is no such version."""
+    if name not in {version['name'] for version in list_versions(path)}:
+        return None
+    return os.path.join(os.path.dirname(path), VERSIONS_DIRNAME, name)
+
+
+def _prune_versions(path, keep):
+    versions_dir = os.path.join(os.path.dirname(path), VERSIONS_DIRNAME)
+    for version in list_versions(path)[keep:]:
+        os.remove(os.path.join(versions_dir, version['name']))
+
+
+# --- FIRST-PAGE PREVIEWS ---
+
+def preview_path(path):
+    """Where the PNG preview of the current `path` is cached; the name changes with every upload."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    tag = file_etag(os.stat(path)).strip('"')
+    return os.path.join(os.path.dirname(path), PREVIEWS_DIRNAME, f'{stem}-{tag}.png')
+
+
+def _render_with_pymupdf(pdf_path, png_path):
+    import fitz  # PyMuPDF, optional
+    with fitz.open(pdf_path) as document:
+        document[0].get_pixmap(dpi=PREVIEW_DPI).save(png_path, output='png')
+
+
+def _render_with_pdftoppm(pdf_path, png_path):
+    prefix = os.path.splitext(png_path)[0]
+    subprocess.run(
+        ['pdftoppm', '-png', '-r', str(PREVIEW_DPI), '-f', '1', '-l', '1', '-singlefile', pdf_path, prefix],
+        check=True, capture_output=True, timeout=PREVIEW_TIMEOUT,
+    )
+
+
+def preview_renderer():
+    """PyMuPDF if installed, else poppler's pdftoppm if on PATH, else None (no previews)."""
+    try:
+        import fitz  # noqa: F401
+        return _render_with_pymupdf
+    except ImportError:
+        pass
+    if shutil.which('pdftoppm'):
+        return _render_with_pdftoppm
+    return None
+
+
+_preview_lock = threading.Lock()
+_previews_in_progress = set()
+
+
+def start_preview(path):
+    """Render the first-page preview of `path` in a background thread unless cached or already running."""
+    renderer = preview_renderer()
+    if renderer is None or not os.path.exists(path):
+        return False
+    target = preview_path(path)
+    if os.path.exists(target):
+        return False
+    with _preview_lock:
+        if target in _previews_in_progress:
+            return False
+        _previews_in_progress.add(target)
+    threading.Thread(
+        target=_render_preview, args=(renderer, path, target), name='document-preview', daemon=True,
+    ).start()
+    return True
+
+
+def _render_preview(renderer, path, target):
+    previews_dir = os.path.dirname(target)
+    try:
+        os.makedirs(previews_dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(prefix='.preview-', suffix='.png', dir=previews_dir)
+        os.close(fd)
+        try:
+            renderer(path, temp_path)
+            os.replace(temp_path, target)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for entry in os.scandir(previews_dir):  # previews of replaced documents
+            if entry.name.startswith(stem + '-') and entry.path != target:
+                os.remove(entry.path)
+    except (OSError, subprocess.SubprocessError, RuntimeError):
+        pass  # no preview; the page falls back to the document itself
+    finally:
+        with _preview_lock:
+            _previews_in_progress.discard(target)
@@ -0,0 +1,133 @@
+"""Serving local files with validators (ETag/Last-Modified), byte ranges and web-server offload."""
+import os
+import re
+
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+
+RANGE_CHUNK_SIZE = 64 * 1024
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def file_etag(stat):
+    """Strong validator from mtime and size; changes whenever the file is replaced."""
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """(start, end) inclusive for a single 'bytes=' range, or None to send the whole file.
+
+    Multi-range and malformed headers are ignored (the full file is a valid answer);
+    a range starting past the end raises RangeNotSatisfiable.
+    """
+    match = _RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':  # suffix range: the last N bytes
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable
+    if end < start:
+        return None
+    return start, end
+
+
+def _if_range_matches(request, etag, mtime):
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(mtime)
+
+
+def _read_range(path, start, length):
+    with open(path, 'rb') as fileobj:
+        fileobj.seek(start)
+        while length > 0:
+            chunk = fileobj.read(min(RANGE_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve_file(request, path, content_type, filename=None, as_attachment=False):
+    """Serve `path` with ETag/Last-Modified (304), single byte ranges (206/416) and optional offload.
+
+    With settings.SENDFILE_HEADER set, only headers are returned for files the
+    front web server can reach, and it streams them (and answers range requests) itself.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        raise Http404("File not found")
+    etag = file_etag(stat)
+    mtime = stat.st_mtime
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(mtime))
+    if response is None:
+        response = _file_response(request, path, stat.st_size, content_type, etag, mtime)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = 'no-cache'  # always revalidate; a 304 costs no body
+    if response.status_code in (200, 206):
+        disposition = 'attachment' if as_attachment else 'inline'
+        response['Content-Disposition'] = f'{disposition}; filename="{filename or os.path.basename(path)}"'
+    return response
+
+
+def _sendfile_target(path):
+    """Value of the SENDFILE_HEADER that hands `path` to the web server, or None to serve it here.
+
+    nginx only reaches files through the internal location aliasing
+    SENDFILE_ROOT, so anything outside it is served by Django.
+    """
+    path = os.path.abspath(path)
+    if settings.SENDFILE_HEADER != 'X-Accel-Redirect':
+        return path
+    root = os.path.abspath(settings.SENDFILE_ROOT)
+    if os.path.commonpath([root, path]) != root:
+        return None
+    return settings.SENDFILE_URL_PREFIX + os.path.relpath(path, root).replace(os.sep, '/')
+
+
+def _file_response(request, path, size, content_type, etag, mtime):
+    sendfile_header = getattr(settings, 'SENDFILE_HEADER', None)
+    target = _sendfile_target(path) if sendfile_header else None
+    if target is not None:
+        response = HttpResponse(content_type=content_type)
+        response[sendfile_header] = target
+        return response
+
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and _if_range_matches(request, etag, mtime):
+        try:
+            byte_range = parse_range(request.META['HTTP_RANGE'], size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(_read_range(path, start, end - start + 1), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
@@ -0,0 +1,85 @@
+"""Plant-wide validation heatmap: every station against every checklist item, as one PNG.
+
+The results table is read in one query into a dense stations × items matrix
+of status codes. That matrix is both the source of the row/column totals and,
+one byte per cell, the pixel data of a palette PNG, so the page shows the
+whole plant as a single image instead of a table cell per result.
+"""
+import struct
+import zlib
+from collections import namedtuple
+
+from .models import Equipment, ValidationChecklistItem, ValidationResult
+
+
+# Cell codes, which are also the PNG palette indexes
+MISSING, NOK, OK = 0, 1, 2
+STATUS_CODES = {'NOK': NOK, 'OK': OK}
+PALETTE = [
+    (75, 85, 99),  # missing: gray-600
+    (239, 68, 68),  # NOK: red-500
+    (34, 197, 94),  # OK: green-500
+]
+
+ValidationMatrix = namedtuple('ValidationMatrix', 'stations items cells row_ok row_nok column_ok column_nok')
+
+
+def validation_matrix():
+    """ValidationMatrix of all stations (rows, by name) and checklist items (columns, catalog order).
+
+    stations is [(id, station)], items [(id, label, test)], cells the status
+    codes as bytes (row-major, one per cell) and the totals lists of counts.
+    """
+    stations = list(Equipment.objects.order_by('station').values_list('id', 'station'))
+    items = [
+        (item_id, f'{code}_{order}', test)
+        for item_id, code, order, test in ValidationChecklistItem.objects.values_list(
+            'id', 'category__code', 'order', 'test',
+        )
+    ]
+    row_of = {equipment_id: row for row, (equipment_id, _) in enumerate(stations)}
+    column_of = {item_id: column for column, (item_id, _, _) in enumerate(items)}
+    # The matrix in one query, as coordinates of its non-missing cells. A
+    # station or item added since the two reads above has no row or column
+    # yet, so its results are left out until the next load.
+    rows, columns, codes = [], [], []
+    for equipment_id, item_id, status in ValidationResult.objects.order_by().values_list(
+        'equipment_id', 'checklist_item_id', 'status',
+    ):
+        row, column = row_of.get(equipment_id), column_of.get(item_id)
+        if status in STATUS_CODES and row is not None and column is not None:
+            rows.append(row)
+            columns.append(column)
+            codes.append(STATUS_CODES[status])
+    return ValidationMatrix(stations, items, *_fill(len(stations), len(items), rows, columns, codes))
+
+
+def _fill(height, width, rows, columns, codes):
+    cells = bytearray(height * width)
+    row_counts = {OK: [0] * height, NOK: [0] * height}
+    column_counts = {OK: [0] * width, NOK: [0] * width}
+    for row, column, code in zip(rows, columns, codes):
+        cells[row * width + column] = code
+        row_counts[code][row] += 1
+        column_counts[code][column] += 1
+    return bytes(cells), row_counts[OK], row_counts[NOK], column_counts[OK], column_counts[NOK]
+
+
+def heatmap_png(matrix):
+    """The matrix as an 8-bit palette PNG, one pixel per cell (scale it up in CSS), or None if it is empty."""
+    width, height = len(matrix.items), len(matrix.stations)
+    if not width or not height:
+        return None
+    # Each scanline is a filter-type byte (0: none) followed by the row's palette indexes
+    scanlines = b''.join(b'\x00' + matrix.cells[row * width:(row + 1) * width] for row in range(height))
+    return b''.join([
+        b'\x89PNG\r\n\x1a\n',
+        _png_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0)),
+        _png_chunk(b'PLTE', bytes(channel for color in PALETTE for channel in color)),
+        _png_chunk(b'IDAT', zlib.compress(scanlines, 6)),
+        _png_chunk(b'IEND', b''),
+    ])
+
+
+def _png_chunk(tag, data):
+    return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
@@ -0,0 +1,449 @@
+"""Streaming spreadsheet imports (CSV or XLSX) for equipment lists and BOMs."""
+import csv
+import io
+import os
+
+from django.db.models import F
+
+from .models import BomItem, BomItemVariant, Equipment, EquipmentDevice, Variant
+from .network import ip_to_int, normalize_ip
+from .kpi import schedule_refresh
+from .search import index_objects
+from .tenancy import atomic, on_commit
+
+
+IMPORT_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 500
+
+EQUIPMENT_IMPORT_FIELDS = [
+    'station', 'owner', 'eq_number', 'power_supply', 'power_kw', 'air_supply_bar', 'air_supply_diam',
+    'height', 'width', 'length', 'weight', 'photo_front', 'photo_tag',
+]
+DEVICE_IMPORT_FIELDS = ['device_type', 'device_name', 'ip_address']
+
+# Alternative spellings accepted in header rows (after lower-casing and _ for spaces)
+HEADER_ALIASES = {
+    'eq_no': 'eq_number',
+    'equipment_number': 'eq_number',
+    'power/kw': 'power_kw',
+    'equipment_type': 'device_type',
+    'type': 'device_type',
+    'name': 'device_name',
+    'ip': 'ip_address',
+}
+
+
+class RowErrors:
+    """Per-row error collection shared by the import reports."""
+
+    def __init__(self):
+        self.rows = 0
+        self.error_count = 0
+        self.errors = []  # (row number, message), capped at MAX_REPORTED_ERRORS
+
+    def add_error(self, row_number, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((row_number, message))
+
+
+class ImportReport(RowErrors):
+    """Counters and per-row errors collected while importing an equipment sheet."""
+
+    def __init__(self):
+        super().__init__()
+        self.equipment_created = 0
+        self.equipment_updated = 0
+        self.devices_created = 0
+        self.devices_updated = 0
+
+    def __str__(self):
+        return (
+            f"{self.rows} rows: {self.equipment_created} stations created, {self.equipment_updated} updated; "
+            f"{self.devices_created} devices created, {self.devices_updated} updated; {self.error_count} errors"
+        )
+
+
+def normalize_header(name):
+    key = str(name or '').strip().lower().replace(' ', '_')
+    return HEADER_ALIASES.get(key, key)
+
+
+def cell_text(value):
+    """Spreadsheet cell as text; integral floats (1097268.0) lose their '.0'."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_sheet_values(fileobj, filename):
+    """Yield each row of a CSV/XLSX file as a list of cell texts, header row first.
+
+    Rows are produced lazily, so memory stays flat regardless of sheet size.
+    """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in ('.xlsx', '.xlsm'):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise ValueError("XLSX import requires the openpyxl package; upload a CSV instead")
+        workbook = load_workbook(fileobj, read_only=True, data_only=True)
+        try:
+            for values in workbook.active.iter_rows(values_only=True):
+                yield [cell_text(value) for value in values]
+        finally:
+            workbook.close()
+    elif extension in ('.csv', '.txt'):
+        stream = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+        sample = stream.read(4096)
+        stream.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=',;\t')
+        except csv.Error:
+            dialect = csv.excel
+        for values in csv.reader(stream, dialect):
+            yield [cell_text(value) for value in values]
+        stream.detach()  # leave the caller's file open
+    else:
+        raise ValueError(f"Unsupported file type '{extension}'; use .csv or .xlsx")
+
+
+def iter_sheet_rows(fileobj, filename):
+    """Yield each data row of a CSV/XLSX file as a dict keyed by normalized header."""
+    rows = iter_sheet_values(fileobj, filename)
+    header = [normalize_header(name) for name in next(rows, [])]
+    for values in rows:
+        yield dict(zip(header, values))
+
+
+def validate_equipment_row(row):
+    """Return (cleaned row, error message or None) for one sheet row.
+
+    Blank cells are left out of the cleaned row: they keep the stored value
+    (or the default of a new record) instead of overwriting it.
+    """
+    cleaned = {}
+    for field in EQUIPMENT_IMPORT_FIELDS:
+        value = row.get(field)
+        if not value:
+            continue
+        max_length = Equipment._meta.get_field(field).max_length
+        if max_length and len(value) > max_length:
+            return None, f"{field} is longer than {max_length} characters"
+        cleaned[field] = value
+    if not cleaned.get('station'):
+        return None, "station is required"
+    owners = [choice for choice, _ in Equipment.OWNER_CHOICES]
+    if cleaned.get('owner') and cleaned['owner'] not in owners:
+        return None, f"owner must be one of {', '.join(owners)}"
+
+    for field in DEVICE_IMPORT_FIELDS:
+        if row.get(field):
+            cleaned[field] = row[field]
+    if cleaned.get('ip_address'):
+        try:
+            cleaned['ip_address'] = normalize_ip(cleaned['ip_address'])
+        except ValueError:
+            return None, f"invalid IP address '{cleaned['ip_address']}'"
+    for field, model_field in (('device_type', 'device_type'), ('device_name', 'name')):
+        max_length = EquipmentDevice._meta.get_field(model_field).max_length
+        if len(cleaned.get(field, '')) > max_length:
+            return None, f"{field} is longer than {max_length} characters"
+    return cleaned, None
+
+
+def import_equipment(fileobj, filename, batch_size=IMPORT_BATCH_SIZE):
+    """Upsert Equipment (by station) and EquipmentDevice (by station + name) from a sheet.
+
+    Rows are validated as they stream in and written in chunks of `batch_size`,
+    each chunk in its own transaction. A row with one or more device columns
+    also creates or updates that device; rows without a device name only touch
+    the station. Invalid rows are reported and skipped.
+    """
+    report = ImportReport()
+    batch = []
+    for row_number, row in enumerate(iter_sheet_rows(fileobj, filename), start=2):
+        if not any(row.values()):
+            continue  # blank spreadsheet line
+        report.rows += 1
+        cleaned, error = validate_equipment_row(row)
+        if error:
+            report.add_error(row_number, error)
+            continue
+        batch.append((row_number, cleaned))
+        if len(batch) >= batch_size:
+            _write_equipment_batch(batch, report)
+            batch = []
+    if batch:
+        _write_equipment_batch(batch, report)
+    return report
+
+
+@atomic
+def _write_equipment_batch(batch, report):
+    # Stations: one upsert statement keyed on the unique station column. The
+    # statement updates every column any row fills, so an existing station
+    # starts from its stored values and only the cells filled for it change.
+    stations = {
+        fields['station']: fields
+        for fields in Equipment.objects.filter(station__in={row['station'] for _, row in batch})
+        .values(*EQUIPMENT_IMPORT_FIELDS)
+    }
+    existing = set(stations)
+    filled = set()
+    for _, row in batch:
+        fields = {field: row[field] for field in EQUIPMENT_IMPORT_FIELDS if field in row}
+        stations.setdefault(row['station'], {}).update(fields)
+        filled.update(fields)
+    update_fields = sorted(filled - {'station'})
+    update_fields += [Equipment.NUMERIC_FIELDS[field] for field in update_fields if field in Equipment.NUMERIC_FIELDS]
+    equipment = [Equipment(**fields) for fields in stations.values()]
+    for station in equipment:
+        station.sync_numeric_fields()  # bulk_create skips save()
+    Equipment.objects.bulk_create(
+        equipment,
+        update_conflicts=bool(update_fields),
+        ignore_conflicts=not update_fields,
+        unique_fields=['station'] if update_fields else None,
+        update_fields=update_fields or None,
+    )
+    report.equipment_updated += len(existing)
+    report.equipment_created += len(stations) - len(existing)
+    station_ids = dict(Equipment.objects.filter(station__in=stations).values_list('station', 'id'))
+
+    # Devices: matched on (equipment, name) against one lookup per chunk
+    devices = {
+        (device.equipment_id, device.name): device
+        for device in EquipmentDevice.objects.filter(equipment_id__in=station_ids.values())
+    }
+    ip_owners = dict(
+        EquipmentDevice.objects.filter(
+            ip_int__in={ip_to_int(row['ip_address']) for _, row in batch if row.get('ip_address')}
+        ).values_list('ip_int', 'id')
+    )
+    to_create, to_update = {}, {}
+    for row_number, row in batch:
+        if not row.get('device_name'):
+            continue
+        equipment_id = station_ids[row['station']]
+        device = devices.get((equipment_id, row['device_name']))
+        ip_int = ip_to_int(row['ip_address']) if 'ip_address' in row else None
+        # Checked before the device is touched, so a rejected row changes nothing
+        owner = ip_owners.get(ip_int)
+        if ip_int is not None and owner is not None and (device is None or owner != (device.pk or id(device))):
+            report.add_error(row_number, f"IP {row['ip_address']} is already used by another device")
+            continue
+        if device is None:
+            device = EquipmentDevice(equipment_id=equipment_id, name=row['device_name'])
+            devices[(equipment_id, device.name)] = device
+        if 'device_type' in row:
+            device.device_type = row['device_type']
+        if 'ip_address' in row:
+            if device.ip_int is not None and ip_owners.get(device.ip_int) == (device.pk or id(device)):
+                del ip_owners[device.ip_int]  # the old address is free for later rows
+            device.ip_address, device.ip_int = row['ip_address'], ip_int
+            if ip_int is not None:
+                ip_owners[ip_int] = device.pk or id(device)
+        if device.pk:
+            to_update[device.pk] = device
+        else:
+            to_create[id(device)] = device
+
+    EquipmentDevice.objects.bulk_create(to_create.values())
+    EquipmentDevice.objects.bulk_update(to_update.values(), ['device_type', 'ip_address', 'ip_int'])
+    report.devices_created += len(to_create)
+    report.devices_updated += len(to_update)
+    Equipment.objects.filter(pk__in=station_ids.values()).update(row_version=F('row_version') + 1)
+    # Bulk writes send no post_save, so the search index is refreshed here
+    index_objects(Equipment.objects.filter(pk__in=station_ids.values()))
+    index_objects(EquipmentDevice.objects.filter(equipment_id__in=station_ids.values()).select_related('equipment'))
+    on_commit(schedule_refresh)
+
+
+# --- BOM import ---
+
+# BOM sheet headers (normalized) mapped to BomItem fields; every other header is a variant column
+BOM_HEADER_FIELDS = {
+    'station': 'station',
+    'stație': 'station',
+    'statie': 'station',
+    'part_number': 'part_number',
+    'material': 'part_number',
+    'material/part_number': 'part_number',
+    'description': 'description',
+    'descriere': 'description',
+    'quantity': 'quantity',
+    'qty': 'quantity',
+    'cant.': 'quantity',
+    'cantitate': 'quantity',
+}
+DEFAULT_VARIANT_COLOR = '#6BB8D4'
+
+
+class BomDiff(RowErrors):
+    """What importing a BOM sheet would change, computed before anything is written.
+
+    The sheet is authoritative for the stations it lists: items of those
+    stations that are not in the sheet are removals. Other stations are left
+    untouched.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.fields = []  # optional BomItem columns present in the sheet
+        self.variant_names = []  # variant columns, in sheet order
+        self.new_variants = []
+        self.adds = []  # sheet rows without a matching item
+        self.changes = []  # (item, {field: (old, new)}, {variant name: applicable})
+        self.removals = []
+
+    @property
+    def has_changes(self):
+        return bool(self.new_variants or self.adds or self.changes or self.removals)
+
+
+def read_bom_diff(fileobj, filename):
+    """Parse a BOM sheet (one row per station + part, one X column per variant) into a BomDiff."""
+    diff = BomDiff()
+    rows = iter_sheet_values(fileobj, filename)
+    header = next(rows, [])
+    columns, variant_columns = {}, {}
+    for index, name in enumerate(header):
+        field = BOM_HEADER_FIELDS.get(normalize_header(name))
+        if field and field not in columns.values():
+            columns[index] = field
+        elif name and not field and name.lower() not in (seen.lower() for seen in variant_columns.values()):
+            variant_columns[index] = name[:Variant._meta.get_field('name').max_length]
+    if not {'station', 'part_number'} <= set(columns.values()):
+        raise ValueError("the sheet needs Station and Material/Part Number columns")
+    diff.fields = [field for field in ('description', 'quantity') if field in columns.values()]
+    diff.variant_names = list(variant_columns.values())
+
+    known_stations = {equipment.station: equipment for equipment in Equipment.objects.only('id', 'station')}
+    part_max_length = BomItem._meta.get_field('part_number').max_length
+    sheet = {}
+    for row_number, values in enumerate(rows, start=2):
+        if not any(values):
+            continue
+        diff.rows += 1
+        values += [''] * (len(header) - len(values))  # short rows pad with blanks
+        row = {field: values[index] for index, field in columns.items()}
+        key = (row['station'], row['part_number'])
+        if not all(key):
+            diff.add_error(row_number, "station and part number are required")
+            continue
+        row['equipment'] = known_stations.get(row['station'])
+        if row['equipment'] is None:
+            diff.add_error(row_number, f"unknown station '{row['station']}'")
+            continue
+        if len(row['part_number']) > part_max_length:
+            diff.add_error(row_number, f"part number is longer than {part_max_length} characters")
+            continue
+        if key in sheet:
+            diff.add_error(row_number, f"duplicate of row {sheet[key]['row_number']}")
+            continue
+        try:
+            row['quantity'] = int(row.get('quantity') or 1)
+            if row['quantity'] < 0:
+                raise ValueError
+        except ValueError:
+            diff.add_error(row_number, f"invalid quantity '{row['quantity']}'")
+            continue
+        row['row_number'] = row_number
+        row['variants'] = {
+            name for index, name in variant_columns.items() if values[index].strip().lower() == 'x'
+        }
+        sheet[key] = row
+
+    existing_variants = {name.lower() for name in Variant.objects.values_list('name', flat=True)}
+    diff.new_variants = [name for name in diff.variant_names if name.lower() not in existing_variants]
+
+    matched = set()
+    items = (
+        BomItem.objects.filter(equipment__in={row['equipment'].pk for row in sheet.values()})
+        .select_related('equipment')
+        .prefetch_related('item_variants__variant')
+        .order_by('order', 'id')
+    )
+    for item in items:
+        key = (item.station, item.part_number)
+        row = sheet.get(key)
+        if row is None or key in matched:
+            diff.removals.append(item)
+            continue
+        matched.add(key)
+        field_changes = {
+            field: (getattr(item, field), row[field])
+            for field in diff.fields if getattr(item, field) != row[field]
+        }
+        flags = {iv.variant.name.lower(): iv.is_applicable for iv in item.item_variants.all()}
+        variant_changes = {
+            name: name in row['variants']
+            for name in diff.variant_names if flags.get(name.lower(), False) != (name in row['variants'])
+        }
+        if field_changes or variant_changes:
+            diff.changes.append((item, field_changes, variant_changes))
+    diff.adds = [row for key, row in sheet.items() if key not in matched]
+    return diff
+
+
+@atomic
+def apply_bom_diff(diff, batch_size=IMPORT_BATCH_SIZE):
+    """Write a BomDiff: new variants, added/changed/removed items and their X marks."""
+    max_variant_order = Variant.objects.order_by('-order').values_list('order', flat=True).first() or 0
+    Variant.objects.bulk_create([
+        Variant(name=name, color=DEFAULT_VARIANT_COLOR, order=max_variant_order + offset)
+        for offset, name in enumerate(diff.new_variants, start=1)
+    ])
+    variants = {variant.name.lower(): variant.id for variant in Variant.objects.all()}
+
+    BomItem.objects.filter(pk__in=[item.pk for item in diff.removals]).delete()
+
+    changed_items = []
+    for item, field_changes, _ in diff.changes:
+        for field, (_, new) in field_changes.items():
+            setattr(item, field, new)
+        if field_changes:
+            changed_items.append(item)
+    if changed_items and diff.fields:
+        BomItem.objects.bulk_update(changed_items, diff.fields, batch_size=batch_size)
+
+    max_order = BomItem.objects.order_by('-order').values_list('order', flat=True).first() or 0
+    new_items = BomItem.objects.bulk_create([
+        BomItem(
+            equipment=row['equipment'], part_number=row['part_number'], description=row.get('description', ''),
+            quantity=row['quantity'], order=max_order + offset,
+        )
+        for offset, row in enumerate(diff.adds, start=1)
+    ], batch_size=batch_size)
+
+    # Every item keeps one through row per variant, as bom_add_row/bom_add_variant do
+    new_variant_ids = [variants[name.lower()] for name in diff.new_variants]
+    old_item_ids = []
+    if new_variant_ids:
+        old_item_ids = BomItem.objects.exclude(pk__in=[item.pk for item in new_items]).values_list('pk', flat=True)
+    BomItemVariant.objects.bulk_create(
+        [BomItemVariant(bom_item=item, variant_id=variant_id) for item in new_items for variant_id in variants.values()]
+        + [BomItemVariant(bom_item_id=item_id, variant_id=variant_id) for item_id in old_item_ids for variant_id in new_variant_ids],
+        batch_size=batch_size, ignore_conflicts=True,
+    )
+
+    applicable = {}
+    for item, row in zip(new_items, diff.adds):
+        for name in diff.variant_names:
+            applicable[(item.pk, variants[name.lower()])] = name in row['variants']
+    for item, _, variant_changes in diff.changes:
+        for name, flag in variant_changes.items():
+            applicable[(item.pk, variants[name.lower()])] = flag
+    through_rows = BomItemVariant.objects.filter(bom_item_id__in={item_id for item_id, _ in applicable})
+    updated = []
+    for through in through_rows:
+        flag = applicable.get((through.bom_item_id, through.variant_id))
+        if flag is not None and flag != through.is_applicable:
+            through.is_applicable = flag
+            updated.append(through)
+    BomItemVariant.objects.bulk_update(updated, ['is_applicable'], batch_size=batch_size)
+    index_objects(changed_items + new_items)
+    on_commit(schedule_refresh)
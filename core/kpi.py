@@ -0,0 +1,150 @@
+"""Materialized plant KPIs for the dashboard (KpiSummary), rebuilt in the background after writes."""
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .audit import progress_series
+from .models import (
+    BomItem, DocumentationChecklistItem, DocumentationResult, Equipment, EquipmentDevice, KpiSummary,
+    ValidationCategory, ValidationChecklistItem, Variant,
+)
+from .tenancy import atomic, current_database, use_database
+
+
+METRIC_VALIDATION = 'validation'
+METRIC_STATION = 'validation_station'
+METRIC_OWNER = 'validation_owner'
+METRIC_CATEGORY_NOK = 'nok_category'
+METRIC_DOCUMENTATION = 'documentation'
+METRIC_DEVICES = 'devices'
+METRIC_BOM_VARIANT = 'bom_variant'
+METRIC_BURNDOWN = 'burndown'
+METRICS = [
+    METRIC_VALIDATION, METRIC_STATION, METRIC_OWNER, METRIC_CATEGORY_NOK,
+    METRIC_DOCUMENTATION, METRIC_DEVICES, METRIC_BOM_VARIANT, METRIC_BURNDOWN,
+]
+
+BURNDOWN_DAYS = 30
+
+
+def compute_summary(now=None):
+    """Run the aggregate queries and return unsaved KpiSummary rows.
+
+    A few aggregate queries plus the burndown replay, which reads each
+    station's newest snapshot before the window and only the events after it.
+    """
+    now = now or timezone.now()
+    rows = []
+
+    def add(metric, key, label, value, total, position=0):
+        rows.append(KpiSummary(
+            metric=metric, key=str(key), label=label, value=value, total=total,
+            position=position, refreshed_at=now,
+        ))
+
+    checklist_total = ValidationChecklistItem.objects.count()
+    stations = Equipment.objects.annotate(
+        ok_count=Count('validation_results', filter=Q(validation_results__status='OK'))
+    ).values_list('id', 'station', 'owner', 'ok_count').order_by('id')
+    owners = defaultdict(lambda: [0, 0])
+    for position, (equipment_id, station, owner, ok_count) in enumerate(stations):
+        add(METRIC_STATION, equipment_id, station, ok_count, checklist_total, position)
+        owners[owner or '—'][0] += ok_count
+        owners[owner or '—'][1] += checklist_total
+    for position, (owner, (ok_count, total)) in enumerate(sorted(owners.items())):
+        add(METRIC_OWNER, owner, owner, ok_count, total, position)
+    station_count = len(stations)
+    add(METRIC_VALIDATION, 'all', 'Validation',
+        sum(ok_count for ok_count, _ in owners.values()), checklist_total * station_count)
+
+    categories = ValidationCategory.objects.annotate(
+        nok_count=Count('items__results', filter=Q(items__results__status='NOK')),
+        item_count=Count('items', distinct=True),
+    ).values_list('id', 'title', 'nok_count', 'item_count').order_by('order')
+    for position, (category_id, title, nok_count, item_count) in enumerate(categories):
+        add(METRIC_CATEGORY_NOK, category_id, title, nok_count, item_count * station_count, position)
+
+    add(METRIC_DOCUMENTATION, 'all', 'Documentation',
+        DocumentationResult.objects.filter(is_checked=True).count(),
+        DocumentationChecklistItem.objects.count() * station_count)
+
+    devices = EquipmentDevice.objects.aggregate(
+        total=Count('id'),
+        complete=Count('id', filter=~Q(device_type='') & ~Q(name='') & ~Q(ip_address='')),
+    )
+    add(METRIC_DEVICES, 'all', 'Devices', devices['complete'], devices['total'])
+
+    bom_total = BomItem.objects.count()
+    variants = Variant.objects.annotate(
+        applicable=Count('variant_items', filter=Q(variant_items__is_applicable=True))
+    ).values_list('id', 'name', 'applicable').order_by('order')
+    for position, (variant_id, name, applicable) in enumerate(variants):
+        add(METRIC_BOM_VARIANT, variant_id, name, applicable, bom_total, position)
+
+    today_end = timezone.make_aware(datetime.combine(timezone.localdate(now), datetime.max.time()))
+    series = progress_series(today_end - timedelta(days=BURNDOWN_DAYS - 1), today_end)
+    for position, (sample_at, ok_count, _) in enumerate(series):
+        total = checklist_total * station_count
+        add(METRIC_BURNDOWN, sample_at.date().isoformat(), sample_at.strftime('%d.%m'),
+            max(total - ok_count, 0), total, position)
+    return rows
+
+
+@atomic
+def rebuild_summary():
+    rows = compute_summary()
+    KpiSummary.objects.all().delete()
+    KpiSummary.objects.bulk_create(rows)
+    return rows
+
+
+def load_summary():
+    """All KPI rows grouped by metric (one query); rebuilds synchronously only if never built."""
+    rows = list(KpiSummary.objects.all()) or rebuild_summary()
+    summary = defaultdict(list)
+    for row in rows:
+        summary[row.metric].append(row)
+    for metric_rows in summary.values():
+        metric_rows.sort(key=lambda row: row.position)
+    return summary
+
+
+# Due time (time.monotonic) of the pending debounced rebuild, per database alias
+_refresh_lock = threading.Lock()
+_refresh_due = {}
+
+
+def schedule_refresh(using=None):
+    """Rebuild the summary KPI_REFRESH_DELAY seconds after the latest call, in a background thread.
+
+    Bursts of writes (a cascade delete, an import) only push the due time back,
+    so they cost one rebuild and one thread. Each project database is debounced
+    on its own, for the current one unless `using` says otherwise.
+    """
+    alias = using or current_database()
+    with _refresh_lock:
+        pending = alias in _refresh_due
+        _refresh_due[alias] = time.monotonic() + settings.KPI_REFRESH_DELAY
+    if not pending:
+        threading.Thread(target=_refresh_when_due, args=(alias,), name='kpi-refresh', daemon=True).start()
+
+
+def _refresh_when_due(alias):
+    from django.db import connections
+    try:
+        while True:
+            with _refresh_lock:
+                wait = _refresh_due[alias] - time.monotonic()
+                if wait <= 0:
+                    del _refresh_due[alias]
+                    break
+            time.sleep(wait)
+        with use_database(alias):
+            rebuild_summary()
+    finally:
+        connections[alias].close()  # this thread's own DB connection
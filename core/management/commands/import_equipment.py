@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importers import IMPORT_BATCH_SIZE, import_equipment
+from core.tenancy import add_project_argument, project_from_options, use_project
+
+
+class Command(BaseCommand):
+    help = "Upsert stations and their devices from a CSV or XLSX sheet (one row per device)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to a .csv or .xlsx file")
+        parser.add_argument(
+            '--batch-size', type=int, default=IMPORT_BATCH_SIZE,
+            help="Rows written per transaction (default: %(default)s)",
+        )
+        add_project_argument(parser)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            with use_project(project_from_options(options)), open(options['path'], 'rb') as fileobj:
+                report = import_equipment(fileobj, options['path'], options['batch_size'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(exc)
+        for row_number, message in report.errors:
+            self.stderr.write(f"Row {row_number}: {message}")
+        self.stdout.write(self.style.SUCCESS(f"{report} ({time.perf_counter() - started:.1f}s)"))
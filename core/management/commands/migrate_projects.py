@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Project
+from core.tenancy import migrate_project
+
+
+class Command(BaseCommand):
+    help = "Create or upgrade each project's database (plain `migrate` only covers 'default')."
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help="Only these projects (default: all, archived included)")
+
+    def handle(self, *args, **options):
+        projects = Project.objects.all()
+        if options['slugs']:
+            projects = projects.filter(slug__in=options['slugs'])
+            missing = set(options['slugs']) - {project.slug for project in projects}
+            if missing:
+                raise CommandError(f"No project with slug {', '.join(sorted(missing))}")
+        for project in projects:
+            migrate_project(project, verbosity=max(options['verbosity'] - 1, 0))
+            self.stdout.write(f"Migrated {project.slug}")
+        self.stdout.write(self.style.SUCCESS(f"{len(projects)} project databases up to date"))
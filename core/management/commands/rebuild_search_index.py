@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from core.search import SEARCH_TABLE, rebuild_index
+from core.tenancy import add_project_argument, current_database, project_from_options, use_project
+
+
+class Command(BaseCommand):
+    help = "Re-create the full-text search index from all indexed models (after bulk loads or loaddata)."
+
+    def add_arguments(self, parser):
+        add_project_argument(parser)
+
+    def handle(self, *args, **options):
+        with use_project(project_from_options(options)):
+            rebuild_index(connections[current_database()])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {SEARCH_TABLE}"))
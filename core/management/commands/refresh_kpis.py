@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.kpi import rebuild_summary
+from core.tenancy import add_project_argument, project_from_options, use_project
+
+
+class Command(BaseCommand):
+    help = "Rebuild the materialized dashboard KPI summary now (writes also refresh it in the background)."
+
+    def add_arguments(self, parser):
+        add_project_argument(parser)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with use_project(project_from_options(options)):
+            rows = rebuild_summary()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(rows)} KPI rows rebuilt ({time.perf_counter() - started:.2f}s)"
+        ))
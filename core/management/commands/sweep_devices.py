@@ -0,0 +1,35 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core.network import sweep_devices
+from core.tenancy import add_project_argument, project_from_options, use_project
+
+
+class Command(BaseCommand):
+    help = "Probe every EquipmentDevice IP over TCP and store reachability and latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--ports', type=lambda value: [int(port) for port in value.split(',')],
+            default=settings.DEVICE_SWEEP_PORTS,
+            help="Comma-separated TCP ports to try per device (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--timeout', type=float, default=settings.DEVICE_SWEEP_TIMEOUT,
+            help="Seconds allowed per host (default: %(default)s)",
+        )
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.DEVICE_SWEEP_CONCURRENCY,
+            help="Hosts probed at the same time (default: %(default)s)",
+        )
+        add_project_argument(parser)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        with use_project(project_from_options(options)):
+            online, checked = sweep_devices(options['ports'], options['timeout'], options['concurrency'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{online}/{checked} devices online ({time.perf_counter() - started:.1f}s)"
+        ))
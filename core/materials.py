@@ -0,0 +1,95 @@
+"""Material requirements: how many of each part a production plan of variants needs, per station and overall.
+
+With A the BOM applicability matrix (items × variants, 1 where the item is
+marked X) and v the planned units per variant, A @ v is how many built units
+contain each item, and BomItem.quantity times that is what each item needs.
+Totals per station + part and per part are sums of those over groups.
+
+A is sparse (only the X cells are loaded), so the product is one pass over
+the marked cells rather than a dense items × variants multiplication.
+"""
+import csv
+from collections import namedtuple
+
+from .models import BomItemVariant, Variant
+
+
+CSV_HEADER = ['scope', 'station', 'part_number', 'quantity']
+VOLUME_PARAM_PREFIX = 'volume_'  # ?volume_<variant id>=<units> overrides the saved plan
+
+MaterialRequirements = namedtuple('MaterialRequirements', 'by_station by_part total')
+
+
+def planned_volumes(overrides=None):
+    """{variant id: planned units} from Variant.planned_volume, with `overrides` ({id: units}) on top."""
+    volumes = dict(Variant.objects.values_list('id', 'planned_volume'))
+    volumes.update({variant_id: units for variant_id, units in (overrides or {}).items() if variant_id in volumes})
+    return volumes
+
+
+def volume_overrides(params):
+    """{variant id: units} from ?volume_<id>=<units> parameters; raises ValueError on anything else."""
+    overrides = {}
+    for key, value in params.items():
+        if key.startswith(VOLUME_PARAM_PREFIX):
+            variant_id, units = int(key[len(VOLUME_PARAM_PREFIX):]), int(value)
+            if units < 0:
+                raise ValueError(f"Negative volume for variant {variant_id}")
+            overrides[variant_id] = units
+    return overrides
+
+
+def material_requirements(volumes):
+    """MaterialRequirements for `volumes` ({variant id: units}); parts with no requirement are left out.
+
+    by_station is [(station, part_number, quantity)] and by_part
+    [(part_number, quantity)], both sorted; items without a part number are
+    placeholders and do not count.
+    """
+    variant_ids = list(volumes)
+    variant_index = {variant_id: index for index, variant_id in enumerate(variant_ids)}
+    # The applicability matrix in one query, as coordinates of its non-zero cells
+    item_index, quantities, station_parts, rows, columns = {}, [], [], [], []
+    for item_id, variant_id, quantity, part_number, station in (
+        BomItemVariant.objects.filter(is_applicable=True, variant_id__in=variant_ids)
+        .exclude(bom_item__part_number='')
+        .values_list('bom_item_id', 'variant_id', 'bom_item__quantity', 'bom_item__part_number', 'bom_item__equipment__station')
+    ):
+        row = item_index.get(item_id)
+        if row is None:
+            row = item_index[item_id] = len(quantities)
+            quantities.append(quantity)
+            station_parts.append((station or '', part_number))
+        rows.append(row)
+        columns.append(variant_index[variant_id])
+
+    groups = sorted(set(station_parts))
+    group_index = {key: index for index, key in enumerate(groups)}
+    item_groups = [group_index[key] for key in station_parts]
+    volume_vector = [volumes[variant_id] for variant_id in variant_ids]
+    group_totals = _group_totals(quantities, rows, columns, volume_vector, item_groups, len(groups))
+
+    by_station = [(station, part, total) for (station, part), total in zip(groups, group_totals) if total]
+    by_part = {}
+    for _, part, total in by_station:
+        by_part[part] = by_part.get(part, 0) + total
+    return MaterialRequirements(by_station, sorted(by_part.items()), sum(by_part.values()))
+
+
+def _group_totals(quantities, rows, columns, volume_vector, item_groups, group_count):
+    units = [0] * len(quantities)
+    for row, column in zip(rows, columns):
+        units[row] += volume_vector[column]
+    totals = [0] * group_count
+    for group, quantity, built in zip(item_groups, quantities, units):
+        totals[group] += quantity * built
+    return totals
+
+
+def write_requirements_csv(requirements, fileobj):
+    """One row per station + part, then per part, then the overall total."""
+    writer = csv.writer(fileobj)
+    writer.writerow(CSV_HEADER)
+    writer.writerows(['station', station, part, total] for station, part, total in requirements.by_station)
+    writer.writerows(['part', '', part, total] for part, total in requirements.by_part)
+    writer.writerow(['total', '', '', requirements.total])
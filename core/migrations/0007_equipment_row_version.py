@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_equipment_height_equipment_length_equipment_weight_and_more"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="equipment",
+            name="row_version",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-19 14:59
+
+import ipaddress
+
+from django.db import migrations, models
+
+
+def backfill_ip_int(apps, schema_editor):
+    EquipmentDevice = apps.get_model("core", "EquipmentDevice")
+    db_alias = schema_editor.connection.alias
+    devices = []
+    for device in EquipmentDevice.objects.using(db_alias).exclude(ip_address=""):
+        try:
+            ip = ipaddress.ip_address(device.ip_address.strip())
+        except ValueError:
+            continue  # leave malformed legacy values untouched
+        device.ip_address = str(ip)
+        device.ip_int = int(ip) if ip.version == 4 else None
+        devices.append(device)
+    EquipmentDevice.objects.using(db_alias).bulk_update(
+        devices, ["ip_address", "ip_int"], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_equipment_row_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="equipmentdevice",
+            name="ip_int",
+            field=models.BigIntegerField(
+                blank=True, db_index=True, editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(backfill_ip_int, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0008_equipmentdevice_ip_int"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="equipmentdevice",
+            name="is_reachable",
+            field=models.BooleanField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="equipmentdevice",
+            name="last_checked_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="equipmentdevice",
+            name="last_seen_at",
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name="equipmentdevice",
+            name="latency_ms",
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+    ]
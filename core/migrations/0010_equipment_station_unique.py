@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:02
+
+from django.db import migrations, models
+
+
+def dedupe_stations(apps, schema_editor):
+    """Rename repeated (or blank) station names so the unique index can be built."""
+    Equipment = apps.get_model("core", "Equipment")
+    db_alias = schema_editor.connection.alias
+    seen = set()
+    for equipment in Equipment.objects.using(db_alias).order_by("id"):
+        if equipment.station and equipment.station not in seen:
+            seen.add(equipment.station)
+            continue
+        base = equipment.station or "STATION"
+        equipment.station = f"{base[:40]}-{equipment.pk}"
+        seen.add(equipment.station)
+        equipment.save(using=db_alias, update_fields=["station"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0009_equipmentdevice_reachability"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_stations, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="equipment",
+            name="station",
+            field=models.CharField(max_length=50, unique=True),
+        ),
+    ]
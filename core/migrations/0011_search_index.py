@@ -0,0 +1,59 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:20
+
+from django.db import migrations
+
+
+# Frozen copies of core.search: the table, and every document as of this migration
+# (rowid = pk << 3 | source code). Everything runs on schema_editor.connection, so
+# `migrate --database=<alias>` indexes that database whatever project is current.
+CREATE_INDEX_SQL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS core_search "
+    "USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+)
+DROP_INDEX_SQL = "DROP TABLE IF EXISTS core_search"
+INDEX_DOCUMENTS_SQL = [
+    # Station
+    "INSERT OR REPLACE INTO core_search (rowid, title, body) "
+    "SELECT id << 3 | 1, station, eq_number || ' ' || owner || ' ' || power_supply FROM core_equipment",
+    # Device
+    "INSERT OR REPLACE INTO core_search (rowid, title, body) "
+    "SELECT device.id << 3 | 2, CASE WHEN device.name != '' THEN device.name ELSE device.device_type END, "
+    "device.ip_address || ' ' || device.device_type || ' ' || station.station "
+    "FROM core_equipmentdevice device JOIN core_equipment station ON station.id = device.equipment_id",
+    # BOM
+    "INSERT OR REPLACE INTO core_search (rowid, title, body) "
+    "SELECT id << 3 | 3, part_number, description || ' ' || station FROM core_bomitem",
+    # Checklist
+    "INSERT OR REPLACE INTO core_search (rowid, title, body) "
+    "SELECT id << 3 | 4, ref_iatf || ' / ' || ref_vda, test || ' ' || expected || ' ' || example "
+    "FROM core_validationchecklistitem",
+    # Revision
+    "INSERT OR REPLACE INTO core_search (rowid, title, body) "
+    "SELECT id << 3 | 5, 'v' || version || ' ' || register, changes FROM core_dochistoryitem",
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return  # FTS5 is SQLite-only; search stays empty elsewhere
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_INDEX_SQL)
+        for sql in INDEX_DOCUMENTS_SQL:
+            cursor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        with schema_editor.connection.cursor() as cursor:
+            cursor.execute(DROP_INDEX_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0010_equipment_station_unique"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:09
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def seed_events_from_results(apps, schema_editor):
+    """Start the log with the current state, each result stamped with its last change."""
+    ValidationEvent = apps.get_model("core", "ValidationEvent")
+    ValidationResult = apps.get_model("core", "ValidationResult")
+    DocumentationResult = apps.get_model("core", "DocumentationResult")
+    db_alias = schema_editor.connection.alias
+    events = [
+        ValidationEvent(
+            equipment_id=result.equipment_id,
+            kind="V",
+            item_id=result.checklist_item_id,
+            value=result.status == "OK",
+            created_at=result.validated_at,
+        )
+        for result in ValidationResult.objects.using(db_alias)
+    ] + [
+        ValidationEvent(
+            equipment_id=result.equipment_id,
+            kind="D",
+            item_id=result.checklist_item_id,
+            value=result.is_checked,
+            created_at=result.updated_at,
+        )
+        for result in DocumentationResult.objects.using(db_alias)
+    ]
+    events.sort(key=lambda event: event.created_at)
+    ValidationEvent.objects.using(db_alias).bulk_create(events, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0011_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ValidationSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("last_event_id", models.PositiveBigIntegerField()),
+                ("taken_at", models.DateTimeField()),
+                ("state", models.JSONField()),
+                (
+                    "equipment",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="validation_snapshots",
+                        to="core.equipment",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["equipment", "taken_at"],
+                        name="core_valida_equipme_703ffd_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="ValidationEvent",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[("V", "Validation"), ("D", "Documentation")],
+                        max_length=1,
+                    ),
+                ),
+                ("item_id", models.PositiveIntegerField()),
+                ("value", models.BooleanField()),
+                ("created_at", models.DateTimeField(default=django.utils.timezone.now)),
+                (
+                    "equipment",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        related_name="validation_events",
+                        to="core.equipment",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["id"],
+                "indexes": [
+                    models.Index(
+                        fields=["equipment", "created_at"],
+                        name="core_valida_equipme_a00b08_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(seed_events_from_results, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0012_validation_audit_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="KpiSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("metric", models.CharField(max_length=30)),
+                ("key", models.CharField(max_length=100)),
+                ("label", models.CharField(max_length=200)),
+                ("value", models.PositiveIntegerField(default=0)),
+                ("total", models.PositiveIntegerField(default=0)),
+                ("position", models.PositiveIntegerField(default=0)),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name_plural": "KPI Summary",
+                "ordering": ["metric", "position"],
+                "unique_together": {("metric", "key")},
+            },
+        ),
+    ]
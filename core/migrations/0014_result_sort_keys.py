@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:19
+
+from django.db import migrations, models
+
+# core.models.CATALOG_SORT_STRIDE at the time of this migration
+CATALOG_SORT_STRIDE = 10000
+
+
+def fill_sort_keys(apps, schema_editor):
+    db_alias = schema_editor.connection.alias
+    for item_name, result_name in [
+        ("ValidationChecklistItem", "ValidationResult"),
+        ("DocumentationChecklistItem", "DocumentationResult"),
+    ]:
+        item_model = apps.get_model("core", item_name)
+        keys = (
+            item_model.objects.filter(pk=models.OuterRef("checklist_item_id"))
+            .order_by()
+            .annotate(
+                sort_key=models.F("category__order") * CATALOG_SORT_STRIDE
+                + models.F("order")
+            )
+            .values("sort_key")
+        )
+        apps.get_model("core", result_name).objects.using(db_alias).update(
+            sort_key=models.Subquery(keys)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0013_kpi_summary"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="documentationresult",
+            options={"ordering": ["sort_key"]},
+        ),
+        migrations.AlterModelOptions(
+            name="equipmentdevice",
+            options={"ordering": ["equipment_id", "id"]},
+        ),
+        migrations.AlterModelOptions(
+            name="validationresult",
+            options={"ordering": ["sort_key"]},
+        ),
+        migrations.AddField(
+            model_name="documentationresult",
+            name="sort_key",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="validationresult",
+            name="sort_key",
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name="documentationresult",
+            index=models.Index(
+                fields=["equipment", "sort_key"], name="core_docume_equipme_ac8132_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="documentationresult",
+            index=models.Index(
+                fields=["equipment", "is_checked"],
+                name="core_docume_equipme_c89c20_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="validationresult",
+            index=models.Index(
+                fields=["equipment", "sort_key"], name="core_valida_equipme_729eb7_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="validationresult",
+            index=models.Index(
+                fields=["equipment", "status"], name="core_valida_equipme_34b675_idx"
+            ),
+        ),
+        migrations.RunPython(fill_sort_keys, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:21
+
+import re
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Copy of core.models.parse_number at the time of this migration
+NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+NUMERIC_FIELDS = [
+    "power_kw",
+    "air_supply_bar",
+    "air_supply_diam",
+    "height",
+    "width",
+    "length",
+    "weight",
+]
+
+
+def parse_number(text):
+    match = NUMBER_RE.search(text or "")
+    if not match:
+        return None
+    value = Decimal(match.group().replace(",", ".")).quantize(Decimal("0.01"))
+    return value if abs(value) < Decimal(10) ** 8 else None
+
+
+def fill_numeric_values(apps, schema_editor):
+    Equipment = apps.get_model("core", "Equipment")
+    db_alias = schema_editor.connection.alias
+    stations = list(Equipment.objects.using(db_alias).only(*NUMERIC_FIELDS))
+    for station in stations:
+        for field in NUMERIC_FIELDS:
+            setattr(station, f"{field}_value", parse_number(getattr(station, field)))
+    Equipment.objects.using(db_alias).bulk_update(
+        stations, [f"{field}_value" for field in NUMERIC_FIELDS], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0014_result_sort_keys"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="equipment",
+            name="air_supply_bar_value",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="equipment",
+            name="air_supply_diam_value",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="equipment",
+            name="height_value",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="equipment",
+            name="length_value",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="equipment",
+            name="power_kw_value",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="equipment",
+            name="weight_value",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.AddField(
+            model_name="equipment",
+            name="width_value",
+            field=models.DecimalField(
+                blank=True, decimal_places=2, editable=False, max_digits=10, null=True
+            ),
+        ),
+        migrations.RunPython(fill_numeric_values, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:22
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_items_to_equipment(apps, schema_editor):
+    """Resolve each BOM station string to its Equipment row (one UPDATE); unknown names stay unassigned."""
+    BomItem = apps.get_model("core", "BomItem")
+    Equipment = apps.get_model("core", "Equipment")
+    BomItem.objects.using(schema_editor.connection.alias).update(
+        equipment_id=models.Subquery(
+            Equipment.objects.filter(station=models.OuterRef("station")).values("id")[:1]
+        )
+    )
+
+
+def copy_station_names(apps, schema_editor):
+    BomItem = apps.get_model("core", "BomItem")
+    Equipment = apps.get_model("core", "Equipment")
+    BomItem.objects.using(schema_editor.connection.alias).filter(equipment__isnull=False).update(
+        station=models.Subquery(
+            Equipment.objects.filter(pk=models.OuterRef("equipment_id")).values("station")[:1]
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0015_equipment_numeric_values"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="bomitem",
+            options={"ordering": ["order", "id"]},
+        ),
+        migrations.AddField(
+            model_name="bomitem",
+            name="equipment",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="bom_items",
+                to="core.equipment",
+            ),
+        ),
+        migrations.RunPython(link_items_to_equipment, copy_station_names),
+        migrations.RemoveField(
+            model_name="bomitem",
+            name="station",
+        ),
+    ]
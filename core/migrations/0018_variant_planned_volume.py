@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 15:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0017_project"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="variant",
+            name="planned_volume",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
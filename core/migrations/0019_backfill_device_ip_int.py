@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:20
+
+import ipaddress
+
+from django.db import migrations
+
+
+def backfill_ip_int(apps, schema_editor):
+    """Fill ip_int on devices loaded from fixtures after 0008, which bypassed save()."""
+    EquipmentDevice = apps.get_model("core", "EquipmentDevice")
+    db_alias = schema_editor.connection.alias
+    devices = []
+    for device in EquipmentDevice.objects.using(db_alias).filter(ip_int__isnull=True).exclude(ip_address=""):
+        try:
+            ip = ipaddress.ip_address(device.ip_address.strip())
+        except ValueError:
+            continue
+        if ip.version == 4:
+            device.ip_int = int(ip)
+            devices.append(device)
+    EquipmentDevice.objects.using(db_alias).bulk_update(devices, ["ip_int"], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0018_variant_planned_volume"),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_ip_int, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-19 16:40
+
+import re
+from decimal import Decimal
+
+from django.db import migrations
+
+# Copy of core.models.parse_number at the time of this migration
+NUMBER_RE = re.compile(r"-?\d+(?:[.,]\d+)?")
+NUMERIC_FIELDS = [
+    "power_kw",
+    "air_supply_bar",
+    "air_supply_diam",
+    "height",
+    "width",
+    "length",
+    "weight",
+]
+
+
+def parse_number(text):
+    match = NUMBER_RE.search(text or "")
+    if not match:
+        return None
+    value = Decimal(match.group().replace(",", ".")).quantize(Decimal("0.01"))
+    return value if abs(value) < Decimal(10) ** 8 else None
+
+
+def refill_numeric_values(apps, schema_editor):
+    """Re-parse every station: rows loaded from fixtures after 0015 bypassed save() and have none."""
+    Equipment = apps.get_model("core", "Equipment")
+    db_alias = schema_editor.connection.alias
+    stations = list(Equipment.objects.using(db_alias).only(*NUMERIC_FIELDS))
+    for station in stations:
+        for field in NUMERIC_FIELDS:
+            setattr(station, f"{field}_value", parse_number(getattr(station, field)))
+    Equipment.objects.using(db_alias).bulk_update(
+        stations, [f"{field}_value" for field in NUMERIC_FIELDS], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0019_backfill_device_ip_int"),
+    ]
+
+    operations = [
+        migrations.RunPython(refill_numeric_values, migrations.RunPython.noop),
+    ]
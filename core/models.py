@@ -1,5 +1,88 @@
-from django.db import models
+import re
+from decimal import Decimal
 
+from django.db import connections, models
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from .tenancy import current_database
+
+
+def _upsert(model, values, unique_fields, update_sql, returning):
+    """INSERT ... ON CONFLICT (unique_fields) DO UPDATE SET update_sql RETURNING returning, in one statement.
+
+    `values` maps columns to already-adapted values or RawSQL scalar subqueries.
+    In `update_sql`, bare column names are the stored row and `excluded.<column>`
+    the values being inserted. Nothing is looked up first: missing foreign keys
+    fail on the (deferred) constraints when the transaction commits.
+    """
+    connection = connections[current_database()]
+    quote = connection.ops.quote_name
+    placeholders, params = [], []
+    for value in values.values():
+        if isinstance(value, RawSQL):
+            placeholders.append(f'({value.sql})')
+            params.extend(value.params)
+        else:
+            placeholders.append('%s')
+            params.append(value)
+    columns = ', '.join(quote(column) for column in values)
+    placeholders = ', '.join(placeholders)
+    conflict = ', '.join(quote(column) for column in unique_fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} ({columns}) VALUES ({placeholders}) '
+            f'ON CONFLICT ({conflict}) DO UPDATE SET {update_sql} RETURNING {returning}',
+            params,
+        )
+        return cursor.fetchone()[0]
+
+
+def _sort_key_sql(item_model, item_id):
+    """Scalar subquery for a checklist item's sort key; NULL (a NOT NULL failure) if the item is missing."""
+    sql, params = item_model.with_sort_keys().filter(pk=item_id).values('sort_key').query.sql_with_params()
+    return RawSQL(sql, params)
+
+
+def _now_db():
+    return connections[current_database()].ops.adapt_datetimefield_value(timezone.now())
+
+
+_NUMBER_RE = re.compile(r'-?\d+(?:[.,]\d+)?')
+NUMBER_LIMIT = Decimal(10) ** 8
+
+
+def parse_number(text):
+    """First number in a free-text cell ('1,5', '1200 mm', '~300kg') as a Decimal; None if there is none."""
+    match = _NUMBER_RE.search(text or '')
+    if not match:
+        return None
+    value = Decimal(match.group().replace(',', '.')).quantize(Decimal('0.01'))
+    return value if abs(value) < NUMBER_LIMIT else None  # would not fit max_digits=10
+
+
+# Result rows carry category order * CATALOG_SORT_STRIDE + item order, so ordering
+# them needs no join to the catalog. Item orders must stay below the stride.
+CATALOG_SORT_STRIDE = 10000
+
+
+# --- PROJECT REGISTRY ---
+
+class Project(models.Model):
+    """A customer project. Its data lives in its own database (core.tenancy); this row stays in 'default'."""
+    name = models.CharField(max_length=200)
+    slug = models.SlugField(max_length=50, unique=True, help_text="Also names the project's database file")
+    is_archived = models.BooleanField(default=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['is_archived', 'name']
+
+    def __str__(self):
+        return self.name
+
+
+# --- EQUIPMENT AND CHECKLIST MODELS ---
 
 class Equipment(models.Model):
     """Stores equipment/station data for the production line."""
@@ -8,7 +91,7 @@ class Equipment(models.Model):
         ('Preh', 'Preh'),
     ]
 
-    station = models.CharField(max_length=50)
+    station = models.CharField(max_length=50, unique=True)
     owner = models.CharField(max_length=50, choices=OWNER_CHOICES)
     eq_number = models.CharField(max_length=50, verbose_name="Equipment Number")
     power_supply = models.CharField(max_length=100)
@@ -23,6 +106,28 @@ class Equipment(models.Model):
     # Photo fields
     photo_front = models.URLField(blank=True, verbose_name="Front Photo URL")
     photo_tag = models.URLField(blank=True, verbose_name="Tag Photo URL")
+    # Bumped on every save and every write that changes a rendered row; part of the row
+    # fragment cache key and of the validation analytics data version
+    row_version = models.PositiveIntegerField(default=0, editable=False)
+    # Numeric forms of the free-text columns above, kept in sync by core.signals for SQL aggregates
+    power_kw_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    air_supply_bar_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    air_supply_diam_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    height_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    width_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    length_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    weight_value = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+
+    # Text column -> numeric shadow column
+    NUMERIC_FIELDS = {
+        'power_kw': 'power_kw_value',
+        'air_supply_bar': 'air_supply_bar_value',
+        'air_supply_diam': 'air_supply_diam_value',
+        'height': 'height_value',
+        'width': 'width_value',
+        'length': 'length_value',
+        'weight': 'weight_value',
+    }
 
     class Meta:
         ordering = ['id']
@@ -31,6 +136,25 @@ class Equipment(models.Model):
     def __str__(self):
         return f"{self.station} ({self.eq_number})"
 
+    def save(self, *args, **kwargs):
+        # The *_value columns are parsed in a pre_save receiver (core.signals), which loaddata also runs
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {
+                *update_fields, *(self.NUMERIC_FIELDS[field] for field in update_fields if field in self.NUMERIC_FIELDS)
+            }
+        super().save(*args, **kwargs)
+        self.bump_row_version()
+
+    def sync_numeric_fields(self):
+        """Parse the text columns into their *_value columns (bulk_create/bulk_update skip save())."""
+        for text_field, value_field in self.NUMERIC_FIELDS.items():
+            setattr(self, value_field, parse_number(getattr(self, text_field)))
+
+    def bump_row_version(self):
+        """Invalidate the cached Equipment/IPs table rows and the validation analytics for this equipment."""
+        Equipment.objects.filter(pk=self.pk).update(row_version=models.F('row_version') + 1)
+
     def get_validation_progress(self):
         """Calculate validation progress percentage based on OK results."""
         from core.models import ValidationChecklistItem
@@ -85,6 +209,13 @@ class ValidationChecklistItem(models.Model):
     def __str__(self):
         return f"{self.category.code}_{self.order}: {self.test[:50]}..."
 
+    @classmethod
+    def with_sort_keys(cls):
+        """Items annotated with the `sort_key` their results carry."""
+        return cls.objects.order_by().annotate(
+            sort_key=models.F('category__order') * CATALOG_SORT_STRIDE + models.F('order')
+        )
+
 
 class ValidationResult(models.Model):
     """Stores OK/NOK results per equipment per checklist item."""
@@ -106,14 +237,33 @@ class ValidationResult(models.Model):
     status = models.CharField(max_length=3, choices=STATUS_CHOICES)
     validated_at = models.DateTimeField(auto_now=True)
     validated_by = models.CharField(max_length=100, blank=True)
+    # Catalog position of checklist_item (see CATALOG_SORT_STRIDE), kept in sync by core.signals
+    sort_key = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = ['equipment', 'checklist_item']
-        ordering = ['checklist_item__category__order', 'checklist_item__order']
+        ordering = ['sort_key']
+        indexes = [
+            models.Index(fields=['equipment', 'sort_key']),
+            models.Index(fields=['equipment', 'status']),
+        ]
 
     def __str__(self):
         return f"{self.equipment.station} - {self.checklist_item} = {self.status}"
 
+    @classmethod
+    def set_status(cls, equipment_id, checklist_item_id, status):
+        """Insert or overwrite the result in a single statement."""
+        return _upsert(
+            cls,
+            {'equipment_id': equipment_id, 'checklist_item_id': checklist_item_id,
+             'status': status, 'validated_at': _now_db(), 'validated_by': '',
+             'sort_key': _sort_key_sql(ValidationChecklistItem, checklist_item_id)},
+            ['equipment_id', 'checklist_item_id'],
+            'status = excluded.status, validated_at = excluded.validated_at',
+            'status',
+        )
+
 
 class EquipmentDevice(models.Model):
     """Stores IP addresses and device info for equipment (PLCs, HMIs, Vision Sensors, etc.)."""
@@ -125,12 +275,35 @@ class EquipmentDevice(models.Model):
     device_type = models.CharField(max_length=100, verbose_name="Equipment Type", blank=True)
     name = models.CharField(max_length=100, blank=True)
     ip_address = models.CharField(max_length=45, blank=True)  # Changed to CharField to allow empty
+    # Integer form of an IPv4 ip_address, kept in sync by core.signals for indexed conflict/subnet queries
+    ip_int = models.BigIntegerField(null=True, blank=True, editable=False, db_index=True)
+    # Reachability, written by the device sweep (core.network.sweep_devices)
+    is_reachable = models.BooleanField(null=True, editable=False)
+    latency_ms = models.FloatField(null=True, blank=True, editable=False)
+    last_checked_at = models.DateTimeField(null=True, blank=True, editable=False)
+    last_seen_at = models.DateTimeField(null=True, blank=True, editable=False)
 
     class Meta:
-        ordering = ['equipment__id', 'id']
+        ordering = ['equipment_id', 'id']  # served by the equipment_id index (SQLite appends the rowid)
 
     def __str__(self):
         return f"{self.name} ({self.ip_address})"
+
+    def save(self, *args, **kwargs):
+        # ip_int itself is derived in a pre_save receiver (core.signals), which loaddata also runs
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'ip_address' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'ip_int'}
+        super().save(*args, **kwargs)
+
+    def find_ip_conflicts(self, ip_address):
+        """Other devices already using `ip_address` (an index lookup on ip_int)."""
+        from core.network import ip_to_int
+        ip_int = ip_to_int(ip_address)
+        others = EquipmentDevice.objects.exclude(pk=self.pk).select_related('equipment')
+        if ip_int is not None:
+            return others.filter(ip_int=ip_int)
+        return others.filter(ip_address=ip_address)
     
     def is_complete(self):
         """Returns True if all 3 fields are filled."""
@@ -169,6 +342,13 @@ class DocumentationChecklistItem(models.Model):
     def __str__(self):
         return f"{self.category.code}_{self.order}: {self.item_key}"
 
+    @classmethod
+    def with_sort_keys(cls):
+        """Items annotated with the `sort_key` their results carry."""
+        return cls.objects.order_by().annotate(
+            sort_key=models.F('category__order') * CATALOG_SORT_STRIDE + models.F('order')
+        )
+
 
 class DocumentationResult(models.Model):
     """Stores checked/unchecked state per equipment per checklist item."""
@@ -184,15 +364,121 @@ class DocumentationResult(models.Model):
     )
     is_checked = models.BooleanField(default=False)
     updated_at = models.DateTimeField(auto_now=True)
+    # Catalog position of checklist_item (see CATALOG_SORT_STRIDE), kept in sync by core.signals
+    sort_key = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         unique_together = ['equipment', 'checklist_item']
-        ordering = ['checklist_item__category__order', 'checklist_item__order']
+        ordering = ['sort_key']
+        indexes = [
+            models.Index(fields=['equipment', 'sort_key']),
+            models.Index(fields=['equipment', 'is_checked']),
+        ]
 
     def __str__(self):
         status = "✓" if self.is_checked else "○"
         return f"{self.equipment.station} - {self.checklist_item.item_key} = {status}"
 
+    @classmethod
+    def toggle(cls, equipment_id, checklist_item_id):
+        """Flip is_checked in a single statement (a missing row counts as unchecked); returns the new value."""
+        return bool(_upsert(
+            cls,
+            {'equipment_id': equipment_id, 'checklist_item_id': checklist_item_id,
+             'is_checked': True, 'updated_at': _now_db(),
+             'sort_key': _sort_key_sql(DocumentationChecklistItem, checklist_item_id)},
+            ['equipment_id', 'checklist_item_id'],
+            'is_checked = NOT is_checked, updated_at = excluded.updated_at',
+            'is_checked',
+        ))
+
+
+# --- AUDIT LOG MODELS ---
+
+class ValidationEvent(models.Model):
+    """Append-only log of validation (OK/NOK) and documentation (checked) changes.
+
+    Rows are never updated or deleted, and survive deletion of their equipment
+    (no DB constraint), so past states can be replayed for audits.
+    """
+    KIND_VALIDATION = 'V'
+    KIND_DOCUMENTATION = 'D'
+    KIND_CHOICES = [
+        (KIND_VALIDATION, 'Validation'),
+        (KIND_DOCUMENTATION, 'Documentation'),
+    ]
+
+    equipment = models.ForeignKey(
+        Equipment,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='validation_events'
+    )
+    kind = models.CharField(max_length=1, choices=KIND_CHOICES)
+    item_id = models.PositiveIntegerField()  # ValidationChecklistItem or DocumentationChecklistItem id
+    value = models.BooleanField()  # OK / checked
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['equipment', 'created_at'])]
+
+    def __str__(self):
+        return f"{self.equipment_id} {self.kind}{self.item_id}={int(self.value)} @ {self.created_at:%Y-%m-%d %H:%M}"
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError("Validation events are append-only")
+        super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        raise ValueError("Validation events are append-only")
+
+
+class ValidationSnapshot(models.Model):
+    """Checkpoint of one equipment's replayed state, so point-in-time reads replay few events."""
+    equipment = models.ForeignKey(
+        Equipment,
+        on_delete=models.DO_NOTHING,
+        db_constraint=False,
+        related_name='validation_snapshots'
+    )
+    last_event_id = models.PositiveBigIntegerField()  # events up to and including this id are folded in
+    taken_at = models.DateTimeField()  # created_at of that event
+    state = models.JSONField()  # {"V": {item_id: bool}, "D": {item_id: bool}}
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['equipment', 'taken_at'])]
+
+    def __str__(self):
+        return f"{self.equipment_id} @ {self.taken_at:%Y-%m-%d %H:%M}"
+
+
+# --- DASHBOARD MODELS ---
+
+class KpiSummary(models.Model):
+    """Materialized dashboard KPIs, one row per (metric, key); rebuilt as a whole by core.kpi."""
+    metric = models.CharField(max_length=30)  # e.g., 'validation_station'
+    key = models.CharField(max_length=100)  # e.g., equipment id, owner, variant id, date
+    label = models.CharField(max_length=200)
+    value = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    position = models.PositiveIntegerField(default=0)
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ['metric', 'position']
+        unique_together = ['metric', 'key']
+        verbose_name_plural = "KPI Summary"
+
+    def __str__(self):
+        return f"{self.metric}/{self.label}: {self.value}/{self.total}"
+
+    @property
+    def percent(self):
+        return round(self.value * 100 / self.total) if self.total else 0
+
 
 # --- BOM AND VISUAL AIDS MODELS ---
 
@@ -201,6 +487,8 @@ class Variant(models.Model):
     name = models.CharField(max_length=100, unique=True)
     color = models.CharField(max_length=7, default='#bdd7ee')  # Hex color
     order = models.PositiveIntegerField(default=0)
+    # Units of this variant in the production plan, for the material requirements report
+    planned_volume = models.PositiveIntegerField(default=0)
 
     class Meta:
         ordering = ['order']
@@ -211,7 +499,14 @@ class Variant(models.Model):
 
 class BomItem(models.Model):
     """Bill of Materials items."""
-    station = models.CharField(max_length=100)
+    # Null until a station is picked; station renames follow automatically, deletions cascade
+    equipment = models.ForeignKey(
+        Equipment,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='bom_items'
+    )
     part_number = models.CharField(max_length=100, verbose_name="Material/Part Number")
     description = models.TextField(blank=True)
     quantity = models.PositiveIntegerField(default=1)
@@ -221,11 +516,16 @@ class BomItem(models.Model):
     variants = models.ManyToManyField(Variant, through='BomItemVariant', related_name='bom_items')
 
     class Meta:
-        ordering = ['order', 'station']
+        ordering = ['order', 'id']
 
     def __str__(self):
         return f"{self.station} - {self.part_number}"
 
+    @property
+    def station(self):
+        """Name of the linked station ('' if unassigned); select_related('equipment') when listing."""
+        return self.equipment.station if self.equipment_id else ''
+
 
 class BomItemVariant(models.Model):
     """Through table linking BOM items to variants with applicability status."""
@@ -240,6 +540,17 @@ class BomItemVariant(models.Model):
         status = "X" if self.is_applicable else "-"
         return f"{self.bom_item.part_number} | {self.variant.name}: {status}"
 
+    @classmethod
+    def toggle(cls, bom_item_id, variant_id):
+        """Flip is_applicable in a single statement (a missing row counts as not applicable); returns the new value."""
+        return bool(_upsert(
+            cls,
+            {'bom_item_id': bom_item_id, 'variant_id': variant_id, 'is_applicable': True},
+            ['bom_item_id', 'variant_id'],
+            'is_applicable = NOT is_applicable',
+            'is_applicable',
+        ))
+
 
 class DocHistoryItem(models.Model):
     """Document history/revision entries."""
@@ -0,0 +1,234 @@
+import asyncio
+import ipaddress
+import threading
+import time
+
+
+# Default station subnet used when auto-assigning device addresses
+DEFAULT_STATION_SUBNET = '172.19.123.0/24'
+
+
+def normalize_ip(value):
+    """Return the canonical text form of an IP address ('' for blank input).
+
+    Raises ValueError for anything that is not a valid IPv4/IPv6 address.
+    """
+    value = (value or '').strip()
+    if not value:
+        return ''
+    return str(ipaddress.ip_address(value))
+
+
+def ip_to_int(value):
+    """Integer form of an IPv4 address for indexed lookups; None if blank, invalid or IPv6."""
+    try:
+        ip = ipaddress.ip_address((value or '').strip())
+    except ValueError:
+        return None
+    return int(ip) if ip.version == 4 else None
+
+
+class SubnetExhausted(Exception):
+    """Raised when a subnet has no free host addresses left."""
+
+
+class SubnetAllocator:
+    """Hands out free host addresses from a subnet, never reusing a taken one.
+
+    Used addresses are kept in a set of host integers, so each allocation is a
+    constant-time membership check while a cursor walks upwards through the
+    usable host range (network and broadcast addresses are never returned).
+    """
+
+    def __init__(self, subnet=DEFAULT_STATION_SUBNET, used=()):
+        self.network = ipaddress.ip_network(subnet)
+        self._first = int(self.network.network_address) + 1
+        self._last = int(self.network.broadcast_address) - 1
+        self._used = set()
+        self._cursor = self._first
+        for address in used:
+            self.reserve(address)
+
+    @classmethod
+    def from_devices(cls, subnet=DEFAULT_STATION_SUBNET):
+        """Build an allocator seeded with every device IP already in the subnet."""
+        from core.models import EquipmentDevice
+        allocator = cls(subnet)
+        used = EquipmentDevice.objects.filter(
+            ip_int__range=(allocator._first, allocator._last)
+        ).values_list('ip_int', flat=True)
+        for address in used:
+            allocator.reserve(address)
+        return allocator
+
+    def reserve(self, address):
+        """Mark an address (text or integer) as used; outside or malformed ones are ignored."""
+        try:
+            ip = ipaddress.ip_address(address if isinstance(address, int) else str(address).strip())
+        except ValueError:
+            return
+        if ip in self.network:
+            self._used.add(int(ip))
+
+    def is_free(self, address):
+        ip = ipaddress.ip_address(address)
+        return ip in self.network and int(ip) not in self._used
+
+    def allocate(self):
+        """Return the lowest free host address as a string."""
+        while self._cursor <= self._last:
+            host = self._cursor
+            self._cursor += 1
+            if host not in self._used:
+                self._used.add(host)
+                return str(ipaddress.ip_address(host))
+        raise SubnetExhausted(f"No free addresses left in {self.network}")
+
+    def allocate_many(self, count):
+        """Return `count` free addresses, or raise without consuming any."""
+        cursor, used = self._cursor, set(self._used)
+        try:
+            return [self.allocate() for _ in range(count)]
+        except SubnetExhausted:
+            self._cursor, self._used = cursor, used
+            raise
+
+
+# --- Reachability sweep ---
+
+async def _tcp_connect(host, port):
+    """Time one TCP connect; a refused connection still proves the host is up."""
+    start = time.perf_counter()
+    try:
+        _, writer = await asyncio.open_connection(host, port)
+    except ConnectionRefusedError:
+        pass
+    else:
+        writer.close()
+    return (time.perf_counter() - start) * 1000
+
+
+async def probe(host, ports, timeout):
+    """Probe `ports` on `host` in parallel; return latency (ms) of the first answer, or None.
+
+    `timeout` bounds the whole host, not each port.
+    """
+    tasks = [asyncio.ensure_future(_tcp_connect(host, port)) for port in ports]
+    try:
+        for next_done in asyncio.as_completed(tasks, timeout=timeout):
+            try:
+                return await next_done
+            except OSError:
+                continue  # no route / unreachable on this port
+        return None
+    except asyncio.TimeoutError:
+        return None
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def sweep(hosts, ports, timeout, concurrency, prober=probe):
+    """Probe many hosts with at most `concurrency` in flight; returns {host: latency or None}.
+
+    `prober` is a coroutine function with probe()'s signature.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded(host):
+        async with semaphore:
+            return await prober(host, ports, timeout)
+
+    latencies = await asyncio.gather(*(bounded(host) for host in hosts))
+    return dict(zip(hosts, latencies))
+
+
+def sweep_devices(ports=None, timeout=None, concurrency=None, prober=probe):
+    """Probe every device with an IPv4 address and store reachability per device.
+
+    Defaults come from the DEVICE_SWEEP_* settings. Returns (online, checked).
+    """
+    from django.conf import settings
+    from django.db.models import F
+    from django.utils import timezone
+    from core.models import Equipment, EquipmentDevice
+    from core.tenancy import atomic
+
+    devices = list(
+        EquipmentDevice.objects.filter(ip_int__isnull=False)
+        .only('id', 'equipment_id', 'ip_address', 'last_seen_at')
+    )
+    hosts = sorted({device.ip_address for device in devices})
+    results = asyncio.run(sweep(
+        hosts,
+        ports or settings.DEVICE_SWEEP_PORTS,
+        timeout or settings.DEVICE_SWEEP_TIMEOUT,
+        concurrency or settings.DEVICE_SWEEP_CONCURRENCY,
+        prober,
+    ))
+
+    now = timezone.now()
+    for device in devices:
+        device.latency_ms = results[device.ip_address]
+        device.is_reachable = device.latency_ms is not None
+        device.last_checked_at = now
+        if device.is_reachable:
+            device.last_seen_at = now
+
+    with atomic():
+        EquipmentDevice.objects.bulk_update(
+            devices, ['is_reachable', 'latency_ms', 'last_checked_at', 'last_seen_at'], batch_size=500
+        )
+        Equipment.objects.filter(pk__in={device.equipment_id for device in devices}).update(
+            row_version=F('row_version') + 1
+        )
+    return sum(device.is_reachable for device in devices), len(devices)
+
+
+# State of the in-process background sweeps started from the IPs page, per database alias
+_sweep_lock = threading.Lock()
+_sweep_states = {}
+
+
+def _sweep_state(alias):
+    return _sweep_states.setdefault(
+        alias, {'running': False, 'online': None, 'checked': None, 'finished_at': None, 'error': ''}
+    )
+
+
+def sweep_status():
+    from core.tenancy import current_database
+    with _sweep_lock:
+        return dict(_sweep_state(current_database()))
+
+
+def start_background_sweep():
+    """Run sweep_devices() for the current project in a daemon thread; False if one is already running."""
+    from core.tenancy import current_database
+    alias = current_database()
+    with _sweep_lock:
+        if _sweep_state(alias)['running']:
+            return False
+        _sweep_state(alias).update(running=True, error='')
+
+    def run():
+        from django.db import connections
+        from django.utils import timezone
+        from core.tenancy import use_database
+        result, error = (None, None), ''
+        try:
+            with use_database(alias):
+                result = sweep_devices()
+        except Exception as exc:  # report to the polling UI instead of dying silently
+            error = str(exc)
+        finally:
+            connections[alias].close()  # this thread's own DB connection
+            with _sweep_lock:
+                _sweep_state(alias).update(
+                    running=False, online=result[0], checked=result[1],
+                    finished_at=timezone.now(), error=error,
+                )
+
+    threading.Thread(target=run, name='device-sweep', daemon=True).start()
+    return True
@@ -0,0 +1,146 @@
+"""Opt-in request profiling for staff, and a log of slow or repeated SQL naming the view that ran it."""
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import threading
+import time
+import traceback
+from collections import Counter
+from contextvars import ContextVar
+from datetime import datetime
+
+from django.conf import settings
+
+
+PROFILE_PARAM = 'profile'  # ?profile=1 on any page
+PROFILE_HEADER = 'HTTP_X_PROFILE'  # X-Profile: 1 (for URLs that reject unknown parameters, e.g. the admin)
+STACK_DEPTH = 5  # application frames logged with a query
+REPORT_LINES = 60
+
+_PROFILE_NAME_RE = re.compile(r'^(?P<stamp>\d{8}-\d{6})-(?P<view>[\w.-]+)-(?P<ms>\d+)ms\.prof$')
+
+logger = logging.getLogger(__name__)
+
+# Per-request state shared with the query logger: the resolved view and SQL repeat counts
+_request_state = ContextVar('profiling_request', default=None)
+
+
+class ProfilingMiddleware:
+    """Tracks the view each request resolves to, and runs it under cProfile when a staff user asks."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _request_state.set({'view': request.path, 'counts': Counter()})
+        try:
+            if not self._requested(request):
+                return self.get_response(request)
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            response = profiler.runcall(self.get_response, request)
+            response['X-Profile'] = save_profile(profiler, _request_state.get()['view'], time.perf_counter() - started)
+            return response
+        finally:
+            _request_state.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _request_state.get()['view'] = f'{view_func.__module__}.{view_func.__qualname__}'
+
+    def _requested(self, request):
+        # The user is only loaded for requests that ask, so others cost nothing
+        return (PROFILE_PARAM in request.GET or request.META.get(PROFILE_HEADER)) and request.user.is_staff
+
+
+# --- PROFILE FILES ---
+
+def save_profile(profiler, view, elapsed):
+    """Dump the stats to PROFILE_DIR (pstats format, e.g. for snakeviz) and return the file name."""
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    slug = re.sub(r'[^\w.]+', '-', view).strip('-')
+    name = f"{datetime.now():%Y%m%d-%H%M%S}-{slug}-{elapsed * 1000:.0f}ms.prof"
+    profiler.dump_stats(os.path.join(settings.PROFILE_DIR, name))
+    for old in list_profiles()[settings.PROFILES_KEPT:]:
+        os.remove(os.path.join(settings.PROFILE_DIR, old['name']))
+    return name
+
+
+def list_profiles():
+    """Saved profiles, newest first: [{'name', 'view', 'duration_ms', 'created', 'size'}]."""
+    try:
+        entries = list(os.scandir(settings.PROFILE_DIR))
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for entry in entries:
+        match = _PROFILE_NAME_RE.match(entry.name)
+        if match and entry.is_file():
+            profiles.append({
+                'name': entry.name,
+                'view': match['view'],
+                'duration_ms': int(match['ms']),
+                'created': datetime.strptime(match['stamp'], '%Y%m%d-%H%M%S'),
+                'size': entry.stat().st_size,
+            })
+    return sorted(profiles, key=lambda profile: profile['name'], reverse=True)
+
+
+def profile_path(name):
+    """Filesystem path of the saved profile `name`, or None if there is no such profile."""
+    if not _PROFILE_NAME_RE.match(name) or not os.path.isfile(os.path.join(settings.PROFILE_DIR, name)):
+        return None
+    return os.path.join(settings.PROFILE_DIR, name)
+
+
+def profile_report(path, sort='cumulative'):
+    """The top REPORT_LINES functions of a saved profile as pstats text."""
+    stream = io.StringIO()
+    pstats.Stats(path, stream=stream).sort_stats(sort).print_stats(REPORT_LINES)
+    return stream.getvalue()
+
+
+# --- SLOW QUERY LOG ---
+
+def _origin():
+    """The innermost application frames (outside Django and this module) that issued the query."""
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(str(settings.BASE_DIR))
+        and 'site-packages' not in frame.filename and frame.filename != __file__
+    ]
+    return ''.join(
+        f'  {os.path.relpath(frame.filename, settings.BASE_DIR)}:{frame.lineno} in {frame.name}\n'
+        for frame in frames[-STACK_DEPTH:]
+    ) or '  (no application frame)\n'
+
+
+def log_queries(execute, sql, params, many, context):
+    """Execute wrapper: logs queries over SLOW_QUERY_THRESHOLD, and SQL one request repeats too often."""
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        state = _request_state.get()
+        view = state['view'] if state else threading.current_thread().name
+        if elapsed >= settings.SLOW_QUERY_THRESHOLD:
+            logger.warning(
+                "Slow query (%.0f ms) in %s on %s: %s\n%s",
+                elapsed * 1000, view, context['connection'].alias, sql, _origin(),
+            )
+        if state is not None:
+            state['counts'][sql] += 1
+            if state['counts'][sql] == settings.REPEATED_QUERY_THRESHOLD:  # logged once per request
+                logger.warning(
+                    "Query repeated %d times in %s (N+1?): %s\n%s",
+                    settings.REPEATED_QUERY_THRESHOLD, view, sql, _origin(),
+                )
+
+
+def install_query_logger(sender, connection, **kwargs):
+    """connection_created receiver: every connection (any alias, any thread) runs through log_queries."""
+    if log_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_queries)
@@ -0,0 +1,192 @@
+"""Read replicas: read-only page views read a refreshed copy of their database, writes go to the primary.
+
+Every database alias (the shared workspace and each project) can have a
+'<alias>_replica'. For SQLite it is a file under READ_REPLICA_DIR that a
+background thread refreshes with the online backup API whenever the primary
+has committed something new; on a server database it is whatever DATABASES
+configures under that name (e.g. a streaming standby), used as is.
+
+Only views decorated with @replica_reads use it, and only for core models.
+A client that wrote within READ_REPLICA_STICKY seconds reads the primary, and
+so does the rest of a request once it has written anything.
+"""
+import contextvars
+import functools
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+
+REPLICA_SUFFIX = '_replica'
+STICKY_COOKIE = 'read_primary'
+SAFE_METHODS = {'GET', 'HEAD', 'OPTIONS', 'TRACE'}
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+_wrote = contextvars.ContextVar('replica_wrote', default=False)
+_replica_lock = threading.Lock()
+_refreshing = set()  # aliases with a refresh thread
+_ready = set()  # aliases whose replica holds at least one complete copy
+
+
+def replica_alias(alias):
+    return f'{alias}{REPLICA_SUFFIX}'
+
+
+def primary_alias(alias):
+    return alias[:-len(REPLICA_SUFFIX)] if alias.endswith(REPLICA_SUFFIX) else alias
+
+
+def read_database(alias):
+    """The alias reads should use: the replica inside @replica_reads once it is available, else `alias`."""
+    if not _replica_reads.get() or _wrote.get():
+        return alias
+    replica = replica_alias(alias)
+    with _replica_lock:
+        if alias in _ready or (replica in connections.settings and alias not in _refreshing):
+            return replica
+    _start_refreshing(alias)
+    return alias  # until the first copy is complete
+
+
+def written():
+    """Called by the router for every write: the rest of this request reads what it wrote."""
+    _wrote.set(True)
+
+
+@contextmanager
+def primary_reads():
+    """Read from the primary inside the block, e.g. to decide what to write."""
+    token = _replica_reads.set(False)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads(view):
+    """Let a read-only view read from the replica, unless its client wrote recently."""
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        use_replica = settings.READ_REPLICA_ENABLED and STICKY_COOKIE not in request.COOKIES
+        token, wrote_token = _replica_reads.set(use_replica), _wrote.set(False)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _replica_reads.reset(token)
+            _wrote.reset(wrote_token)
+    return wrapper
+
+
+class ReplicaStickinessMiddleware:
+    """After a write request, pins its client to the primary for READ_REPLICA_STICKY seconds."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in SAFE_METHODS and settings.READ_REPLICA_ENABLED:
+            response.set_cookie(
+                STICKY_COOKIE, '1', max_age=settings.READ_REPLICA_STICKY, httponly=True, samesite='Lax',
+            )
+        return response
+
+
+# --- SQLITE REFRESH ---
+
+def _is_file_database(config):
+    """True for a SQLite database in a plain file, which the backup thread can copy.
+
+    In-memory databases (':memory:' or a 'mode=memory' URI, like Django's test
+    databases) and other 'file:' URIs get no replica: the thread opens paths.
+    """
+    name = str(config['NAME'])
+    return (
+        config['ENGINE'] == 'django.db.backends.sqlite3'
+        and not name.startswith((':memory:', 'file:')) and 'mode=memory' not in name
+    )
+
+
+def _start_refreshing(alias):
+    config = connections.settings[alias]
+    if not _is_file_database(config):
+        return
+    with _replica_lock:
+        if alias in _refreshing:
+            return
+        _refreshing.add(alias)
+        os.makedirs(settings.READ_REPLICA_DIR, exist_ok=True)
+        path = os.path.join(settings.READ_REPLICA_DIR, f'{alias}.sqlite3')
+        connections.settings[replica_alias(alias)] = dict(
+            config, NAME=f'file:{path}?mode=ro', TEST=dict(config.get('TEST') or {}, NAME=None),
+        )
+    threading.Thread(
+        target=_keep_refreshing, args=(alias, str(config['NAME']), path), name='replica-refresh', daemon=True,
+    ).start()
+
+
+def _take_lock(lock):
+    """Hold the lock file's exclusive SQLite lock until `lock` closes (or the process exits)."""
+    try:
+        lock.execute('BEGIN EXCLUSIVE')
+        return True
+    except sqlite3.OperationalError:  # another process refreshes this replica
+        return False
+
+
+def _copied_since_locked(replica_path, lock_path):
+    """Whether the replica was written after the current lock holder took the lock."""
+    try:
+        return os.stat(replica_path).st_mtime_ns >= os.stat(lock_path).st_mtime_ns
+    except FileNotFoundError:
+        return False
+
+
+def _mark_ready(alias):
+    with _replica_lock:
+        _ready.add(alias)
+
+
+def _keep_refreshing(alias, source_path, replica_path):
+    """Copy the primary into the replica file in place whenever it has changed.
+
+    Every worker process runs this thread, but only the one holding the lock
+    file next to the replica copies; the others use the replica once the
+    holder has written it and take over if the holder exits.
+
+    PRAGMA data_version moves when another connection commits, so an idle
+    database costs one pragma per interval. The copy happens in a single
+    backup step under the primary's read lock, so it is always consistent;
+    readers of the replica wait for the step like for any other writer.
+    """
+    lock_path = f'{replica_path}.lock'
+    lock = sqlite3.connect(lock_path, timeout=0, isolation_level=None)
+    source = target = None
+    try:
+        while not _take_lock(lock):
+            if _copied_since_locked(replica_path, lock_path):
+                _mark_ready(alias)
+            time.sleep(settings.READ_REPLICA_REFRESH)
+        os.utime(lock_path)  # copies made before now are an earlier holder's
+        source = sqlite3.connect(source_path)
+        target = sqlite3.connect(replica_path)
+        copied_version = None
+        while True:
+            try:
+                version = source.execute('PRAGMA data_version').fetchone()[0]
+                if version != copied_version:
+                    source.backup(target)
+                    copied_version = version
+                    _mark_ready(alias)
+            except sqlite3.Error:
+                pass  # keep the previous copy; the next round tries again
+            time.sleep(settings.READ_REPLICA_REFRESH)
+    finally:
+        for connection in (target, source, lock):
+            if connection is not None:
+                connection.close()
@@ -0,0 +1,175 @@
+"""Global full-text search over an SQLite FTS5 table, kept in sync by core.signals.
+
+The table itself is created by migration 0011, which also holds a frozen copy
+of the documents below as SQL; keep the two in step when a document changes.
+"""
+import re
+
+from django.apps import apps
+from django.db import connections
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .tenancy import current_database
+
+
+SEARCH_TABLE = 'core_search'
+SEARCH_LIMIT = 20
+INDEX_BATCH_SIZE = 1000
+
+# rowid = pk << KIND_BITS | source code, so one indexed document maps back to its object
+KIND_BITS = 3
+
+# Sentinels wrapped around matches by highlight()/snippet(), swapped for <mark> after escaping
+_MARK_START, _MARK_END = '\x02', '\x03'
+
+
+class SearchSource:
+    """How one model is turned into a (title, body) document and linked from results."""
+
+    def __init__(self, code, label, model_name, document, url, select_related=()):
+        self.code = code
+        self.label = label
+        self.model_name = model_name
+        self.document = document
+        self.url = url
+        self.select_related = select_related
+
+
+SEARCH_SOURCES = [
+    SearchSource(
+        1, 'Station', 'Equipment',
+        lambda equip: (equip.station, f"{equip.eq_number} {equip.owner} {equip.power_supply}"),
+        lambda pk: f"{reverse('equipment')}#equipment-row-{pk}",
+    ),
+    SearchSource(
+        2, 'Device', 'EquipmentDevice',
+        lambda device: (device.name or device.device_type, f"{device.ip_address} {device.device_type} {device.equipment.station}"),
+        lambda pk: f"{reverse('equipment_ips')}#device-row-{pk}",
+        select_related=('equipment',),
+    ),
+    SearchSource(
+        3, 'BOM', 'BomItem',
+        lambda item: (item.part_number, f"{item.description} {item.station}"),
+        lambda pk: f"{reverse('bom')}#bom-row-{pk}",
+        select_related=('equipment',),
+    ),
+    SearchSource(
+        4, 'Checklist', 'ValidationChecklistItem',
+        lambda item: (f"{item.ref_iatf} / {item.ref_vda}", f"{item.test} {item.expected} {item.example}"),
+        lambda pk: reverse('validation'),
+    ),
+    SearchSource(
+        5, 'Revision', 'DocHistoryItem',
+        lambda item: (f"v{item.version} {item.register}", item.changes),
+        lambda pk: f"{reverse('bom')}?tab=history",
+    ),
+]
+SOURCES_BY_MODEL = {source.model_name: source for source in SEARCH_SOURCES}
+SOURCES_BY_CODE = {source.code: source for source in SEARCH_SOURCES}
+
+
+def _connection():
+    """Each project database carries its own index."""
+    return connections[current_database()]
+
+
+def search_enabled(connection=None):
+    return (connection or _connection()).vendor == 'sqlite'
+
+
+def _rowid(source, pk):
+    return pk << KIND_BITS | source.code
+
+
+def index_objects(objects, connection=None):
+    """(Re)index saved instances of any indexed model; others are ignored."""
+    connection = connection or _connection()
+    if not search_enabled(connection):
+        return
+    rows = []
+    for obj in objects:
+        source = SOURCES_BY_MODEL.get(obj._meta.object_name)
+        if source is not None:
+            rows.append((_rowid(source, obj.pk), *source.document(obj)))
+    with connection.cursor() as cursor:
+        for start in range(0, len(rows), INDEX_BATCH_SIZE):
+            cursor.executemany(
+                f"INSERT OR REPLACE INTO {SEARCH_TABLE} (rowid, title, body) VALUES (%s, %s, %s)",
+                rows[start:start + INDEX_BATCH_SIZE],
+            )
+
+
+def unindex_objects(objects):
+    if not search_enabled():
+        return
+    rowids = [
+        (_rowid(SOURCES_BY_MODEL[obj._meta.object_name], obj.pk),)
+        for obj in objects if obj._meta.object_name in SOURCES_BY_MODEL
+    ]
+    with _connection().cursor() as cursor:
+        cursor.executemany(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = %s", rowids)
+
+
+def rebuild_index(connection):
+    """Re-create every document from scratch in `connection`'s database."""
+    if not search_enabled(connection):
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {SEARCH_TABLE}")
+    for source in SEARCH_SOURCES:
+        queryset = (
+            apps.get_model('core', source.model_name).objects.using(connection.alias)
+            .select_related(*source.select_related)
+        )
+        batch = []
+        for obj in queryset.iterator(chunk_size=INDEX_BATCH_SIZE):
+            batch.append(obj)
+            if len(batch) >= INDEX_BATCH_SIZE:
+                index_objects(batch, connection)
+                batch = []
+        index_objects(batch, connection)
+
+
+def match_expression(text):
+    """User text -> FTS5 query: each whitespace term becomes a prefix phrase, terms are ANDed.
+
+    '172.18.1 plc' becomes '"172 18 1"* "plc"*', so partial IPs and part numbers match
+    the same way the tokenizer split them when indexing.
+    """
+    phrases = []
+    for term in text.split():
+        words = re.findall(r'\w+', term)
+        if words:
+            phrases.append('"' + ' '.join(words) + '"*')
+    return ' '.join(phrases)
+
+
+def _highlighted(text):
+    return mark_safe(escape(text).replace(_MARK_START, '<mark>').replace(_MARK_END, '</mark>'))
+
+
+def query_index(text, limit=SEARCH_LIMIT):
+    """Best BM25 matches for `text` as dicts with label, title, snippet and url."""
+    expression = match_expression(text)
+    if not expression or not search_enabled():
+        return []
+    with _connection().cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid, highlight({SEARCH_TABLE}, 0, %s, %s), snippet({SEARCH_TABLE}, 1, %s, %s, '…', 10) "
+            f"FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s "
+            f"ORDER BY bm25({SEARCH_TABLE}, 10.0, 1.0) LIMIT %s",
+            [_MARK_START, _MARK_END, _MARK_START, _MARK_END, expression, limit],
+        )
+        rows = cursor.fetchall()
+    results = []
+    for rowid, title, snippet in rows:
+        source = SOURCES_BY_CODE[rowid & ((1 << KIND_BITS) - 1)]
+        results.append({
+            'label': source.label,
+            'title': _highlighted(title),
+            'snippet': _highlighted(snippet),
+            'url': source.url(rowid >> KIND_BITS),
+        })
+    return results
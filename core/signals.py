@@ -0,0 +1,89 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models import OuterRef, Subquery
+from django.db.models.signals import post_delete, post_save, pre_save
+
+from . import kpi, profiling, search
+from .network import ip_to_int
+from .models import (
+    BomItem, BomItemVariant, DocHistoryItem, DocumentationCategory, DocumentationChecklistItem,
+    DocumentationResult, Equipment, EquipmentDevice, ValidationCategory, ValidationChecklistItem,
+    ValidationResult, Variant,
+)
+
+
+SEARCH_INDEXED_MODELS = [Equipment, EquipmentDevice, BomItem, ValidationChecklistItem, DocHistoryItem]
+KPI_SOURCE_MODELS = [
+    Equipment, EquipmentDevice, ValidationChecklistItem, ValidationResult,
+    DocumentationChecklistItem, DocumentationResult, BomItem, BomItemVariant, Variant,
+]
+# Checklist item model -> result model carrying its denormalized sort_key
+SORTED_RESULT_MODELS = {
+    ValidationChecklistItem: ValidationResult,
+    DocumentationChecklistItem: DocumentationResult,
+}
+
+
+def sync_equipment_numeric_fields(sender, instance, **kwargs):
+    # Also for raw saves, like sync_device_ip_int
+    instance.sync_numeric_fields()
+
+
+def sync_device_ip_int(sender, instance, **kwargs):
+    # Also for raw saves: fixtures load through save_base(), not save()
+    instance.ip_int = ip_to_int(instance.ip_address)
+
+
+def index_saved(sender, instance, raw=False, **kwargs):
+    if raw:  # loaddata: fixtures are indexed by rebuild_search_index
+        return
+    search.index_objects([instance])
+    if sender is Equipment:
+        # Device and BOM documents include the station name
+        search.index_objects(instance.devices.select_related('equipment'))
+        search.index_objects(instance.bom_items.select_related('equipment'))
+
+
+def unindex_deleted(sender, instance, **kwargs):
+    search.unindex_objects([instance])
+
+
+def refresh_kpis(sender, raw=False, using=None, **kwargs):
+    if not raw:
+        transaction.on_commit(lambda: kpi.schedule_refresh(using), using=using)
+
+
+def update_result_sort_keys(item_model, items):
+    """Recompute sort_key on every result of `items` (ids or an id queryset) in one UPDATE."""
+    keys = item_model.with_sort_keys().filter(pk=OuterRef('checklist_item_id')).values('sort_key')
+    SORTED_RESULT_MODELS[item_model].objects.filter(checklist_item__in=items).update(sort_key=Subquery(keys))
+
+
+def resort_item_results(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_result_sort_keys(sender, [instance.pk])
+
+
+def resort_category_results(sender, instance, raw=False, **kwargs):
+    if not raw:
+        update_result_sort_keys(instance.items.model, instance.items.values('pk'))
+
+
+pre_save.connect(sync_equipment_numeric_fields, sender=Equipment, dispatch_uid='sync-equipment-numeric-fields')
+pre_save.connect(sync_device_ip_int, sender=EquipmentDevice, dispatch_uid='sync-device-ip-int')
+
+for model in SEARCH_INDEXED_MODELS:
+    post_save.connect(index_saved, sender=model, dispatch_uid=f'search-index-{model.__name__}')
+    post_delete.connect(unindex_deleted, sender=model, dispatch_uid=f'search-unindex-{model.__name__}')
+
+for model in KPI_SOURCE_MODELS:
+    post_save.connect(refresh_kpis, sender=model, dispatch_uid=f'kpi-refresh-{model.__name__}')
+    post_delete.connect(refresh_kpis, sender=model, dispatch_uid=f'kpi-refresh-delete-{model.__name__}')
+
+for model in SORTED_RESULT_MODELS:
+    post_save.connect(resort_item_results, sender=model, dispatch_uid=f'resort-results-{model.__name__}')
+
+for model in [ValidationCategory, DocumentationCategory]:
+    post_save.connect(resort_category_results, sender=model, dispatch_uid=f'resort-results-{model.__name__}')
+
+connection_created.connect(profiling.install_query_logger, dispatch_uid='slow-query-log')
@@ -0,0 +1,231 @@
+"""Per-project databases: which project a request works on, and routing core models to its database.
+
+Every customer project keeps its stations, checklists, BOM and history in its own
+database (by default PROJECT_DATABASE_DIR/<slug>.sqlite3). The Project registry,
+users and sessions stay in 'default', which also still holds the data of the
+shared workspace used when no project is selected.
+
+The current database is a context variable, so it follows the request that set
+it and nothing else: background threads start without a project and must be
+handed the alias explicitly (see kpi.schedule_refresh, network.start_background_sweep).
+"""
+import contextvars
+import os
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.http import Http404, HttpResponseRedirect
+
+from .replica import REPLICA_SUFFIX, primary_alias, read_database, written
+
+
+PROJECT_PARAM = 'project'  # ?project=<slug> selects a project; ?project= returns to the shared workspace
+SESSION_KEY = 'project'
+ALIAS_PREFIX = 'project_'
+
+# Models that live in 'default' only, whatever project is selected
+REGISTRY_MODELS = {'project'}
+
+_current_database = contextvars.ContextVar('current_database', default=DEFAULT_DB_ALIAS)
+_register_lock = threading.Lock()
+
+
+def current_database():
+    """Alias of the database the current request (or `use_database` block) works on."""
+    return _current_database.get()
+
+
+@contextmanager
+def use_database(alias):
+    token = _current_database.set(alias)
+    try:
+        yield alias
+    finally:
+        _current_database.reset(token)
+
+
+def project_alias(slug):
+    return f'{ALIAS_PREFIX}{slug}'
+
+
+def register_database(project):
+    """Make the project's database connectable and return its alias.
+
+    An alias already present in DATABASES wins, so a project can be pointed at
+    a server database (e.g. its own PostgreSQL schema) from settings instead.
+    """
+    alias = project_alias(project.slug)
+    with _register_lock:
+        if alias not in connections.settings:
+            config = dict(connections.settings[DEFAULT_DB_ALIAS])
+            config['NAME'] = os.path.join(settings.PROJECT_DATABASE_DIR, f'{project.slug}.sqlite3')
+            config['TEST'] = dict(config.get('TEST') or {}, NAME=None)
+            connections.settings[alias] = config
+    return alias
+
+
+@contextmanager
+def use_project(project):
+    """Work on `project`'s database (the shared workspace for None) inside the block."""
+    alias = register_database(project) if project is not None else DEFAULT_DB_ALIAS
+    with use_database(alias):
+        yield project
+
+
+def migrate_project(project, verbosity=0):
+    """Create or upgrade the project's database schema.
+
+    Data migrations write through schema_editor.connection, so this is a plain
+    `migrate --database=<alias>` once the alias is registered and the
+    directory of its SQLite file exists.
+    """
+    os.makedirs(settings.PROJECT_DATABASE_DIR, exist_ok=True)
+    with use_project(project) as project:
+        call_command('migrate', database=project_alias(project.slug), verbosity=verbosity, interactive=False)
+
+
+# Checklist catalogs a new project starts from, copied from the shared workspace
+CATALOG_MODELS = ['ValidationCategory', 'ValidationChecklistItem', 'DocumentationCategory', 'DocumentationChecklistItem']
+
+
+def copy_catalogs(project, source=DEFAULT_DB_ALIAS):
+    """Copy the checklist catalogs (ids included) into a project database that has none yet."""
+    from django.apps import apps
+    from .search import rebuild_index
+    with use_project(project):
+        alias = current_database()
+        if apps.get_model('core', 'ValidationCategory').objects.using(alias).exists():
+            return
+        with atomic():
+            for name in CATALOG_MODELS:
+                model = apps.get_model('core', name)
+                model.objects.using(alias).bulk_create(model.objects.using(source).all())
+            rebuild_index(connections[alias])  # bulk_create skips save()
+
+
+def get_project(slug):
+    from .models import Project
+    return Project.objects.using(DEFAULT_DB_ALIAS).filter(slug=slug).first()
+
+
+def add_project_argument(parser):
+    """--project <slug> for management commands that work on one project's data."""
+    parser.add_argument('--project', help="Project slug (default: the shared workspace)")
+
+
+def project_from_options(options):
+    slug = options.get('project')
+    if not slug:
+        return None
+    project = get_project(slug)
+    if project is None:
+        raise CommandError(f"No project with slug '{slug}'")
+    return project
+
+
+# --- TRANSACTIONS ---
+
+class _ProjectAtomic(transaction.Atomic):
+    """transaction.Atomic whose database is looked up each time a block is entered."""
+
+    using = property(lambda self: current_database(), lambda self, value: None)
+
+
+def atomic(using=None, savepoint=True, durable=False):
+    """Like django.db.transaction.atomic, but on the current project's database by default."""
+    if callable(using):  # bare @atomic
+        return _ProjectAtomic(None, savepoint, durable)(using)
+    if using is not None:
+        return transaction.atomic(using, savepoint, durable)
+    return _ProjectAtomic(None, savepoint, durable)
+
+
+def on_commit(func, using=None):
+    transaction.on_commit(func, using=using or current_database())
+
+
+# --- ROUTING ---
+
+class ProjectRouter:
+    """Sends core models to the current project's database; everything else stays in 'default'.
+
+    Reads inside @replica_reads views go to the database's replica (core.replica).
+    """
+
+    def _is_project_model(self, model):
+        return model._meta.app_label == 'core' and model._meta.model_name not in REGISTRY_MODELS
+
+    def db_for_read(self, model, **hints):
+        if not self._is_project_model(model):
+            return DEFAULT_DB_ALIAS
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db  # related lookups stay in the instance's project
+        return read_database(current_database())
+
+    def db_for_write(self, model, **hints):
+        if not self._is_project_model(model):
+            return DEFAULT_DB_ALIAS
+        written()
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return primary_alias(instance._state.db)
+        return current_database()
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return primary_alias(obj1._state.db or DEFAULT_DB_ALIAS) == primary_alias(obj2._state.db or DEFAULT_DB_ALIAS)
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db.endswith(REPLICA_SUFFIX):
+            return False  # copies of their primary
+        if app_label != 'core' or model_name in REGISTRY_MODELS:
+            return db == DEFAULT_DB_ALIAS
+        return True  # project tables exist in every database, 'default' included
+
+
+def make_cache_key(key, key_prefix, version):
+    """Cache KEY_FUNCTION: fragments of different projects never share an entry."""
+    return f'{key_prefix}:{version}:{current_database()}:{key}'
+
+
+# --- REQUESTS ---
+
+class ProjectMiddleware:
+    """Selects the request's project from ?project=<slug> (remembered in the session) or the session.
+
+    A GET carrying the parameter is redirected to the same URL without it, so
+    bookmarks and the admin's own query-string filters never see it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if PROJECT_PARAM in request.GET:
+            slug = request.GET[PROJECT_PARAM]
+            if slug and get_project(slug) is None:
+                raise Http404("No such project")
+            request.session[SESSION_KEY] = slug
+            if request.method == 'GET':
+                query = request.GET.copy()
+                del query[PROJECT_PARAM]
+                return HttpResponseRedirect(request.path + (f'?{query.urlencode()}' if query else ''))
+
+        slug = request.session.get(SESSION_KEY)
+        request.project = get_project(slug) if slug else None
+        if slug and request.project is None:  # deleted since it was selected
+            del request.session[SESSION_KEY]
+        with use_project(request.project):
+            return self.get_response(request)
+
+
+def project_context(request):
+    """Template context: the current project and the active ones for the sidebar switcher."""
+    from .models import Project
+    return {
+        'current_project': getattr(request, 'project', None),
+        'projects': Project.objects.filter(is_archived=False),
+    }
@@ -0,0 +1,77 @@
+from unittest import mock
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core import admin as core_admin, kpi
+from core.admin import EstimatedCountPaginator, estimated_row_count
+from core.audit import KIND_VALIDATION, record_event
+from core.models import BomItem, BomItemVariant, Equipment, EquipmentDevice, ValidationResult
+
+
+class EstimatedCountTests(TestCase):
+    fixtures = ['initial_data', 'equipment_devices']
+
+    def test_unfiltered_large_tables_are_estimated(self):
+        EquipmentDevice.objects.filter(pk__in=[2, 3]).delete()  # a hole: the rowid span over-estimates
+        self.assertEqual(estimated_row_count(EquipmentDevice.objects.all()), 20)
+
+        with mock.patch.object(core_admin, 'ESTIMATED_COUNT_MIN', 10):
+            self.assertEqual(EstimatedCountPaginator(EquipmentDevice.objects.all(), 10).count, 20)
+            filtered = EquipmentDevice.objects.filter(equipment_id=1)
+            self.assertEqual(EstimatedCountPaginator(filtered, 10).count, filtered.count())
+        # Small tables are counted exactly
+        self.assertEqual(EstimatedCountPaginator(EquipmentDevice.objects.all(), 10).count, 18)
+
+
+class ChangelistQueryTests(TestCase):
+    """Every core changelist costs the same number of queries however many rows it lists."""
+
+    fixtures = ['initial_data', 'equipment_devices', 'documentation_categories', 'bom_data']
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'secret'))
+        self.add_rows(1)
+
+    def add_rows(self, equipment_id):
+        for item_id in range(1, 11):
+            ValidationResult.set_status(equipment_id, item_id, 'OK')
+            record_event(equipment_id, KIND_VALIDATION, item_id, True)
+        EquipmentDevice.objects.bulk_create(
+            EquipmentDevice(equipment_id=equipment_id, device_type=f'Type {n}', name=f'Device {n}')
+            for n in range(10)
+        )
+        items = BomItem.objects.bulk_create(
+            BomItem(equipment_id=equipment_id, part_number=f'PN-{equipment_id}-{n}') for n in range(10)
+        )
+        BomItemVariant.objects.bulk_create(BomItemVariant(bom_item=item, variant_id=1) for item in items)
+        Equipment.objects.create(station=f'ST-{equipment_id}', owner='Preh', power_supply='AC')
+
+    def changelist_queries(self):
+        counts = {}
+        for model in admin.site._registry:
+            if model._meta.app_label != 'core' or model._meta.model_name == 'project':
+                continue
+            url = f'/admin/core/{model._meta.model_name}/'
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200, url)
+            counts[url] = len(queries)
+            # No list filter scans the table for its distinct values
+            self.assertFalse([query for query in queries if 'DISTINCT' in query['sql']], url)
+        return counts
+
+    def test_query_count_is_constant(self):
+        before = self.changelist_queries()
+        self.add_rows(2)
+        self.add_rows(3)
+        for url, count in before.items():
+            with self.subTest(url=url), self.assertNumQueries(count):
+                self.client.get(url)
+
+    def test_kpi_metric_filter(self):
+        kpi.rebuild_summary()
+        response = self.client.get('/admin/core/kpisummary/', {'metric': kpi.METRIC_OWNER})
+        self.assertEqual({row.metric for row in response.context['cl'].result_list}, {kpi.METRIC_OWNER})
@@ -0,0 +1,126 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.utils import timezone
+
+from core.analytics import failure_analytics, time_to_ok, validation_data_version
+from core.audit import KIND_VALIDATION
+from core.models import Equipment, ValidationChecklistItem, ValidationResult
+
+from .test_audit import record_at
+
+
+START = timezone.now().replace(microsecond=0) - timedelta(days=10)
+
+
+def hours(count):
+    return START + timedelta(hours=count)
+
+
+class AnalyticsTestCase(TestCase):
+    fixtures = ['initial_data']
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.items = list(ValidationChecklistItem.objects.order_by('category__order', 'order')[:3])
+        self.station_count = Equipment.objects.count()
+
+
+class FailureAnalyticsTests(AnalyticsTestCase):
+    def test_nok_rates_and_groups(self):
+        first, second, _ = self.items
+        ValidationResult.set_status(1, first.pk, 'NOK')
+        ValidationResult.set_status(2, first.pk, 'NOK')
+        ValidationResult.set_status(3, first.pk, 'OK')
+        ValidationResult.set_status(1, second.pk, 'OK')
+        record_at(hours(0), 1, KIND_VALIDATION, second.pk, False)
+
+        analytics = failure_analytics()
+
+        self.assertEqual(analytics['stations'], self.station_count)
+        top = analytics['items_by_nok_rate'][0]
+        self.assertEqual(
+            (top['id'], top['ok'], top['nok'], top['missing'], top['nok_rate']),
+            (first.pk, 1, 2, self.station_count - 3, 0.6667),
+        )
+        by_id = {row['id']: row for row in analytics['items_by_nok_rate']}
+        self.assertEqual((by_id[second.pk]['nok_rate'], by_id[second.pk]['nok_recorded']), (0.0, 1))
+        owners = {group['label']: (group['ok'], group['nok']) for group in analytics['by_owner']}
+        self.assertEqual(sum(ok + nok for ok, nok in owners.values()), 4)
+        self.assertEqual(analytics['by_station'][0]['key'], 2)  # 1 NOK of 1
+        self.assertEqual(analytics['version'], validation_data_version())
+
+    def test_time_to_ok_from_the_first_nok_to_the_next_ok(self):
+        item = self.items[0]
+        record_at(hours(0), 1, KIND_VALIDATION, item.pk, False)
+        record_at(hours(1), 1, KIND_VALIDATION, item.pk, False)
+        record_at(hours(3), 1, KIND_VALIDATION, item.pk, True)
+        record_at(hours(4), 1, KIND_VALIDATION, item.pk, True)  # not a second fix
+        record_at(hours(0), 2, KIND_VALIDATION, item.pk, False)
+        record_at(hours(1), 2, KIND_VALIDATION, item.pk, True)
+        record_at(hours(0), 3, KIND_VALIDATION, item.pk, True)  # OK before any NOK
+        record_at(hours(1), 3, KIND_VALIDATION, item.pk, False)  # never fixed
+        record_at(hours(0), 4, KIND_VALIDATION, item.pk, False)
+        record_at(hours(9), 4, KIND_VALIDATION, item.pk, True)
+        Equipment.objects.filter(pk=4).delete()  # events outlive their station, but are left out
+
+        fixes, average, longest = time_to_ok()[item.pk]
+        self.assertEqual(fixes, 2)
+        self.assertAlmostEqual(average, 2 * 3600, places=1)
+        self.assertAlmostEqual(longest, 3 * 3600, places=1)
+        self.assertNotIn(self.items[1].pk, time_to_ok())
+
+        row, = failure_analytics()['items_by_time_to_ok']
+        self.assertEqual((row['id'], row['fixed'], row['avg_hours_to_ok'], row['max_hours_to_ok']), (item.pk, 2, 2.0, 3.0))
+
+    def test_view(self):
+        ValidationResult.set_status(1, self.items[0].pk, 'NOK')
+        data = self.client.get('/validation/analytics/').json()
+        self.assertEqual(data['items_by_nok_rate'][0]['id'], self.items[0].pk)
+
+
+class AnalyticsCacheTests(AnalyticsTestCase):
+    def assertCached(self, analytics):
+        with self.assertNumQueries(2):  # the data version
+            self.assertEqual(failure_analytics(), analytics)
+
+    def assertRecomputed(self, analytics):
+        fresh = failure_analytics()
+        self.assertNotEqual(fresh['version'], analytics['version'])
+        self.assertCached(fresh)
+        return fresh
+
+    def test_computed_once_per_result_change(self):
+        analytics = failure_analytics()
+        self.assertCached(analytics)
+
+        ValidationResult.set_status(1, self.items[0].pk, 'NOK')
+        analytics = self.assertRecomputed(analytics)
+        self.assertEqual(analytics['items_by_nok_rate'][0]['nok'], 1)
+
+        ValidationResult.objects.filter(equipment_id=1).delete()
+        self.assertEqual(self.assertRecomputed(analytics)['items_by_nok_rate'][0]['nok'], 0)
+
+    def test_station_changes_invalidate(self):
+        ValidationResult.set_status(1, self.items[0].pk, 'NOK')
+        analytics = failure_analytics()
+
+        station = Equipment.objects.get(pk=1)
+        station.owner = 'Supplier'
+        station.save()
+        analytics = self.assertRecomputed(analytics)
+        self.assertIn('Supplier', {group['label'] for group in analytics['by_owner']})
+
+        station.station = 'OP 1 renamed'
+        station.save(update_fields=['station'])
+        analytics = self.assertRecomputed(analytics)
+        self.assertEqual(analytics['by_station'][0]['label'], 'OP 1 renamed')
+
+        Equipment.objects.create(station='OP 99', owner='Preh', power_supply='AC')
+        analytics = self.assertRecomputed(analytics)
+        self.assertEqual(analytics['stations'], self.station_count + 1)
+
+        Equipment.objects.filter(pk=2).delete()
+        self.assertEqual(self.assertRecomputed(analytics)['stations'], self.station_count)
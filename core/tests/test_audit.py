@@ -0,0 +1,93 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import TestCase
+
+from core.audit import (
+    KIND_DOCUMENTATION, KIND_VALIDATION, SNAPSHOT_INTERVAL, progress_series, record_event, state_at,
+)
+from core.models import Equipment, ValidationEvent, ValidationSnapshot
+
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def record_at(at, equipment_id, kind, item_id, value):
+    # The field's default (timezone.now) is read through its cached _get_default
+    with mock.patch.object(ValidationEvent._meta.get_field('created_at'), '_get_default', lambda: at):
+        return record_event(equipment_id, kind, item_id, value)
+
+
+class AuditLogTests(TestCase):
+    def setUp(self):
+        self.station = Equipment.objects.create(station='OP 10', owner='Preh', eq_number='1', power_supply='AC')
+        self.other = Equipment.objects.create(station='OP 20', owner='Preh', eq_number='2', power_supply='AC')
+
+    def test_state_at_replays_events_up_to_the_time(self):
+        record_at(START, self.station.pk, KIND_VALIDATION, 1, True)
+        record_at(START + timedelta(hours=1), self.station.pk, KIND_DOCUMENTATION, 7, True)
+        record_at(START + timedelta(hours=2), self.station.pk, KIND_VALIDATION, 1, False)
+        record_at(START + timedelta(hours=2), self.other.pk, KIND_VALIDATION, 2, True)
+
+        self.assertEqual(state_at(self.station.pk, START - timedelta(seconds=1)), {'V': {}, 'D': {}})
+        self.assertEqual(state_at(self.station.pk, START + timedelta(hours=1)), {'V': {1: True}, 'D': {7: True}})
+        self.assertEqual(state_at(self.station.pk, START + timedelta(hours=3)), {'V': {1: False}, 'D': {7: True}})
+
+    def test_snapshots_bound_the_replay(self):
+        # Item i is toggled at minute i; item 0 ends NOK, the others OK
+        for minute in range(SNAPSHOT_INTERVAL * 2 + 5):
+            record_at(START + timedelta(minutes=minute), self.station.pk, KIND_VALIDATION, minute % 10, minute % 3 != 0)
+        snapshots = list(ValidationSnapshot.objects.filter(equipment=self.station).order_by('last_event_id'))
+        self.assertEqual(len(snapshots), 2)
+
+        for minutes in (3, SNAPSHOT_INTERVAL, SNAPSHOT_INTERVAL * 2 + 4, SNAPSHOT_INTERVAL * 3):
+            at = START + timedelta(minutes=minutes)
+            expected = {}
+            for event in ValidationEvent.objects.filter(equipment=self.station, created_at__lte=at):
+                expected[event.item_id] = event.value
+            with self.assertNumQueries(2):  # one snapshot, one bounded slice of events
+                self.assertEqual(state_at(self.station.pk, at)[KIND_VALIDATION], expected)
+
+    def test_events_are_append_only(self):
+        event = record_at(START, self.station.pk, KIND_VALIDATION, 1, True)
+        with self.assertRaises(ValueError):
+            event.save()
+        with self.assertRaises(ValueError):
+            event.delete()
+
+    def test_progress_series(self):
+        record_at(START + timedelta(hours=1), self.station.pk, KIND_VALIDATION, 1, True)
+        record_at(START + timedelta(hours=1), self.other.pk, KIND_VALIDATION, 1, True)
+        record_at(START + timedelta(days=1, hours=1), self.station.pk, KIND_VALIDATION, 1, True)  # no change
+        record_at(START + timedelta(days=1, hours=2), self.station.pk, KIND_DOCUMENTATION, 3, True)
+        record_at(START + timedelta(days=2, hours=1), self.other.pk, KIND_VALIDATION, 1, False)
+
+        series = progress_series(START, START + timedelta(days=3))
+        self.assertEqual([(ok, checked) for _, ok, checked in series], [(0, 0), (2, 0), (2, 1), (1, 1)])
+        self.assertEqual(series[1][0], START + timedelta(days=1))
+        series = progress_series(START, START + timedelta(days=3), equipment_ids=[self.other.pk])
+        self.assertEqual([ok for _, ok, _ in series], [0, 1, 1, 0])
+
+    def test_progress_series_starts_from_the_newest_snapshots(self):
+        # Three snapshots for one station, one for the other, all before the window
+        for minute in range(SNAPSHOT_INTERVAL * 3 + 7):
+            record_at(START + timedelta(minutes=minute), self.station.pk, KIND_VALIDATION, minute % 10, minute % 3 != 0)
+        for minute in range(SNAPSHOT_INTERVAL + 2):
+            record_at(START + timedelta(minutes=minute), self.other.pk, KIND_VALIDATION, minute % 4, minute % 2 == 0)
+        record_at(START + timedelta(days=1, hours=1), self.station.pk, KIND_VALIDATION, 0, True)
+        self.assertEqual(ValidationSnapshot.objects.count(), 4)
+
+        start = START + timedelta(hours=12)
+        with mock.patch.object(ValidationSnapshot, 'from_db', wraps=ValidationSnapshot.from_db) as from_db:
+            series = progress_series(start, start + timedelta(days=1))
+        self.assertEqual(from_db.call_count, 2)  # only the newest snapshot of each station is read
+        with mock.patch.object(ValidationEvent, 'from_db', wraps=ValidationEvent.from_db) as from_db:
+            progress_series(start, start + timedelta(days=1))
+        self.assertEqual(from_db.call_count, 7 + 2 + 1)  # the events after those snapshots
+        for at, ok_count, _ in series:
+            expected = sum(
+                sum(state_at(equipment_id, at)[KIND_VALIDATION].values())
+                for equipment_id in (self.station.pk, self.other.pk)
+            )
+            self.assertEqual(ok_count, expected)
+        self.assertEqual(series[1][1], series[0][1] + 1)
@@ -0,0 +1,127 @@
+import json
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.bom_matrix import ROW_CLASS, ZEBRA_CLASSES
+from core.models import BomItem, BomItemVariant, Variant
+
+
+class BomUpdateFieldTests(TestCase):
+    fixtures = ['initial_data', 'bom_data']
+
+    def test_updates_fields(self):
+        response = self.client.post('/bom/update/1/', {'equipment': '3', 'quantity': '5', 'description': 'PCB v2'})
+        self.assertEqual(response.status_code, 200)
+        item = BomItem.objects.get(pk=1)
+        self.assertEqual((item.equipment_id, item.quantity, item.description), (3, 5, 'PCB v2'))
+        self.client.post('/bom/update/1/', {'equipment': '', 'quantity': ''})
+        item = BomItem.objects.get(pk=1)
+        self.assertEqual((item.equipment_id, item.quantity), (None, 1))
+
+    def test_rejects_bad_values(self):
+        for data in [{'equipment': 'abc'}, {'equipment': '999'}, {'equipment': '-1'}, {'quantity': 'x'}, {'quantity': '-2'}]:
+            self.assertEqual(self.client.post('/bom/update/1/', data).status_code, 400, data)
+        item = BomItem.objects.get(pk=1)
+        self.assertEqual((item.equipment_id, item.quantity), (1, 1))
+
+
+class BomInPlaceTests(TestCase):
+    """The BOM endpoints answer with the fragment that changed, never a redirect to the whole page."""
+    fixtures = ['initial_data', 'bom_data']
+
+    def post(self, url, data=None):
+        response = self.client.post(url, data or {})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertNotIn('HX-Redirect', response)
+        self.assertNotIn('HX-Refresh', response)
+        return response
+
+    def test_update_field_has_nothing_to_swap(self):
+        response = self.post('/bom/update/1/', {'part_number': 'PN-9'})
+        self.assertEqual(response.content, b'')
+        self.assertEqual(BomItem.objects.get(pk=1).part_number, 'PN-9')
+
+    def test_add_and_delete_row(self):
+        response = self.post('/bom/add/')
+        item = BomItem.objects.latest('pk')
+        row = response.content.decode()
+        # Appended to the table body: the stripe of the last position
+        self.assertTrue(row.startswith(
+            f'<tr id="bom-row-{item.pk}" class="{ROW_CLASS} {ZEBRA_CLASSES[BomItem.objects.count() % 2 == 0]}">'
+        ), row)
+        for variant_id in Variant.objects.values_list('pk', flat=True):
+            self.assertInHTML(f'<td class="bom-v" data-v="{variant_id}"></td>', row)
+
+        self.assertEqual(self.post(f'/bom/delete/{item.pk}/').content, b'')
+        self.assertFalse(BomItem.objects.filter(pk=item.pk).exists())
+
+    def test_toggle_returns_the_clicked_cell(self):
+        self.assertHTMLEqual(self.post('/bom/toggle/1/1/').content.decode(), '<td class="bom-v" data-v="1"></td>')
+        self.assertHTMLEqual(self.post('/bom/toggle/1/1/').content.decode(), '<td class="bom-v" data-v="1">X</td>')
+        self.assertTrue(BomItemVariant.objects.get(bom_item_id=1, variant_id=1).is_applicable)
+
+    def test_add_variant_returns_its_header(self):
+        response = self.post('/bom/variant/add/', {'name': 'Sport', 'color': '#1f3864'})
+        variant = Variant.objects.get(name='Sport')
+        self.assertEqual(json.loads(response['HX-Trigger']), {'bomVariantAdded': variant.pk})
+        header = response.content.decode()
+        self.assertInHTML(
+            f'<style id="bom-variant-style-{variant.pk}">[data-v="{variant.pk}"] '
+            '{ --bom-bg: #1f3864; --bom-fg: #FFFFFF; }</style>',
+            header,
+        )
+        self.assertIn(f'data-v="{variant.pk}"', header.split('>', 1)[0])  # the <th> itself
+        self.assertEqual(
+            BomItemVariant.objects.filter(variant=variant, is_applicable=False).count(), BomItem.objects.count(),
+        )
+        # The same header the page renders for it
+        self.assertInHTML(header, self.client.get('/bom/').content.decode())
+
+        self.assertEqual(self.client.post('/bom/variant/add/', {'name': 'Sport'}).status_code, 400)
+        self.assertEqual(self.client.post('/bom/variant/add/', {'name': 'X', 'color': 'red;}'}).status_code, 400)
+
+    def test_color_returns_the_column_rule(self):
+        response = self.post('/bom/variant/color/1/', {'color': '#000080'})
+        self.assertHTMLEqual(
+            response.content.decode(),
+            '<style id="bom-variant-style-1">[data-v="1"] { --bom-bg: #000080; --bom-fg: #FFFFFF; }</style>',
+        )
+        self.assertEqual(Variant.objects.get(pk=1).color, '#000080')
+        self.assertEqual(self.client.post('/bom/variant/color/1/', {'color': 'red'}).status_code, 400)
+        self.assertEqual(self.client.post('/bom/variant/color/999/', {'color': '#000080'}).status_code, 404)
+
+    def test_volume_has_nothing_to_swap(self):
+        self.assertEqual(self.post('/bom/variant/volume/2/', {'planned_volume': '1200'}).content, b'')
+        self.assertEqual(Variant.objects.get(pk=2).planned_volume, 1200)
+
+    def test_delete_variant_triggers_removal_of_its_cells(self):
+        response = self.post('/bom/variant/delete/3/')
+        self.assertEqual(response.content, b'')  # swapped over the header, with its rule
+        self.assertEqual(json.loads(response['HX-Trigger']), {'bomVariantDeleted': 3})
+        self.assertFalse(Variant.objects.filter(pk=3).exists())
+        self.assertFalse(BomItemVariant.objects.filter(variant_id=3).exists())
+        self.assertEqual(self.client.post('/bom/variant/delete/3/').status_code, 404)
+
+
+class VisualAidsTests(TestCase):
+    fixtures = ['initial_data', 'bom_data']
+
+    def query_count(self, method, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_query_count_does_not_grow_with_the_items(self):
+        pages = [('get', '/visual-aids/'), ('post', '/visual-aids/export/pdf/'), ('post', '/visual-aids/export/docx/')]
+        before = [self.query_count(method, url)[0] for method, url in pages]
+        BomItem.objects.bulk_create(
+            BomItem(equipment_id=equipment_id, part_number=f'PN-{equipment_id}', order=10 + equipment_id)
+            for equipment_id in range(1, 11)
+        )
+        self.assertEqual([self.query_count(method, url)[0] for method, url in pages], before)
+
+        _, response = self.query_count('post', '/visual-aids/export/pdf/')
+        self.assertIn('Station: OP 10\nPart Number: 10546-001-A', response.content.decode())
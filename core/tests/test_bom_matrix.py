@@ -0,0 +1,187 @@
+import re
+from html.parser import HTMLParser
+
+from django.template import Context, Template
+from django.test import TestCase
+
+from core.bom_matrix import BomMatrix, matrix_rows, variant_columns
+from core.models import BomItem, BomItemVariant, Equipment, Variant
+from core.templatetags.validation_extras import contrast_color
+
+
+# partials/bom_row.html as the BOM page included it once per item before core.bom_matrix
+OLD_ROWS = '''{% load validation_extras %}{% for data in bom_data %}
+<tr id="bom-row-{{ data.item.id }}"
+    class="group hover:bg-blue-50 dark:hover:bg-gray-700 transition-colors {% if forloop.counter|divisibleby:2 %}bg-gray-50 dark:bg-gray-800{% else %}bg-white dark:bg-gray-900{% endif %}">
+    <td class="p-1 text-center bg-gray-100 dark:bg-gray-800 sticky left-0 z-10">
+        <button hx-post="/bom/delete/{{ data.item.id }}/" hx-confirm="Ștergeți acest rând?"
+            hx-target="#bom-row-{{ data.item.id }}" hx-swap="outerHTML"
+            class="text-red-400 hover:text-red-600 transition-colors p-1" title="Șterge rândul">
+            <i data-lucide="trash-2" class="w-4 h-4"></i>
+        </button>
+    </td>
+    <td class="p-1 border-r dark:border-gray-700">
+        <select name="equipment" hx-post="/bom/update/{{ data.item.id }}/" hx-trigger="change" hx-swap="none"
+            class="w-full bg-transparent p-2 focus:outline-none dark:text-white dark:bg-gray-800 font-medium cursor-pointer">
+            <option value="">-- Selectează --</option>
+            {% for equipment_id, station in equipment_stations %}
+            <option value="{{ equipment_id }}" {% if data.item.equipment_id == equipment_id %}selected{% endif %}>{{ station }}</option>
+            {% endfor %}
+        </select>
+    </td>
+    <td class="p-1 border-r dark:border-gray-700">
+        <input value="{{ data.item.part_number }}" name="part_number" hx-post="/bom/update/{{ data.item.id }}/"
+            hx-trigger="blur changed" hx-swap="none"
+            class="w-full bg-transparent p-2 focus:outline-none dark:text-white font-mono" />
+    </td>
+    <td class="p-1 border-r dark:border-gray-700">
+        <input value="{{ data.item.description }}" name="description" hx-post="/bom/update/{{ data.item.id }}/"
+            hx-trigger="blur changed" hx-swap="none"
+            class="w-full bg-transparent p-2 focus:outline-none dark:text-white" />
+    </td>
+    <td class="p-1 border-r dark:border-gray-700">
+        <input type="number" value="{{ data.item.quantity }}" name="quantity" hx-post="/bom/update/{{ data.item.id }}/"
+            hx-trigger="blur changed" hx-swap="none"
+            class="w-full bg-transparent p-2 text-center focus:outline-none dark:text-white" />
+    </td>
+    {% for variant in variants %}
+    <td class="p-1 text-center cursor-pointer border-r border-gray-200 dark:border-gray-700"
+        style="background-color: {{ variant.color }}" hx-post="/bom/toggle/{{ data.item.id }}/{{ variant.id }}/"
+        hx-swap="outerHTML" hx-target="#bom-row-{{ data.item.id }}">
+        <div class="flex items-center justify-center h-full">
+            {% if data.variant_status|get_item:variant.id %}
+            <span class="font-bold text-lg select-none" style="color: {{ variant.color|contrast_color }}">X</span>
+            {% endif %}
+        </div>
+    </td>
+    {% endfor %}
+</tr>{% endfor %}'''
+
+TOGGLE_RE = re.compile(r'^/bom/toggle/\d+/(\d+)/$')
+
+
+def render_old_rows():
+    """The rows as the BOM view built them before core.bom_matrix."""
+    variants = Variant.objects.all()
+    bom_data = []
+    for item in BomItem.objects.select_related('equipment').prefetch_related('item_variants__variant').order_by(
+        'equipment__station', 'order',
+    ):
+        item_variants = {iv.variant_id: iv.is_applicable for iv in item.item_variants.all()}
+        bom_data.append({'item': item, 'variant_status': {v.id: item_variants.get(v.id, False) for v in variants}})
+    return Template(OLD_ROWS).render(Context({
+        'bom_data': bom_data,
+        'variants': variants,
+        'equipment_stations': Equipment.objects.order_by('station').values_list('id', 'station'),
+    }))
+
+
+class RowParser(HTMLParser):
+    """Reduces table rows to what the user sees and posts, ignoring layout whitespace.
+
+    A variant cell becomes ('variant', variant id, mark); any other cell its
+    classes and the controls in it. A station dropdown is reduced to its
+    selected option: the new rows copy the others in when first focused.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.rows = []
+        self.cell = None
+        self.option = None
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'tr':
+            self.rows.append([attrs['id'], attrs['class'].split(), []])
+        elif tag == 'td':
+            toggle = TOGGLE_RE.match(attrs.get('hx-post', ''))
+            variant_id = toggle.group(1) if toggle else attrs.get('data-v')
+            self.cell = {'variant': variant_id, 'class': attrs['class'].split(), 'controls': [], 'text': ''}
+            self.rows[-1][2].append(self.cell)
+        elif tag == 'button':
+            self.cell['controls'].append(('button', attrs['hx-post'], attrs['hx-target'], attrs['hx-confirm']))
+        elif tag == 'input':
+            self.cell['controls'].append(('input', attrs['name'], attrs.get('type'), attrs['value'], attrs['hx-post']))
+        elif tag == 'select':
+            self.cell['controls'].append(['select', attrs['name'], attrs['hx-post'], None])
+        elif tag == 'option' and 'selected' in attrs:
+            self.option = [attrs['value'], '']
+            self.cell['controls'][-1][3] = self.option
+
+    def handle_endtag(self, tag):
+        if tag == 'option':
+            self.option = None
+
+    def handle_data(self, data):
+        if self.option is not None:
+            self.option[1] += data
+        elif self.cell is not None:
+            self.cell['text'] += data
+
+    @classmethod
+    def parse(cls, html):
+        parser = cls()
+        parser.feed(html)
+        return [
+            (row_id, classes, [
+                ('variant', cell['variant'], cell['text'].strip()) if cell['variant']
+                else (cell['class'], [tuple(map(str, control)) for control in cell['controls']])
+                for cell in cells
+            ])
+            for row_id, classes, cells in parser.rows
+        ]
+
+
+class BomMatrixTests(TestCase):
+    fixtures = ['initial_data', 'bom_data']
+
+    def setUp(self):
+        # A row without a station, markup in the text and a dark variant next to the fixture's light ones
+        dark = Variant.objects.create(name='Sport', color='#1f3864', order=5)
+        item = BomItem.objects.create(part_number='PN "7" <b>', description='Cap "M4" & screw', quantity=12, order=9)
+        BomItemVariant.objects.create(bom_item=item, variant=dark, is_applicable=True)
+        BomItemVariant.objects.create(bom_item=item, variant_id=2, is_applicable=False)
+
+    def test_rows_match_the_old_partial(self):
+        old = RowParser.parse(render_old_rows())
+        new = RowParser.parse(BomMatrix(variant_columns()).render(matrix_rows()))
+        self.assertEqual(len(new), BomItem.objects.count())
+        self.assertEqual(new, old)
+        marks = [cell for _, _, cells in new for cell in cells if cell[0] == 'variant' and cell[2]]
+        self.assertEqual(len(marks), BomItemVariant.objects.filter(is_applicable=True).count())
+
+    def test_single_row_matches_its_position_in_the_table(self):
+        rows = matrix_rows()
+        matrix = BomMatrix(variant_columns())
+        table = RowParser.parse(matrix.render(rows))
+        for position, row in enumerate(rows, 1):
+            self.assertEqual(RowParser.parse(matrix.row(row, position)), [table[position - 1]])
+            self.assertEqual(matrix_rows([row.id]), [row])
+
+    def test_variant_colours_come_from_one_rule_per_variant(self):
+        content = self.client.get('/bom/').content.decode()
+        for variant in Variant.objects.all():
+            self.assertInHTML(
+                f'<style id="bom-variant-style-{variant.id}">[data-v="{variant.id}"] '
+                f'{{ --bom-bg: {variant.color}; --bom-fg: {contrast_color(variant.color)}; }}</style>',
+                content,
+            )
+
+    def test_fixed_query_count(self):
+        self.client.get('/bom/')  # gives every station without BOM rows its empty row
+        with self.assertNumQueries(6):
+            self.client.get('/bom/')
+
+        variants = list(Variant.objects.all())
+        items = BomItem.objects.bulk_create(
+            BomItem(equipment_id=equipment_id, part_number=f'PN-{equipment_id}', order=20 + equipment_id)
+            for equipment_id in range(1, 14)
+        )
+        BomItemVariant.objects.bulk_create(
+            BomItemVariant(bom_item=item, variant=variant, is_applicable=(item.pk + variant.pk) % 2 == 0)
+            for item in items for variant in variants
+        )
+        with self.assertNumQueries(6):
+            response = self.client.get('/bom/')
+        self.assertEqual(response.context['item_count'], BomItem.objects.count())
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+
+from core import documents, views
+from core.documents import list_versions, preview_path, publish_document, start_preview, version_path
+
+
+PDF = b'%PDF-1.4\n' + b'0' * 100
+
+
+def staged_files(directory):
+    return [name for name in os.listdir(directory) if name.startswith('.upload-')]
+
+
+@override_settings(PROJECT_DOCUMENT_MAX_SIZE=1024, PROJECT_DOCUMENT_VERSIONS_KEPT=2)
+class ProjectTeamUploadTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'ProjectTeamList.pdf')
+        for name, value in [('PROJECT_TEAM_PDF_DIR', self.directory), ('PROJECT_TEAM_PDF_PATH', self.path)]:
+            patcher = mock.patch.object(views, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(documents, 'preview_renderer', return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, content, name='team.pdf'):
+        return self.client.post(
+            '/project-team/upload/', {'pdf_file': SimpleUploadedFile(name, content)}, follow=True,
+        )
+
+    def test_upload_is_streamed_and_published_by_rename(self):
+        with mock.patch.object(documents.os, 'replace', wraps=os.replace) as replace:
+            response = self.upload(PDF)
+        self.assertContains(response, '&quot;team.pdf&quot; is now the Project Team document.')
+        staged, target = replace.call_args.args
+        self.assertEqual((os.path.dirname(staged), target), (self.directory, self.path))
+        with open(self.path, 'rb') as published:
+            self.assertEqual(published.read(), PDF)
+        self.assertEqual(staged_files(self.directory), [])
+        self.assertEqual(self.client.get('/project-team/pdf/').status_code, 200)
+
+    def test_rejected_uploads_leave_no_temp_files(self):
+        for content, message in [
+            (b'PK\x03\x04 not a pdf', 'is not a PDF document.'),
+            (b'%PD', 'is not a PDF document.'),  # shorter than the magic
+            (PDF + b'0' * 2048, 'upload limit'),  # caught while streaming
+            (PDF + b'0' * 100 * 1024, 'upload limit'),  # caught from Content-Length
+        ]:
+            with self.subTest(size=len(content)):
+                response = self.upload(content)
+                self.assertContains(response, message)
+                self.assertFalse(os.path.exists(self.path))
+                self.assertEqual(staged_files(self.directory), [])
+
+    def test_earlier_versions_are_kept(self):
+        for version in range(4):
+            self.upload(PDF + str(version).encode())
+            os.utime(self.path, (1_700_000_000 + version * 60,) * 2)  # distinct publish times
+        with open(self.path, 'rb') as current:
+            self.assertEqual(current.read(), PDF + b'3')
+
+        versions = list_versions(self.path)  # newest first, pruned to PROJECT_DOCUMENT_VERSIONS_KEPT
+        self.assertEqual(len(versions), 2)
+        with open(version_path(self.path, versions[0]['name']), 'rb') as previous:
+            self.assertEqual(previous.read(), PDF + b'2')
+        self.assertIsNone(version_path(self.path, '../ProjectTeamList.pdf'))
+
+        response = self.client.get(f"/project-team/versions/{versions[1]['name']}/")
+        self.assertEqual(b''.join(response.streaming_content), PDF + b'1')
+        self.assertEqual(self.client.get('/project-team/versions/missing.pdf/').status_code, 404)
+
+
+class PreviewTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.path = os.path.join(self.directory, 'Team.pdf')
+
+    def test_preview_is_rendered_once_per_version(self):
+        def render(pdf_path, png_path):
+            with open(png_path, 'wb') as png:
+                png.write(b'png of ' + os.path.basename(pdf_path).encode())
+
+        renderer = mock.Mock(side_effect=render)
+        with mock.patch.object(documents, 'preview_renderer', return_value=renderer), \
+                mock.patch.object(documents.threading, 'Thread') as thread:
+            thread.return_value.start.side_effect = lambda: documents._render_preview(
+                *thread.call_args.kwargs['args']
+            )
+            with open(self.path, 'wb') as pdf:
+                pdf.write(PDF)
+            self.assertTrue(start_preview(self.path))
+            first = preview_path(self.path)
+            self.assertTrue(os.path.exists(first))
+            self.assertFalse(start_preview(self.path))  # cached
+
+            staged = os.path.join(self.directory, '.upload-new.pdf')
+            with open(staged, 'wb') as pdf:
+                pdf.write(PDF + b'new')
+            publish_document(staged, self.path)
+        self.assertEqual(renderer.call_count, 2)
+        self.assertFalse(os.path.exists(first))  # the replaced document's preview is removed
+        self.assertEqual(os.listdir(os.path.dirname(first)), [os.path.basename(preview_path(self.path))])
@@ -0,0 +1,46 @@
+from decimal import Decimal
+
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Equipment, parse_number
+
+
+class ParseNumberTests(SimpleTestCase):
+    def test_first_number_in_free_text(self):
+        self.assertEqual(parse_number('1,5'), Decimal('1.50'))
+        self.assertEqual(parse_number('1200 mm'), Decimal('1200.00'))
+        self.assertEqual(parse_number('~300kg'), Decimal('300.00'))
+        self.assertEqual(parse_number('-2.5 bar'), Decimal('-2.50'))
+        self.assertIsNone(parse_number('no'))
+        self.assertIsNone(parse_number(''))
+        self.assertIsNone(parse_number('1000000000'))  # would not fit max_digits=10
+
+
+class NumericColumnTests(TestCase):
+    fixtures = ['initial_data']
+
+    def test_fixture_stations_get_numeric_values(self):
+        # loaddata saves raw, bypassing Equipment.save()
+        station = Equipment.objects.get(pk=10)
+        self.assertEqual((station.power_kw_value, station.air_supply_bar_value), (Decimal('1.5'), Decimal('6')))
+        self.assertIsNone(Equipment.objects.get(pk=1).air_supply_bar_value)
+
+    def test_values_follow_update_fields(self):
+        station = Equipment.objects.get(pk=1)
+        station.weight = '350 kg'
+        station.power_kw = 'n/a'
+        station.save(update_fields=['weight', 'power_kw'])
+        station = Equipment.objects.get(pk=1)
+        self.assertEqual((station.weight_value, station.power_kw_value), (Decimal('350'), None))
+
+    def test_aggregates(self):
+        Equipment.objects.filter(pk=12).update(weight_value=800, length_value=2000, width_value=1500)
+        data = self.client.get('/equipment/aggregates/').json()
+        self.assertEqual(data['stations'], 13)
+        self.assertEqual(data['total_load_kw'], 14.0)
+        self.assertEqual(data['heaviest'], {'station': 'EOL 1', 'weight_kg': 800.0})
+        self.assertEqual(data['footprint_m2'], 3.0)
+        self.assertEqual(
+            [(group['power_supply'], group['stations'], group['load_kw']) for group in data['by_power_supply']],
+            [('AC 220V 50HZ single phase', 11, 14.0), ('AC 400V 50Hz 3~/N/PE - max. 32A', 2, None)],
+        )
@@ -0,0 +1,84 @@
+import os
+import tempfile
+
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core.files import RangeNotSatisfiable, parse_range, serve_file
+
+
+class ParseRangeTests(SimpleTestCase):
+    def test_single_ranges(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_whole_file_for_unsupported_headers(self):
+        for header in ['bytes=0-1,5-9', 'bytes=-', 'items=0-9', 'bytes=9-1', '']:
+            self.assertIsNone(parse_range(header, 1000), header)
+
+    def test_unsatisfiable(self):
+        for header in ['bytes=1000-', 'bytes=-0']:
+            with self.assertRaises(RangeNotSatisfiable):
+                parse_range(header, 1000)
+
+
+class ServeFileTests(SimpleTestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.root.name, 'sub', 'team.pdf')
+        os.makedirs(os.path.dirname(self.path))
+        with open(self.path, 'wb') as fileobj:
+            fileobj.write(bytes(range(256)) * 4)
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def get(self, path=None, **headers):
+        return serve_file(self.factory.get('/file/', **headers), path or self.path, 'application/pdf')
+
+    def test_full_range_and_unsatisfiable(self):
+        response = self.get()
+        self.assertEqual((response.status_code, response['Accept-Ranges']), (200, 'bytes'))
+        self.assertEqual(len(b''.join(response.streaming_content)), 1024)
+
+        response = self.get(HTTP_RANGE='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(b''.join(response.streaming_content), bytes(range(10, 20)))
+
+        response = self.get(HTTP_RANGE='bytes=2000-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */1024'))
+
+    def test_validators(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        # A range for an older version of the file gets the whole new file
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"').status_code, 200)
+        self.assertEqual(self.get(HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+
+    def test_sendfile_offload(self):
+        with override_settings(SENDFILE_HEADER='X-Sendfile'):
+            response = self.get()
+            self.assertEqual(response['X-Sendfile'], self.path)
+            self.assertEqual(response.content, b'')
+        with override_settings(SENDFILE_HEADER='X-Accel-Redirect', SENDFILE_ROOT=self.root.name,
+                               SENDFILE_URL_PREFIX='/protected/'):
+            self.assertEqual(self.get()['X-Accel-Redirect'], '/protected/sub/team.pdf')
+
+    def test_x_accel_redirect_outside_root_is_served_here(self):
+        with override_settings(SENDFILE_HEADER='X-Accel-Redirect', SENDFILE_ROOT=os.path.dirname(self.path),
+                               SENDFILE_URL_PREFIX='/protected/'):
+            outside = os.path.join(self.root.name, 'profile.prof')
+            with open(outside, 'wb') as fileobj:
+                fileobj.write(b'stats')
+            response = self.get(outside)
+            self.assertNotIn('X-Accel-Redirect', response)
+            self.assertEqual(b''.join(response.streaming_content), b'stats')
+
+    def test_missing_file(self):
+        with self.assertRaises(Http404):
+            self.get(os.path.join(self.root.name, 'missing.pdf'))
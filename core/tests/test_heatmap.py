@@ -0,0 +1,54 @@
+import struct
+from unittest import mock
+
+from django.test import TestCase
+
+from core.heatmap import MISSING, NOK, OK, heatmap_png, validation_matrix
+from core.models import ValidationResult
+
+
+class ValidationMatrixTests(TestCase):
+    fixtures = ['initial_data']
+
+    def setUp(self):
+        ValidationResult.set_status(1, 1, 'OK')
+        ValidationResult.set_status(1, 2, 'NOK')
+        ValidationResult.set_status(2, 2, 'NOK')
+
+    def cell(self, matrix, equipment_id, item_id):
+        row = [equipment_id for equipment_id, _ in matrix.stations].index(equipment_id)
+        column = [item_id for item_id, _, _ in matrix.items].index(item_id)
+        return matrix.cells[row * len(matrix.items) + column]
+
+    def test_matrix_and_totals(self):
+        matrix = validation_matrix()
+        self.assertEqual((len(matrix.stations), len(matrix.items)), (13, 22))
+        self.assertEqual(len(matrix.cells), 13 * 22)
+        self.assertEqual([self.cell(matrix, 1, 1), self.cell(matrix, 1, 2), self.cell(matrix, 2, 2)], [OK, NOK, NOK])
+        self.assertEqual(self.cell(matrix, 2, 1), MISSING)
+        self.assertEqual((sum(matrix.row_ok), sum(matrix.row_nok)), (1, 2))
+        self.assertEqual((sum(matrix.column_ok), sum(matrix.column_nok)), (1, 2))
+        self.assertEqual(matrix.items[0][1], 'safety_1')
+
+    def test_results_of_rows_added_meanwhile_are_skipped(self):
+        # A station and an item created between the reads of the axes and of the results
+        results = list(ValidationResult.objects.values_list('equipment_id', 'checklist_item_id', 'status'))
+        with mock.patch('core.heatmap.ValidationResult') as model:
+            model.objects.order_by.return_value.values_list.return_value = results + [(999, 1, 'OK'), (1, 999, 'NOK')]
+            matrix = validation_matrix()
+        self.assertEqual((sum(matrix.row_ok), sum(matrix.row_nok)), (1, 2))
+
+    def test_png(self):
+        png = heatmap_png(validation_matrix())
+        self.assertEqual(png[:8], b'\x89PNG\r\n\x1a\n')
+        self.assertEqual(png[12:16], b'IHDR')
+        self.assertEqual(struct.unpack('>IIBB', png[16:26]), (22, 13, 8, 3))
+
+        response = self.client.get('/validation/heatmap/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'data:image/png;base64,')
+
+    def test_empty_matrix_has_no_png(self):
+        with mock.patch('core.heatmap.Equipment') as model:
+            model.objects.order_by.return_value.values_list.return_value = []
+            self.assertIsNone(heatmap_png(validation_matrix()))
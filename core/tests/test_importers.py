@@ -0,0 +1,178 @@
+import io
+
+from django.test import TestCase
+
+from core.importers import apply_bom_diff, import_equipment, read_bom_diff
+from core.models import BomItem, BomItemVariant, Equipment, EquipmentDevice, Variant
+
+
+def sheet(*lines):
+    return io.BytesIO('\n'.join(lines).encode())
+
+
+EQUIPMENT_HEADER = 'Station,Owner,Power kW,Height,Device Type,Device Name,IP'
+
+
+class ImportEquipmentTests(TestCase):
+    fixtures = ['initial_data', 'equipment_devices']
+
+    def test_creates_and_updates_across_batches(self):
+        report = import_equipment(sheet(
+            EQUIPMENT_HEADER,
+            'OP 50.1,Preh,"2,5",1200 mm,PLC 1500,OP50-1=PLC-KF1,172.19.123.170',  # existing device, new IP
+            'ST-A,Preh,3,,PLC,ST-A=PLC,172.19.124.1',
+            ',,,,,,',  # blank line
+            'ST-A,Preh,3,,HMI,ST-A=HMI,172.19.124.2',
+            'ST-B,Customer,,,,,',  # station only
+        ), 'stations.csv', batch_size=2)
+
+        self.assertEqual((report.rows, report.error_count), (4, 0))
+        # ST-A is created by the first batch and updated by the second
+        self.assertEqual((report.equipment_created, report.equipment_updated), (2, 2))
+        self.assertEqual((report.devices_created, report.devices_updated), (2, 1))
+        station = Equipment.objects.get(station='OP 50.1')
+        self.assertEqual(str(station.power_kw_value), '2.50')
+        self.assertEqual(str(station.height_value), '1200.00')
+        device = EquipmentDevice.objects.get(pk=1)
+        self.assertEqual((device.device_type, device.ip_address), ('PLC 1500', '172.19.123.170'))
+        self.assertEqual(device.ip_int, 0xAC137BAA)
+        self.assertEqual(
+            sorted(EquipmentDevice.objects.filter(equipment__station='ST-A').values_list('name', flat=True)),
+            ['ST-A=HMI', 'ST-A=PLC'],
+        )
+        self.assertTrue(Equipment.objects.filter(station='ST-B', owner='Customer').exists())
+
+    def test_invalid_rows_are_reported_and_skipped(self):
+        report = import_equipment(sheet(
+            EQUIPMENT_HEADER,
+            ',Preh,,,,,',
+            'ST-A,Nobody,,,,,',
+            'ST-B,Preh,,,PLC,ST-B=PLC,172.19.124.300',
+            'ST-C,Preh,,,,,',
+        ), 'stations.csv')
+
+        self.assertEqual(report.error_count, 3)
+        self.assertEqual([row for row, _ in report.errors], [2, 3, 4])
+        self.assertEqual(report.equipment_created, 1)
+        self.assertFalse(Equipment.objects.filter(station__in=['ST-A', 'ST-B']).exists())
+
+    def test_ip_clash_leaves_the_device_untouched(self):
+        report = import_equipment(sheet(
+            EQUIPMENT_HEADER,
+            'OP 50.1,Preh,,,Changed,OP50-1=PLC-KF1,172.19.123.50',  # used by a device of OP 50.2
+            'ST-A,Preh,,,PLC,ST-A=PLC,172.19.123.51',  # used as well: the new device is not created
+            'ST-A,Preh,,,PLC,ST-A=PLC,172.19.124.9',  # so this row creates it
+            'ST-B,Preh,,,PLC,ST-B=PLC,172.19.124.9',  # now taken by ST-A=PLC
+        ), 'stations.csv')
+
+        self.assertEqual([row for row, _ in report.errors], [2, 3, 5])
+        device = EquipmentDevice.objects.get(pk=1)
+        self.assertEqual((device.device_type, device.ip_address), ('PLC 1217C DC/DC/DC', '172.19.123.150'))
+        self.assertEqual(report.devices_updated, 0)
+        self.assertEqual(
+            list(EquipmentDevice.objects.filter(equipment__station__startswith='ST-').values_list('name', 'ip_address')),
+            [('ST-A=PLC', '172.19.124.9')],
+        )
+
+    def test_address_freed_in_the_same_batch_can_be_reused(self):
+        report = import_equipment(sheet(
+            EQUIPMENT_HEADER,
+            'OP 50.1,Preh,,,PLC,OP50-1=PLC-KF1,172.19.124.1',
+            'ST-A,Preh,,,PLC,ST-A=PLC,172.19.123.150',  # OP50-1=PLC-KF1's old address
+        ), 'stations.csv')
+
+        self.assertEqual(report.error_count, 0)
+        self.assertEqual(EquipmentDevice.objects.get(name='ST-A=PLC').ip_address, '172.19.123.150')
+
+    def test_blank_cells_keep_earlier_values(self):
+        header = 'Station,Owner,Eq Number,Height,Device Type,Device Name,IP'
+        report = import_equipment(sheet(
+            header,
+            'ZZ1,Preh,E-1,1500,PLC,ZZ1=PLC,172.19.124.1',
+            'ZZ1,,,,HMI,ZZ1=HMI,',  # the same station again, only a new device
+        ), 'stations.csv')
+
+        self.assertEqual(report.error_count, 0)
+        station = Equipment.objects.get(station='ZZ1')
+        self.assertEqual((station.owner, station.eq_number, station.height), ('Preh', 'E-1', '1500'))
+        self.assertEqual(str(station.height_value), '1500.00')
+        self.assertEqual(EquipmentDevice.objects.get(name='ZZ1=HMI').ip_address, '')
+
+        # Re-importing with blanks over the stored station and devices
+        import_equipment(sheet(
+            header,
+            'ZZ1,,E-2,,,ZZ1=PLC,',
+            'OP 50.1,,,,,OP50-1=PLC-KF1,',
+        ), 'stations.csv')
+        station.refresh_from_db()
+        self.assertEqual((station.owner, station.eq_number, station.height), ('Preh', 'E-2', '1500'))
+        device = EquipmentDevice.objects.get(name='ZZ1=PLC')
+        self.assertEqual((device.device_type, device.ip_address), ('PLC', '172.19.124.1'))
+        device = EquipmentDevice.objects.get(pk=1)
+        self.assertEqual((device.device_type, device.ip_address), ('PLC 1217C DC/DC/DC', '172.19.123.150'))
+        station = Equipment.objects.get(station='OP 50.1')
+        self.assertEqual((station.owner, station.power_kw), ('Preh', '2'))
+
+
+BOM_HEADER = 'Station,Material/Part Number,Description,Qty,LHD,RHD,EV,Hybrid,PHEV'
+
+
+class BomImportTests(TestCase):
+    fixtures = ['initial_data', 'bom_data']
+
+    def read_diff(self):
+        return read_bom_diff(sheet(
+            BOM_HEADER,
+            'OP 10,10546-001-A,Main PCB Assembly v2,1,x,x,,,x',  # changed: description, EV off, PHEV on
+            'OP 10,10546-009-Z,Cable,3,X,,,,',  # added
+            'OP 10,10546-009-Z,Cable,3,X,,,,',  # duplicate
+            'ST999,10546-001-A,,1,,,,,',  # unknown station
+            'OP 10,10546-010-Y,,many,,,,,',  # bad quantity
+            'OP 20.1,10546-003-C,Display Module,1,x,,x,x,',  # unchanged
+        ), 'bom.csv')
+
+    def test_diff_is_computed_before_writing(self):
+        diff = self.read_diff()
+
+        self.assertEqual((diff.rows, diff.error_count), (6, 3))
+        self.assertEqual([row for row, _ in diff.errors], [4, 5, 6])
+        self.assertEqual(diff.new_variants, ['PHEV'])
+        self.assertEqual([(row['station'], row['part_number']) for row in diff.adds], [('OP 10', '10546-009-Z')])
+        (item, fields, variants), = diff.changes
+        self.assertEqual(item.part_number, '10546-001-A')
+        self.assertEqual(fields, {'description': ('Main PCB Assembly', 'Main PCB Assembly v2')})
+        self.assertEqual(variants, {'EV': False, 'PHEV': True})
+        # Items of the listed stations missing from the sheet are removed; OP 30.1 is not listed
+        self.assertEqual([item.part_number for item in diff.removals], ['10546-002-B', '10546-004-D'])
+        self.assertFalse(Variant.objects.filter(name='PHEV').exists())
+        self.assertEqual(BomItem.objects.count(), 5)
+
+    def test_apply_writes_the_diff(self):
+        apply_bom_diff(self.read_diff())
+
+        phev = Variant.objects.get(name='PHEV')
+        self.assertEqual(
+            sorted(BomItem.objects.values_list('equipment__station', 'part_number')),
+            [('OP 10', '10546-001-A'), ('OP 10', '10546-009-Z'), ('OP 20.1', '10546-003-C'),
+             ('OP 30.1', '10546-005-E')],
+        )
+        self.assertEqual(BomItem.objects.get(pk=1).description, 'Main PCB Assembly v2')
+        marks = {
+            (through.bom_item.part_number, through.variant.name): through.is_applicable
+            for through in BomItemVariant.objects.select_related('bom_item', 'variant')
+        }
+        self.assertEqual(len(marks), 4 * 5)  # one through row per item and variant
+        self.assertEqual(
+            {variant for (part, variant), applicable in marks.items() if part == '10546-001-A' and applicable},
+            {'LHD', 'RHD', 'PHEV'},
+        )
+        self.assertEqual(
+            {variant for (part, variant), applicable in marks.items() if part == '10546-009-Z' and applicable},
+            {'LHD'},
+        )
+        self.assertFalse(BomItemVariant.objects.filter(bom_item_id=5, variant=phev, is_applicable=True).exists())
+        self.assertEqual(BomItem.objects.get(part_number='10546-009-Z').quantity, 3)
+
+    def test_sheet_without_required_columns_is_rejected(self):
+        with self.assertRaises(ValueError):
+            read_bom_diff(sheet('Description,LHD', 'PCB,x'), 'bom.csv')
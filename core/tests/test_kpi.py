@@ -0,0 +1,97 @@
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from django.test import TestCase, override_settings
+
+from core import kpi
+from core.audit import KIND_VALIDATION
+from core.models import DocumentationResult, KpiSummary, ValidationResult
+
+from .test_audit import record_at
+
+
+NOW = datetime(2026, 3, 10, 12, tzinfo=timezone.utc)
+
+
+def by_metric(rows):
+    summary = {}
+    for row in rows:
+        summary.setdefault(row.metric, {})[row.key] = row
+    return summary
+
+
+class KpiSummaryTests(TestCase):
+    fixtures = ['initial_data', 'equipment_devices', 'documentation_categories', 'bom_data']
+
+    def setUp(self):
+        ValidationResult.set_status(1, 1, 'OK')
+        ValidationResult.set_status(1, 2, 'OK')
+        ValidationResult.set_status(2, 4, 'NOK')
+        DocumentationResult.toggle(1, 1)
+
+    def test_compute_summary(self):
+        summary = by_metric(kpi.compute_summary(NOW))
+        stations, items = 13, 22
+
+        self.assertEqual((summary['validation_station']['1'].value, summary['validation_station']['1'].total), (2, items))
+        self.assertEqual(summary['validation_station']['2'].value, 0)
+        self.assertEqual(sum(row.total for row in summary['validation_owner'].values()), stations * items)
+        validation = summary['validation']['all']
+        self.assertEqual((validation.value, validation.total), (2, stations * items))
+        self.assertEqual(summary['nok_category']['2'].value, 1)
+        self.assertEqual(summary['documentation']['all'].value, 1)
+        self.assertEqual(summary['devices']['all'].total, 20)
+        self.assertEqual(summary['bom_variant']['1'].total, 5)
+
+        burndown = sorted(summary['burndown'].values(), key=lambda row: row.position)
+        self.assertEqual(len(burndown), kpi.BURNDOWN_DAYS)
+        self.assertEqual(burndown[-1].key, '2026-03-10')
+        self.assertTrue(all(row.value == stations * items for row in burndown))  # no events recorded
+
+    def test_burndown_follows_the_event_log(self):
+        record_at(NOW - timedelta(days=1), 1, KIND_VALIDATION, 1, True)
+        record_at(NOW - timedelta(days=1), 1, KIND_VALIDATION, 2, True)
+        record_at(NOW - timedelta(hours=1), 1, KIND_VALIDATION, 2, False)
+
+        burndown = sorted(by_metric(kpi.compute_summary(NOW))['burndown'].values(), key=lambda row: row.position)
+        total = 13 * 22
+        self.assertEqual([row.value for row in burndown[-3:]], [total, total - 2, total - 1])
+
+    def test_summary_is_materialized(self):
+        summary = kpi.load_summary()  # built on first use
+        self.assertEqual(summary['validation'][0].value, 2)
+        ValidationResult.set_status(3, 1, 'OK')
+        with self.assertNumQueries(1):
+            summary = kpi.load_summary()
+        self.assertEqual(summary['validation'][0].value, 2)  # until the next rebuild
+
+        kpi.rebuild_summary()
+        self.assertEqual(kpi.load_summary()['validation'][0].value, 3)
+        self.assertEqual(KpiSummary.objects.filter(metric='validation').count(), 1)
+
+
+@override_settings(KPI_REFRESH_DELAY=0)
+class ScheduledRefreshTests(TestCase):
+    fixtures = ['initial_data']
+
+    def tearDown(self):
+        kpi._refresh_due.clear()
+
+    def test_bursts_are_debounced_per_database(self):
+        with mock.patch.object(kpi.threading, 'Thread') as thread:
+            kpi.schedule_refresh()
+            kpi.schedule_refresh()
+            kpi.schedule_refresh('other')
+        self.assertEqual([call.kwargs['args'] for call in thread.call_args_list], [('default',), ('other',)])
+        self.assertEqual(thread.return_value.start.call_count, 2)
+
+        # The thread body, run here: the rebuild happens once the due time has passed
+        kpi._refresh_when_due('default')
+        self.assertNotIn('default', kpi._refresh_due)
+        self.assertEqual(KpiSummary.objects.get(metric='validation').total, 13 * 22)
+
+    def test_writes_schedule_a_refresh(self):
+        with mock.patch.object(kpi, 'schedule_refresh') as schedule_refresh:
+            with self.captureOnCommitCallbacks(execute=True):
+                ValidationResult.objects.create(equipment_id=1, checklist_item_id=1, status='OK')
+        schedule_refresh.assert_called_once_with('default')
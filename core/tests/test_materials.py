@@ -0,0 +1,52 @@
+import io
+
+from django.test import TestCase
+
+from core.materials import material_requirements, planned_volumes, volume_overrides, write_requirements_csv
+from core.models import BomItem, BomItemVariant, Variant
+
+
+class MaterialRequirementsTests(TestCase):
+    fixtures = ['initial_data', 'bom_data']
+
+    def setUp(self):
+        for name, units in [('LHD', 10), ('RHD', 20), ('EV', 5), ('Hybrid', 1)]:
+            Variant.objects.filter(name=name).update(planned_volume=units)
+        # The same part at a second station, LHD only, and a placeholder row
+        extra = BomItem.objects.create(equipment_id=1, part_number='10546-004-D', quantity=2, order=6)
+        BomItemVariant.objects.create(bom_item=extra, variant_id=1, is_applicable=True)
+        placeholder = BomItem.objects.create(equipment_id=1, part_number='', quantity=3, order=7)
+        BomItemVariant.objects.create(bom_item=placeholder, variant_id=1, is_applicable=True)
+
+    def test_rollup(self):
+        requirements = material_requirements(planned_volumes())
+        self.assertEqual(requirements.by_station, [
+            ('OP 10', '10546-001-A', 35),  # LHD + RHD + EV
+            ('OP 10', '10546-002-B', 30),
+            ('OP 10', '10546-004-D', 20),
+            ('OP 20.1', '10546-003-C', 16),
+            ('OP 20.1', '10546-004-D', 144),  # 4 per unit of every variant
+            ('OP 30.1', '10546-005-E', 432),
+        ])
+        self.assertEqual(dict(requirements.by_part)['10546-004-D'], 164)
+        self.assertEqual(requirements.total, 677)
+
+    def test_overrides(self):
+        requirements = material_requirements(planned_volumes({1: 0, 2: 0, 3: 0, 999: 50}))
+        self.assertEqual(requirements.by_station, [
+            ('OP 20.1', '10546-003-C', 1), ('OP 20.1', '10546-004-D', 4), ('OP 30.1', '10546-005-E', 12),
+        ])
+        self.assertEqual(volume_overrides({'volume_2': '7', 'project': 'x'}), {2: 7})
+        for params in [{'volume_2': 'many'}, {'volume_x': '1'}, {'volume_2': '-1'}]:
+            with self.assertRaises(ValueError):
+                volume_overrides(params)
+
+    def test_csv(self):
+        output = io.StringIO()
+        write_requirements_csv(material_requirements({1: 1}), output)
+        self.assertEqual(output.getvalue().splitlines()[0], 'scope,station,part_number,quantity')
+        self.assertEqual(output.getvalue().splitlines()[-1], 'total,,,21')
+        response = self.client.get('/bom/requirements.csv?volume_1=1&volume_2=0&volume_3=0&volume_4=0')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content.decode().endswith('total,,,21\r\n'))
+        self.assertEqual(self.client.get('/bom/requirements.csv?volume_1=-5').status_code, 400)
@@ -0,0 +1,194 @@
+import asyncio
+import socket
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from core.models import Equipment, EquipmentDevice
+from core.network import SubnetAllocator, SubnetExhausted, ip_to_int, normalize_ip, probe, sweep, sweep_devices
+from core.views import DEFAULT_STATION_DEVICES, create_stations
+
+
+class IpAddressTests(SimpleTestCase):
+    def test_normalize_ip(self):
+        self.assertEqual(normalize_ip(' 172.19.123.5 '), '172.19.123.5')
+        self.assertEqual(normalize_ip('2001:DB8:0::1'), '2001:db8::1')
+        self.assertEqual(normalize_ip(''), '')
+        self.assertEqual(normalize_ip(None), '')
+        for value in ['172.19.123.256', '172.19.123', 'PLC']:
+            with self.assertRaises(ValueError):
+                normalize_ip(value)
+
+    def test_ip_to_int(self):
+        self.assertEqual(ip_to_int('0.0.1.2'), 258)
+        self.assertIsNone(ip_to_int('2001:db8::1'))
+        self.assertIsNone(ip_to_int('not an ip'))
+        self.assertIsNone(ip_to_int(''))
+
+
+class SubnetAllocatorTests(SimpleTestCase):
+    def test_allocates_lowest_free_hosts_skipping_used(self):
+        allocator = SubnetAllocator('10.0.0.0/29', used=['10.0.0.1', '10.0.0.3'])
+        self.assertEqual(allocator.allocate_many(3), ['10.0.0.2', '10.0.0.4', '10.0.0.5'])
+
+    def test_never_returns_network_or_broadcast(self):
+        allocator = SubnetAllocator('10.0.0.0/30')
+        self.assertEqual(allocator.allocate_many(2), ['10.0.0.1', '10.0.0.2'])
+        with self.assertRaises(SubnetExhausted):
+            allocator.allocate()
+
+    def test_ignores_addresses_outside_the_subnet(self):
+        allocator = SubnetAllocator('10.0.0.0/30', used=['10.0.1.1', 'not an ip', ''])
+        self.assertTrue(allocator.is_free('10.0.0.1'))
+        self.assertFalse(allocator.is_free('10.0.1.2'))
+
+    def test_allocate_many_rolls_back_when_exhausted(self):
+        allocator = SubnetAllocator('10.0.0.0/29', used=['10.0.0.2'])  # 5 free hosts
+        with self.assertRaises(SubnetExhausted):
+            allocator.allocate_many(6)
+        self.assertTrue(allocator.is_free('10.0.0.1'))
+        self.assertEqual(allocator.allocate_many(5), ['10.0.0.1', '10.0.0.3', '10.0.0.4', '10.0.0.5', '10.0.0.6'])
+
+
+class CreateStationsTests(TestCase):
+    def test_device_addresses_skip_used_ones(self):
+        create_stations(2)
+        EquipmentDevice.objects.filter(ip_address='172.19.123.2').delete()
+        station, = create_stations(1)
+        addresses = list(station.devices.order_by('id').values_list('ip_address', flat=True))
+        self.assertEqual(addresses, ['172.19.123.2', '172.19.123.9', '172.19.123.10', '172.19.123.11'])
+
+    def test_station_names_continue_above_existing(self):
+        create_stations(2)
+        Equipment.objects.filter(station='NEW-1').delete()
+        self.assertEqual([station.station for station in create_stations(1)], ['NEW-3'])
+
+    def test_exhausted_subnet_writes_nothing(self):
+        too_many = 254 // len(DEFAULT_STATION_DEVICES) + 1
+        with self.assertRaises(SubnetExhausted):
+            create_stations(too_many)
+        self.assertFalse(Equipment.objects.exists())
+        self.assertFalse(EquipmentDevice.objects.exists())
+
+
+class IpConflictTests(TestCase):
+    fixtures = ['initial_data', 'equipment_devices']
+
+    def test_fixture_devices_get_ip_int(self):
+        # loaddata saves raw, bypassing EquipmentDevice.save()
+        self.assertFalse(EquipmentDevice.objects.exclude(ip_address='').filter(ip_int__isnull=True).exists())
+        device = EquipmentDevice.objects.get(pk=1)
+        self.assertEqual(device.ip_int, ip_to_int('172.19.123.150'))
+
+    def test_find_ip_conflicts_across_stations(self):
+        device = EquipmentDevice.objects.get(pk=5)  # another station's device
+        conflicts = device.find_ip_conflicts('172.19.123.150')
+        self.assertEqual([conflict.pk for conflict in conflicts], [1])
+        self.assertFalse(device.find_ip_conflicts('172.19.123.50').exists())  # its own address
+        self.assertFalse(device.find_ip_conflicts('172.19.123.99').exists())
+
+    def test_allocator_is_seeded_from_fixture_devices(self):
+        allocator = SubnetAllocator.from_devices()
+        self.assertFalse(allocator.is_free('172.19.123.150'))
+        self.assertTrue(allocator.is_free('172.19.123.1'))
+
+    def test_ip_int_follows_update_fields(self):
+        device = EquipmentDevice.objects.get(pk=1)
+        device.ip_address = '172.19.123.200'
+        device.save(update_fields=['ip_address'])
+        self.assertEqual(EquipmentDevice.objects.get(pk=1).ip_int, ip_to_int('172.19.123.200'))
+
+    def test_device_update_rejects_used_address(self):
+        response = self.client.post('/device/update/5/', {'field': 'ip_address', 'value': '172.19.123.150'})
+        self.assertEqual(response.status_code, 409)
+        response = self.client.post('/device/update/5/', {'field': 'ip_address', 'value': '172.19.123.300'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post('/device/update/5/', {'field': 'ip_address', 'value': ' 172.19.123.99'})
+        self.assertEqual(response.content, b'172.19.123.99')
+        self.assertEqual(EquipmentDevice.objects.get(pk=5).ip_int, ip_to_int('172.19.123.99'))
+
+
+def closed_port():
+    """A local port nothing listens on (connects to it are refused)."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class ProbeTests(SimpleTestCase):
+    def test_listening_port_answers(self):
+        async def run():
+            server = await asyncio.start_server(lambda reader, writer: writer.close(), '127.0.0.1', 0)
+            async with server:
+                port = server.sockets[0].getsockname()[1]
+                return await probe('127.0.0.1', [closed_port(), port], timeout=2)
+        self.assertIsNotNone(asyncio.run(run()))
+
+    def test_refused_connection_counts_as_online(self):
+        self.assertIsNotNone(asyncio.run(probe('127.0.0.1', [closed_port()], timeout=2)))
+
+    def test_timeout_bounds_the_whole_host(self):
+        async def hang(host, port):
+            await asyncio.sleep(10)
+
+        with mock.patch('core.network._tcp_connect', hang):
+            self.assertIsNone(asyncio.run(probe('192.0.2.1', [102, 80, 502], timeout=0.05)))
+
+    def test_unreachable_ports_are_skipped(self):
+        async def connect(host, port):
+            if port == 102:
+                raise OSError('No route to host')
+            return 1.5
+
+        with mock.patch('core.network._tcp_connect', connect):
+            self.assertEqual(asyncio.run(probe('192.0.2.1', [102, 80], timeout=1)), 1.5)
+
+
+class FakeProber:
+    """Answers for hosts in `online`, records the highest number of probes in flight."""
+
+    def __init__(self, online):
+        self.online = online
+        self.in_flight = self.max_in_flight = 0
+
+    async def __call__(self, host, ports, timeout):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.001)
+        self.in_flight -= 1
+        return 2.0 if host in self.online else None
+
+
+class SweepTests(SimpleTestCase):
+    def test_results_per_host_with_bounded_concurrency(self):
+        hosts = [f'10.0.0.{host}' for host in range(1, 21)]
+        prober = FakeProber(online={'10.0.0.3', '10.0.0.7'})
+        results = asyncio.run(sweep(hosts, [102], timeout=1, concurrency=4, prober=prober))
+        self.assertEqual(set(results), set(hosts))
+        self.assertEqual({host for host, latency in results.items() if latency is not None}, prober.online)
+        self.assertEqual(prober.max_in_flight, 4)
+
+
+class SweepDevicesTests(TestCase):
+    fixtures = ['initial_data', 'equipment_devices']
+
+    def test_stores_reachability_per_device(self):
+        EquipmentDevice.objects.filter(pk=2).update(ip_address='', ip_int=None)  # not probed
+        versions = dict(Equipment.objects.values_list('id', 'row_version'))
+        online, checked = sweep_devices(
+            ports=[102], timeout=1, concurrency=5, prober=FakeProber(online={'172.19.123.150'})
+        )
+        self.assertEqual((online, checked), (1, 19))
+
+        device = EquipmentDevice.objects.get(pk=1)
+        self.assertTrue(device.is_reachable)
+        self.assertEqual(device.latency_ms, 2.0)
+        self.assertEqual(device.last_seen_at, device.last_checked_at)
+        offline = EquipmentDevice.objects.get(pk=3)
+        self.assertIs(offline.is_reachable, False)
+        self.assertIsNone(offline.last_seen_at)
+        self.assertIsNotNone(offline.last_checked_at)
+        self.assertIsNone(EquipmentDevice.objects.get(pk=2).last_checked_at)
+        # Cached IP table rows of the swept stations re-render
+        self.assertEqual(Equipment.objects.get(pk=8).row_version, versions[8] + 1)
+        self.assertEqual(Equipment.objects.get(pk=1).row_version, versions[1])
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+
+from core.models import Equipment
+from core.profiling import ProfilingMiddleware, list_profiles, log_queries
+
+
+class ProfilingMiddlewareTests(TestCase):
+    fixtures = ['initial_data']
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = override_settings(PROFILE_DIR=os.path.join(self.directory, 'profiles'))
+        override.enable()
+        self.addCleanup(override.disable)
+        self.staff = User.objects.create_user('staff', password='secret', is_staff=True)
+
+    def test_off_unless_a_staff_user_asks(self):
+        self.assertNotIn('X-Profile', self.client.get('/equipment/?profile=1'))  # anonymous
+        self.client.force_login(User.objects.create_user('user', password='secret'))
+        self.assertNotIn('X-Profile', self.client.get('/equipment/?profile=1'))
+        self.client.force_login(self.staff)
+        self.assertNotIn('X-Profile', self.client.get('/equipment/'))
+        self.assertEqual(list_profiles(), [])
+
+    def test_staff_request_is_profiled(self):
+        self.client.force_login(self.staff)
+        name = self.client.get('/equipment/?profile=1')['X-Profile']
+        self.client.get('/equipment/', HTTP_X_PROFILE='1')
+        profiles = list_profiles()
+        self.assertEqual(len(profiles), 2)
+        self.assertIn(name, {profile['name'] for profile in profiles})
+        self.assertEqual({profile['view'] for profile in profiles}, {'core.views.equipment'})
+
+        report = self.client.get(f'/profiles/{name}/')
+        self.assertIn('function calls', report.content.decode())
+        self.assertEqual(self.client.get('/profiles/nope.prof/').status_code, 404)
+
+
+def n_plus_one(request):
+    for pk in range(1, 6):
+        Equipment.objects.get(pk=pk)
+    return HttpResponse()
+
+
+def distinct_queries(request):
+    Equipment.objects.count()
+    Equipment.objects.first()
+    Equipment.objects.last()
+    return HttpResponse()
+
+
+def run_view(view):
+    """Call `view` through ProfilingMiddleware as the handler would."""
+    middleware = ProfilingMiddleware(lambda request: middleware.process_view(request, view, (), {}) or view(request))
+    return middleware(RequestFactory().get('/'))
+
+
+class QueryLogTests(TestCase):
+    fixtures = ['initial_data']
+
+    def test_installed_on_every_connection(self):
+        connection.ensure_connection()
+        self.assertIn(log_queries, connection.execute_wrappers)
+
+    @override_settings(REPEATED_QUERY_THRESHOLD=3)
+    def test_repeated_query_is_logged_once(self):
+        with self.assertLogs('core.profiling', 'WARNING') as logs:
+            run_view(n_plus_one)
+        self.assertEqual(len(logs.records), 1)
+        message = logs.records[0].getMessage()
+        self.assertIn(f'Query repeated 3 times in {__name__}.n_plus_one', message)
+        self.assertIn('core/tests/test_profiling.py', message)  # the frames that issued it
+
+    @override_settings(REPEATED_QUERY_THRESHOLD=3)
+    def test_different_queries_are_not_repeats(self):
+        with self.assertNoLogs('core.profiling', 'WARNING'):
+            run_view(distinct_queries)
+
+    @override_settings(SLOW_QUERY_THRESHOLD=0)
+    def test_slow_queries_are_logged(self):
+        with self.assertLogs('core.profiling', 'WARNING') as logs:
+            Equipment.objects.count()
+        self.assertIn('Slow query', logs.records[0].getMessage())
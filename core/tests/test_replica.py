@@ -0,0 +1,143 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+from unittest import mock
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from core import replica
+from core.models import Equipment
+from core.replica import (
+    STICKY_COOKIE, ReplicaStickinessMiddleware, primary_reads, read_database, replica_reads, written,
+)
+from core.tenancy import ProjectRouter
+
+
+class StopRefreshing(Exception):
+    pass
+
+
+def in_view(func, cookies=None):
+    """Run func inside a @replica_reads view and return its result."""
+    request = RequestFactory().get('/')
+    request.COOKIES.update(cookies or {})
+    return replica_reads(lambda request: func())(request)
+
+
+@override_settings(READ_REPLICA_ENABLED=True)
+class ReadDatabaseTests(SimpleTestCase):
+    def setUp(self):
+        # A configured replica (as for a server database) is used without a refresh thread
+        connections.settings['reads_replica'] = dict(connections.settings[DEFAULT_DB_ALIAS])
+        self.addCleanup(connections.settings.pop, 'reads_replica')
+
+    def test_replica_only_inside_replica_reads_views(self):
+        self.assertEqual(read_database('reads'), 'reads')
+        self.assertEqual(in_view(lambda: read_database('reads')), 'reads_replica')
+        self.assertEqual(in_view(lambda: read_database('reads'), cookies={STICKY_COOKIE: '1'}), 'reads')
+        with override_settings(READ_REPLICA_ENABLED=False):
+            self.assertEqual(in_view(lambda: read_database('reads')), 'reads')
+
+    def test_primary_after_a_write_and_in_primary_reads(self):
+        def read_write_read():
+            before = read_database('reads')
+            with primary_reads():
+                inside = read_database('reads')
+            after_block = read_database('reads')
+            written()
+            return before, inside, after_block, read_database('reads')
+
+        self.assertEqual(in_view(read_write_read), ('reads_replica', 'reads', 'reads_replica', 'reads'))
+        self.assertEqual(in_view(lambda: read_database('reads')), 'reads_replica')  # the next request
+
+    def test_router_reads_the_replica_and_writes_the_primary(self):
+        router = ProjectRouter()
+        with mock.patch('core.tenancy.current_database', return_value='reads'):
+            self.assertEqual(in_view(lambda: router.db_for_read(Equipment)), 'reads_replica')
+            self.assertEqual(in_view(lambda: (router.db_for_write(Equipment), router.db_for_read(Equipment))),
+                             ('reads', 'reads'))
+
+    def test_sticky_cookie_after_writes(self):
+        middleware = ReplicaStickinessMiddleware(lambda request: HttpResponse())
+        response = middleware(RequestFactory().post('/'))
+        self.assertEqual(response.cookies[STICKY_COOKIE]['max-age'], 10)
+        self.assertNotIn(STICKY_COOKIE, middleware(RequestFactory().get('/')).cookies)
+        with override_settings(READ_REPLICA_ENABLED=False):
+            self.assertNotIn(STICKY_COOKIE, middleware(RequestFactory().post('/')).cookies)
+
+
+class RefreshTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.source = os.path.join(self.directory, 'primary.sqlite3')
+        with sqlite3.connect(self.source) as connection:
+            connection.execute('CREATE TABLE t (x)')
+            connection.execute('INSERT INTO t VALUES (1)')
+        connection.close()
+        self.replica = os.path.join(self.directory, 'replica.sqlite3')
+        self.addCleanup(replica._ready.discard, 'refresh_test')
+
+    def refresh_once(self):
+        with mock.patch.object(replica.time, 'sleep', side_effect=StopRefreshing):
+            with self.assertRaises(StopRefreshing):
+                replica._keep_refreshing('refresh_test', self.source, self.replica)
+
+    def test_in_memory_databases_get_no_replica(self):
+        self.addCleanup(connections.settings.pop, 'memory_test')
+        names = [
+            ':memory:',
+            'file:memorydb_default?mode=memory&cache=shared',  # Django's test database
+            'file:x.sqlite3?mode=ro',
+        ]
+        with mock.patch.object(replica.threading, 'Thread') as thread:
+            for name in names:
+                connections.settings['memory_test'] = dict(connections.settings[DEFAULT_DB_ALIAS], NAME=name)
+                replica._start_refreshing('memory_test')
+                self.assertNotIn('memory_test_replica', connections.settings, name)
+        thread.assert_not_called()
+
+    def test_file_databases_start_one_refresh_thread(self):
+        connections.settings['file_test'] = dict(connections.settings[DEFAULT_DB_ALIAS], NAME=self.source)
+        self.addCleanup(connections.settings.pop, 'file_test')
+        self.addCleanup(connections.settings.pop, 'file_test_replica')
+        self.addCleanup(replica._refreshing.discard, 'file_test')
+        with override_settings(READ_REPLICA_DIR=self.directory), \
+                mock.patch.object(replica.threading, 'Thread') as thread:
+            replica._start_refreshing('file_test')
+            replica._start_refreshing('file_test')
+        thread.assert_called_once()
+        replica_path = os.path.join(self.directory, 'file_test.sqlite3')
+        self.assertEqual(connections.settings['file_test_replica']['NAME'], f'file:{replica_path}?mode=ro')
+
+    def test_lock_holder_copies(self):
+        self.refresh_once()
+        with sqlite3.connect(self.replica) as copy:
+            self.assertEqual(copy.execute('SELECT x FROM t').fetchall(), [(1,)])
+        copy.close()
+        self.assertIn('refresh_test', replica._ready)
+
+    def test_other_processes_wait_for_the_holders_copy(self):
+        # Another process's lock: SQLite locks exclude other connections of this process too
+        holder = sqlite3.connect(f'{self.replica}.lock', isolation_level=None)
+        self.addCleanup(holder.close)
+        self.assertTrue(replica._take_lock(holder))
+        os.utime(f'{self.replica}.lock', ns=(10**18, 10**18))
+
+        with open(self.replica, 'w'):
+            pass  # left over from an earlier holder
+        os.utime(self.replica, ns=(10**18 - 1, 10**18 - 1))
+        self.refresh_once()
+        self.assertNotIn('refresh_test', replica._ready)
+        self.assertEqual(os.path.getsize(self.replica), 0)  # not copied by this process
+
+        os.utime(self.replica, ns=(10**18 + 1, 10**18 + 1))  # the holder's first copy
+        self.refresh_once()
+        self.assertIn('refresh_test', replica._ready)
+
+        holder.close()  # the holder exits: this process takes over
+        self.refresh_once()
+        self.assertGreater(os.path.getsize(self.replica), 0)
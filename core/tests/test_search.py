@@ -0,0 +1,57 @@
+from django.db import connection, connections
+from django.test import SimpleTestCase, TestCase
+
+from core.search import SEARCH_TABLE, match_expression, query_index, rebuild_index
+
+from .test_tenancy import TemporaryDatabaseTestCase
+
+
+def index_rows(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT rowid, title, body FROM {SEARCH_TABLE} ORDER BY rowid")
+        return cursor.fetchall()
+
+
+class MatchExpressionTests(SimpleTestCase):
+    def test_terms_become_prefix_phrases(self):
+        self.assertEqual(match_expression('172.18.1 plc'), '"172 18 1"* "plc"*')
+        self.assertEqual(match_expression(' -- '), '')
+
+
+class SearchIndexTests(TestCase):
+    fixtures = ['initial_data', 'equipment_devices', 'bom_data']
+
+    def test_rebuild_and_query(self):
+        rebuild_index(connection)
+        results = query_index('172.19.123.15')
+        self.assertEqual({result['label'] for result in results}, {'Device'})
+        self.assertEqual(len(results), 4)
+        bom, = query_index('Main PCB')
+        self.assertEqual((bom['label'], bom['url']), ('BOM', '/bom/#bom-row-1'))
+        self.assertIn('<mark>', bom['title'] + bom['snippet'])
+
+
+class SearchMigrationTests(TemporaryDatabaseTestCase):
+    """Migration 0011 indexes the database being migrated, not the current project's."""
+
+    aliases = ['search_migration_test']
+
+    def test_frozen_documents_match_the_live_ones(self):
+        alias = 'search_migration_test'
+        apps = self.migrate(alias, '0010_equipment_station_unique')
+        station = apps.get_model('core', 'Equipment').objects.using(alias).create(
+            station='OP 70', owner='Preh', eq_number='EQ-7', power_supply='AC 400V',
+        )
+        apps.get_model('core', 'EquipmentDevice').objects.using(alias).create(
+            equipment=station, device_type='PLC', name='', ip_address='10.1.2.3',
+        )
+        apps.get_model('core', 'BomItem').objects.using(alias).create(
+            station='OP 70', part_number='PN-1', description='Bracket',
+        )
+        self.migrate(alias, '0011_search_index')
+        frozen = index_rows(connections[alias])
+        self.assertEqual(len(frozen), 3)
+
+        self.migrate(alias)
+        rebuild_index(connections[alias])
+        self.assertEqual(index_rows(connections[alias]), frozen)
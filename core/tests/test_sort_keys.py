@@ -0,0 +1,62 @@
+from django.test import TestCase
+
+from core.models import (
+    CATALOG_SORT_STRIDE, DocumentationCategory, DocumentationChecklistItem, DocumentationResult,
+    ValidationCategory, ValidationChecklistItem, ValidationResult,
+)
+
+
+def sort_keys(result_model):
+    return dict(result_model.objects.values_list('checklist_item_id', 'sort_key'))
+
+
+def protocol_order(equipment_id):
+    return list(ValidationResult.objects.filter(equipment_id=equipment_id).values_list('checklist_item_id', flat=True))
+
+
+class ResultSortKeyTests(TestCase):
+    """Reordering the catalog rewrites the sort_key stored on existing results."""
+
+    fixtures = ['initial_data', 'documentation_categories']
+
+    def test_validation_results_follow_the_catalog(self):
+        for item_id in (1, 2, 4):
+            ValidationResult.set_status(1, item_id, 'OK')
+        ValidationResult.set_status(2, 1, 'NOK')
+        self.assertEqual(sort_keys(ValidationResult)[4], 2 * CATALOG_SORT_STRIDE + 1)
+
+        item = ValidationChecklistItem.objects.get(pk=1)
+        item.order = 9
+        item.save()
+        self.assertEqual(
+            set(ValidationResult.objects.filter(checklist_item_id=1).values_list('sort_key', flat=True)),
+            {1 * CATALOG_SORT_STRIDE + 9},
+        )
+        self.assertEqual(protocol_order(1), [2, 1, 4])
+
+        item.category_id = 2  # moved to another category
+        item.save()
+        self.assertEqual(sort_keys(ValidationResult)[1], 2 * CATALOG_SORT_STRIDE + 9)
+
+        category = ValidationCategory.objects.get(pk=2)
+        category.order = 0  # renumbered ahead of category 1
+        category.save()
+        self.assertEqual(sort_keys(ValidationResult), {1: 9, 2: 1 * CATALOG_SORT_STRIDE + 2, 4: 1})
+        self.assertEqual(protocol_order(1), [4, 1, 2])
+
+    def test_documentation_results_follow_the_catalog(self):
+        DocumentationResult.toggle(1, 1)
+        DocumentationResult.toggle(1, 2)
+        item = DocumentationChecklistItem.objects.get(pk=2)
+        category = DocumentationCategory.objects.get(pk=item.category_id)
+
+        item.order = 7
+        item.save()
+        self.assertEqual(sort_keys(DocumentationResult)[2], category.order * CATALOG_SORT_STRIDE + 7)
+
+        category.order = 42
+        category.save()
+        self.assertEqual(
+            set(DocumentationResult.objects.filter(checklist_item__category=category).values_list('sort_key', flat=True)),
+            {42 * CATALOG_SORT_STRIDE + other.order for other in category.items.filter(results__isnull=False)},
+        )
@@ -0,0 +1,194 @@
+import os
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.migrations.executor import MigrationExecutor
+from django.http import Http404, HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from core.models import Equipment, Project, ValidationChecklistItem
+from core.search import SEARCH_TABLE
+from core.tenancy import (
+    SESSION_KEY, ProjectMiddleware, ProjectRouter, copy_catalogs, current_database, project_alias, use_database,
+)
+
+
+def on_database(instance, alias):
+    instance._state.db = alias
+    return instance
+
+
+class ProjectRouterTests(SimpleTestCase):
+    router = ProjectRouter()
+
+    def test_reads_and_writes_follow_the_current_database(self):
+        self.assertEqual(self.router.db_for_read(Equipment), DEFAULT_DB_ALIAS)
+        with use_database('project_a'):
+            self.assertEqual(self.router.db_for_read(Equipment), 'project_a')
+            self.assertEqual(self.router.db_for_write(Equipment), 'project_a')
+            # The registry stays in 'default' whatever project is selected
+            self.assertEqual(self.router.db_for_read(Project), DEFAULT_DB_ALIAS)
+            self.assertEqual(self.router.db_for_write(Project), DEFAULT_DB_ALIAS)
+
+    def test_instances_keep_their_database(self):
+        station = on_database(Equipment(), 'project_b')
+        with use_database('project_a'):
+            self.assertEqual(self.router.db_for_read(Equipment, instance=station), 'project_b')
+            self.assertEqual(self.router.db_for_write(Equipment, instance=station), 'project_b')
+            # An instance read from a replica is written back to its primary
+            replica_station = on_database(Equipment(), 'project_b_replica')
+            self.assertEqual(self.router.db_for_write(Equipment, instance=replica_station), 'project_b')
+
+    def test_allow_relation(self):
+        station = on_database(Equipment(), 'project_a')
+        self.assertTrue(self.router.allow_relation(station, on_database(ValidationChecklistItem(), 'project_a')))
+        self.assertTrue(self.router.allow_relation(station, on_database(ValidationChecklistItem(), 'project_a_replica')))
+        self.assertFalse(self.router.allow_relation(station, on_database(ValidationChecklistItem(), 'project_b')))
+        self.assertTrue(self.router.allow_relation(Equipment(), on_database(Equipment(), DEFAULT_DB_ALIAS)))
+
+    def test_allow_migrate(self):
+        self.assertTrue(self.router.allow_migrate('project_a', 'core', 'equipment'))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'core', 'equipment'))
+        self.assertFalse(self.router.allow_migrate('project_a_replica', 'core', 'equipment'))
+        self.assertFalse(self.router.allow_migrate('project_a', 'core', 'project'))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'core', 'project'))
+        self.assertFalse(self.router.allow_migrate('project_a', 'auth', 'user'))
+        self.assertTrue(self.router.allow_migrate(DEFAULT_DB_ALIAS, 'sessions'))
+
+
+class ProjectMiddlewareTests(TestCase):
+    def setUp(self):
+        self.project = Project.objects.create(name='Line 7', slug='line7')
+        self.addCleanup(connections.settings.pop, project_alias('line7'), None)
+        self.seen = []
+
+    def call(self, request, session=None):
+        request.session = self.client.session if session is None else session
+
+        def get_response(request):
+            self.seen.append((request.project, current_database()))
+            return HttpResponse()
+        return ProjectMiddleware(get_response)(request)
+
+    def test_parameter_selects_the_project_and_redirects(self):
+        response = self.client.get('/equipment/?project=line7&sort=station')
+        self.assertRedirects(response, '/equipment/?sort=station', fetch_redirect_response=False)
+        self.assertEqual(self.client.session[SESSION_KEY], 'line7')
+
+        session = {SESSION_KEY: 'line7'}
+        self.call(RequestFactory().get('/equipment/'), session)
+        self.assertEqual(self.seen, [(self.project, 'project_line7')])
+        self.assertEqual(self.client.get('/equipment/?project=nope').status_code, 404)
+
+    def test_empty_parameter_returns_to_the_shared_workspace(self):
+        session = {SESSION_KEY: 'line7'}
+        response = self.call(RequestFactory().get('/?project='), session)
+        self.assertEqual((response.status_code, response['Location']), (302, '/'))
+        self.assertEqual(session[SESSION_KEY], '')
+        self.call(RequestFactory().get('/'), session)
+        self.assertEqual(self.seen, [(None, DEFAULT_DB_ALIAS)])
+
+    def test_posts_are_not_redirected(self):
+        session = {}
+        self.call(RequestFactory().post('/bom/add/?project=line7'), session)
+        self.assertEqual(self.seen, [(self.project, 'project_line7')])
+        with self.assertRaises(Http404):
+            self.call(RequestFactory().post('/bom/add/?project=nope'), session)
+
+    def test_deleted_project_is_cleared_from_the_session(self):
+        session = {SESSION_KEY: 'line7'}
+        self.project.delete()
+        self.call(RequestFactory().get('/'), session)
+        self.assertEqual(self.seen, [(None, DEFAULT_DB_ALIAS)])
+        self.assertNotIn(SESSION_KEY, session)
+
+
+class TemporaryDatabaseTestCase(SimpleTestCase):
+    """Migrates throwaway SQLite files; any query against 'default' fails the test."""
+
+    aliases = ['tenancy_test']
+
+    def setUp(self):
+        self.paths = {}
+        for alias in self.aliases:
+            handle, self.paths[alias] = tempfile.mkstemp(suffix='.sqlite3')
+            os.close(handle)
+            connections.settings[alias] = dict(connections.settings[DEFAULT_DB_ALIAS], NAME=self.paths[alias], TEST={})
+            self.addCleanup(self.drop, alias)
+
+    def drop(self, alias):
+        connections[alias].close()
+        del connections.settings[alias]
+        del connections[alias]
+        os.remove(self.paths[alias])
+
+    def migrate(self, alias, target=None):
+        executor = MigrationExecutor(connections[alias])
+        target = ('core', target) if target else executor.loader.graph.leaf_nodes('core')[0]
+        executor.migrate([target])
+        return executor.loader.project_state(target).apps
+
+
+class DataMigrationTests(TemporaryDatabaseTestCase):
+    """`migrate --database=<alias>` outside use_project changes that database only."""
+
+    def test_data_migrations_use_the_migrated_database(self):
+        apps = self.migrate('tenancy_test', '0007_equipment_row_version')
+        alias = 'tenancy_test'
+        Equipment = apps.get_model('core', 'Equipment')
+        first = Equipment.objects.using(alias).create(station='OP 1', owner='Preh', power_supply='AC', power_kw='2,5 kW')
+        Equipment.objects.using(alias).create(station='OP 1', owner='Preh', power_supply='AC')
+        apps.get_model('core', 'EquipmentDevice').objects.using(alias).create(
+            equipment=first, device_type='PLC', name='PLC', ip_address=' 10.0.0.1 ',
+        )
+        category = apps.get_model('core', 'ValidationCategory').objects.using(alias).create(code='safety', order=2)
+        item = apps.get_model('core', 'ValidationChecklistItem').objects.using(alias).create(category=category, order=3)
+        apps.get_model('core', 'ValidationResult').objects.using(alias).create(
+            equipment=first, checklist_item=item, status='OK',
+        )
+        apps.get_model('core', 'BomItem').objects.using(alias).create(station='OP 1', part_number='PN-1')
+
+        apps = self.migrate(alias)
+
+        stations = apps.get_model('core', 'Equipment').objects.using(alias).order_by('id')
+        self.assertEqual([station.station for station in stations], ['OP 1', f'OP 1-{first.pk + 1}'])  # 0010
+        self.assertEqual(stations[0].power_kw_value, Decimal('2.50'))  # 0015
+        device = apps.get_model('core', 'EquipmentDevice').objects.using(alias).get()
+        self.assertEqual((device.ip_address, device.ip_int), ('10.0.0.1', 0x0A000001))  # 0008
+        event = apps.get_model('core', 'ValidationEvent').objects.using(alias).get()  # 0012
+        self.assertEqual((event.equipment_id, event.item_id, event.value), (first.pk, item.pk, True))
+        result = apps.get_model('core', 'ValidationResult').objects.using(alias).get()
+        self.assertEqual(result.sort_key, 2 * 10000 + 3)  # 0014
+        self.assertEqual(apps.get_model('core', 'BomItem').objects.using(alias).get().equipment_id, first.pk)  # 0016
+
+
+class CopyCatalogsTests(TemporaryDatabaseTestCase):
+    aliases = ['tenancy_source', project_alias('copytest')]
+
+    def test_catalogs_are_copied_once(self):
+        for alias in self.aliases:
+            self.migrate(alias)
+        call_command('loaddata', 'initial_data', 'documentation_categories', database='tenancy_source', verbosity=0)
+        project = Project(name='Copy test', slug='copytest')  # the registry row is not needed
+
+        copy_catalogs(project, source='tenancy_source')
+
+        alias = project_alias('copytest')
+        for name in ['ValidationCategory', 'ValidationChecklistItem', 'DocumentationCategory', 'DocumentationChecklistItem']:
+            model = Equipment._meta.apps.get_model('core', name)
+            self.assertEqual(
+                list(model.objects.using(alias).values_list('pk', flat=True)),
+                list(model.objects.using('tenancy_source').values_list('pk', flat=True)),
+                name,
+            )
+        self.assertFalse(Equipment.objects.using(alias).exists())  # only the catalogs
+        with connections[alias].cursor() as cursor:
+            cursor.execute(f"SELECT count(*) FROM {SEARCH_TABLE}")
+            self.assertEqual(cursor.fetchone()[0], ValidationChecklistItem.objects.using(alias).count())
+
+        with mock.patch('core.search.rebuild_index') as rebuild_index:
+            copy_catalogs(project, source='tenancy_source')  # the project already has catalogs
+        rebuild_index.assert_not_called()
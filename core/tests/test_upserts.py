@@ -0,0 +1,57 @@
+from django.test import TestCase, TransactionTestCase
+
+from core.models import (
+    CATALOG_SORT_STRIDE, BomItemVariant, DocumentationResult, ValidationEvent, ValidationResult,
+)
+
+
+class UpsertTests(TestCase):
+    fixtures = ['initial_data', 'documentation_categories', 'bom_data']
+
+    def test_set_status_inserts_then_overwrites(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(ValidationResult.set_status(1, 2, 'NOK'), 'NOK')
+        first = ValidationResult.objects.get(equipment_id=1, checklist_item_id=2)
+        self.assertEqual(first.sort_key, 1 * CATALOG_SORT_STRIDE + 2)
+
+        self.assertEqual(ValidationResult.set_status(1, 2, 'OK'), 'OK')
+        result = ValidationResult.objects.get(equipment_id=1, checklist_item_id=2)
+        self.assertEqual((result.pk, result.status), (first.pk, 'OK'))
+        self.assertGreaterEqual(result.validated_at, first.validated_at)
+        self.assertEqual(ValidationResult.objects.count(), 1)
+
+    def test_documentation_toggle(self):
+        with self.assertNumQueries(1):
+            self.assertIs(DocumentationResult.toggle(1, 4), True)  # a missing row counts as unchecked
+        self.assertIs(DocumentationResult.toggle(1, 4), False)
+        self.assertIs(DocumentationResult.toggle(1, 4), True)
+        result, = DocumentationResult.objects.all()
+        self.assertEqual((result.is_checked, result.sort_key), (True, 2 * CATALOG_SORT_STRIDE + 1))
+
+    def test_bom_toggle(self):
+        self.assertIs(BomItemVariant.toggle(1, 4), True)  # fixture: not applicable
+        self.assertIs(BomItemVariant.toggle(1, 4), False)
+        BomItemVariant.objects.filter(bom_item_id=1, variant_id=4).delete()
+        self.assertIs(BomItemVariant.toggle(1, 4), True)
+        self.assertEqual(BomItemVariant.objects.filter(bom_item_id=1).count(), 4)
+
+    def test_submit_validation_view(self):
+        response = self.client.post('/validation/submit/3/5/', {'status': 'NOK'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ValidationResult.objects.get(equipment_id=3, checklist_item_id=5).status, 'NOK')
+        self.assertEqual(list(ValidationEvent.objects.values_list('equipment_id', 'item_id', 'value')), [(3, 5, False)])
+        self.assertEqual(self.client.post('/validation/submit/3/5/', {'status': 'maybe'}).status_code, 400)
+
+
+class UpsertConstraintTests(TransactionTestCase):
+    """Unknown ids are only caught by the deferred FK checks at commit, which TestCase never reaches."""
+
+    fixtures = ['initial_data', 'bom_data']
+
+    def test_unknown_ids_are_404(self):
+        self.assertEqual(self.client.post('/validation/submit/999/1/', {'status': 'OK'}).status_code, 404)
+        self.assertEqual(self.client.post('/validation/submit/1/999/', {'status': 'OK'}).status_code, 404)
+        self.assertEqual(self.client.post('/bom/toggle/1/999/').status_code, 404)
+        self.assertFalse(ValidationResult.objects.exists())
+        self.assertFalse(ValidationEvent.objects.exists())
+        self.assertFalse(BomItemVariant.objects.filter(variant_id=999).exists())
@@ -3,14 +3,21 @@ from . import views
 
 urlpatterns = [
     path('', views.dashboard, name='dashboard'),
+    path('search/', views.global_search, name='global_search'),
     path('project-team/', views.project_team, name='project_team'),
     path('project-team/pdf/', views.project_team_pdf_download, name='project_team_pdf_download'),
     path('project-team/upload/', views.project_team_upload, name='project_team_upload'),
+    path('project-team/preview/', views.project_team_preview, name='project_team_preview'),
+    path('project-team/versions/<str:name>/', views.project_team_version_download, name='project_team_version_download'),
     
     # Equipment views
     path('equipment/', views.equipment, name='equipment'),
     path('equipment/ips/', views.equipment_ips, name='equipment_ips'),
+    path('equipment/ips/subnets/', views.equipment_subnets, name='equipment_subnets'),
     path('equipment/add/', views.equipment_add, name='equipment_add'),
+    path('equipment/add/bulk/', views.equipment_add_bulk, name='equipment_add_bulk'),
+    path('equipment/import/', views.equipment_import, name='equipment_import'),
+    path('equipment/aggregates/', views.equipment_aggregates, name='equipment_aggregates'),
     path('equipment/update/<int:equipment_id>/', views.equipment_update, name='equipment_update'),
     path('equipment/delete/<int:equipment_id>/', views.equipment_delete, name='equipment_delete'),
     
@@ -18,9 +25,13 @@ urlpatterns = [
     path('device/add/<int:equipment_id>/', views.device_add, name='device_add'),
     path('device/update/<int:device_id>/', views.device_update, name='device_update'),
     path('device/delete/<int:device_id>/', views.device_delete, name='device_delete'),
+    path('device/sweep/', views.device_sweep, name='device_sweep'),
+    path('device/sweep/status/', views.device_sweep_status, name='device_sweep_status'),
     
     # Validation views
     path('validation/', views.validation, name='validation'),
+    path('validation/heatmap/', views.validation_heatmap, name='validation_heatmap'),
+    path('validation/analytics/', views.validation_analytics, name='validation_analytics'),
     
     # HTMX partials
     path('validation/checklist/<int:equipment_id>/', views.validation_checklist_partial, name='validation_checklist_partial'),
@@ -37,10 +48,13 @@ urlpatterns = [
     path('bom/add/', views.bom_add_row, name='bom_add_row'),
     path('bom/update/<int:item_id>/', views.bom_update_field, name='bom_update_field'),
     path('bom/delete/<int:item_id>/', views.bom_delete_row, name='bom_delete_row'),
+    path('bom/import/', views.bom_import, name='bom_import'),
     path('bom/toggle/<int:item_id>/<int:variant_id>/', views.bom_toggle_variant, name='bom_toggle_variant'),
     path('bom/variant/add/', views.bom_add_variant, name='bom_add_variant'),
     path('bom/variant/color/<int:variant_id>/', views.bom_update_variant_color, name='bom_update_variant_color'),
     path('bom/variant/delete/<int:variant_id>/', views.bom_delete_variant, name='bom_delete_variant'),
+    path('bom/variant/volume/<int:variant_id>/', views.bom_update_variant_volume, name='bom_update_variant_volume'),
+    path('bom/requirements.csv', views.bom_requirements_csv, name='bom_requirements_csv'),
     
     # Visual Aids views
     path('visual-aids/', views.visual_aids, name='visual_aids'),
@@ -48,4 +62,8 @@ urlpatterns = [
     path('visual-aids/image/<int:item_id>/', views.visual_aids_upload_image, name='visual_aids_upload_image'),
     path('visual-aids/export/pdf/', views.visual_aids_export_pdf, name='visual_aids_export_pdf'),
     path('visual-aids/export/docx/', views.visual_aids_export_docx, name='visual_aids_export_docx'),
+    
+    # Profiling (staff only)
+    path('profiles/', views.profiles, name='profiles'),
+    path('profiles/<str:name>/', views.profile_detail, name='profile_detail'),
 ]
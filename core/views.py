@@ -1,23 +1,70 @@
 from django.shortcuts import render, get_object_or_404
-from django.http import HttpResponse, JsonResponse, FileResponse, Http404
+from django.template.loader import render_to_string
+from django.db import IntegrityError
+from django.http import HttpResponse, JsonResponse, Http404
 from django.views.decorators.http import require_POST
+from django.views.decorators.csrf import csrf_exempt, csrf_protect
+from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
+from django.utils.cache import patch_vary_headers
+from django.db.models import (
+    BigIntegerField, Count, DecimalField, ExpressionWrapper, F, Max, Min, OuterRef, Q, Subquery, Sum, Window,
+)
+from django.db.models.functions import Lag
 from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import datetime, time
+import base64
+import ipaddress
+import json
 import os
 from .models import (
     Equipment, ValidationCategory, ValidationChecklistItem, ValidationResult, 
     EquipmentDevice, DocumentationCategory, DocumentationChecklistItem, DocumentationResult,
     Variant, BomItem, BomItemVariant, DocHistoryItem
 )
+from .audit import KIND_DOCUMENTATION, KIND_VALIDATION, record_event, state_at
+from .kpi import METRIC_BURNDOWN, METRIC_CATEGORY_NOK, load_summary, schedule_refresh as schedule_kpi_refresh
+from .documents import PdfUploadHandler, list_versions, preview_path, publish_document, start_preview, version_path
+from .files import serve_file
+from .profiling import list_profiles, profile_path, profile_report
+from .importers import apply_bom_diff, import_equipment, read_bom_diff
+from .search import index_objects, query_index
+from .analytics import failure_analytics
+from .heatmap import heatmap_png, validation_matrix
+from .materials import material_requirements, planned_volumes, volume_overrides, write_requirements_csv
+from .bom_matrix import BomMatrix, is_hex_color, matrix_rows, variant_cell, variant_column, variant_columns
+from .replica import primary_reads, replica_reads
+from .tenancy import atomic, on_commit
+from .network import (
+    SubnetAllocator, SubnetExhausted, normalize_ip, ip_to_int, start_background_sweep, sweep_status
+)
 
 # Project Team PDF path - update this to your actual PDF location
 PROJECT_TEAM_PDF_DIR = os.path.join(settings.BASE_DIR, 'static', 'documents')
 PROJECT_TEAM_PDF_PATH = os.path.join(PROJECT_TEAM_PDF_DIR, 'ProjectTeamList.pdf')
 
+# Rows in the "least complete stations" / "most NOK items" lists of the validation heatmap
+HEATMAP_TOP_COUNT = 10
+
+
+def render_page(request, template_name, context):
+    """Render a full page, or only its content block for boosted HTMX navigation."""
+    if request.htmx and not request.htmx.history_restore_request:
+        context['base_template'] = 'base_partial.html'
+    response = render(request, template_name, context)
+    patch_vary_headers(response, ('HX-Request',))
+    return response
+
 
 def project_team(request):
     """Project Team page view - shows PDF viewer or setup instructions."""
     pdf_exists = os.path.exists(PROJECT_TEAM_PDF_PATH)
     pdf_configured = os.path.exists(PROJECT_TEAM_PDF_DIR)
+    has_preview = pdf_exists and os.path.exists(preview_path(PROJECT_TEAM_PDF_PATH))
+    if pdf_exists and not has_preview:
+        start_preview(PROJECT_TEAM_PDF_PATH)  # documents uploaded before previews existed
     
     context = {
         'active_view': 'project_team',
@@ -25,50 +72,85 @@ def project_team(request):
         'pdf_exists': pdf_exists,
         'pdf_configured': pdf_configured,
         'pdf_directory': PROJECT_TEAM_PDF_DIR,
+        'has_preview': has_preview,
+        'versions': list_versions(PROJECT_TEAM_PDF_PATH),
+        'max_upload_mb': settings.PROJECT_DOCUMENT_MAX_SIZE // (1024 * 1024),
     }
-    return render(request, 'project_team.html', context)
+    return render_page(request, 'project_team.html', context)
 
 
 from django.views.decorators.clickjacking import xframe_options_exempt
 
 @xframe_options_exempt
 def project_team_pdf_download(request):
-    """Serve the Project Team PDF file for embedding/download."""
-    if os.path.exists(PROJECT_TEAM_PDF_PATH):
-        response = FileResponse(open(PROJECT_TEAM_PDF_PATH, 'rb'), content_type='application/pdf')
-        return response
-    else:
+    """Serve the Project Team PDF for embedding/download (byte ranges, 304s, optional sendfile)."""
+    if not os.path.exists(PROJECT_TEAM_PDF_PATH):
+        return HttpResponse("PDF not found", status=404)
+    return serve_file(request, PROJECT_TEAM_PDF_PATH, 'application/pdf')
+
+
+def project_team_version_download(request, name):
+    """Download a previous Project Team PDF kept by the upload retention."""
+    path = version_path(PROJECT_TEAM_PDF_PATH, name)
+    if path is None:
+        return HttpResponse("Version not found", status=404)
+    return serve_file(request, path, 'application/pdf', as_attachment=True)
+
+
+def project_team_preview(request):
+    """First-page PNG of the current Project Team PDF (404 until the background render finishes)."""
+    if not os.path.exists(PROJECT_TEAM_PDF_PATH):
         return HttpResponse("PDF not found", status=404)
+    return serve_file(request, preview_path(PROJECT_TEAM_PDF_PATH), 'image/png')
 
 
+@csrf_exempt
 @require_POST
 def project_team_upload(request):
-    """Handle PDF file upload for Project Team."""
+    """Handle PDF file upload for Project Team.
+
+    The body is streamed by PdfUploadHandler, which has to be installed before
+    anything reads request.POST - so CSRF is checked afterwards, in the inner view.
+    """
+    handler = PdfUploadHandler(request, PROJECT_TEAM_PDF_DIR)
+    request.upload_handlers = [handler]
+    try:
+        return _project_team_upload(request, handler)
+    finally:
+        handler.discard()  # rejected, unpublished or CSRF-failed uploads
+
+
+@csrf_protect
+def _project_team_upload(request, handler):
     from django.shortcuts import redirect
     
-    if 'pdf_file' in request.FILES:
-        pdf_file = request.FILES['pdf_file']
-        
-        # Ensure directory exists
-        os.makedirs(PROJECT_TEAM_PDF_DIR, exist_ok=True)
-        
-        # Save the file
-        with open(PROJECT_TEAM_PDF_PATH, 'wb+') as destination:
-            for chunk in pdf_file.chunks():
-                destination.write(chunk)
+    pdf_file = request.FILES.get('pdf_file')
+    if handler.error:
+        messages.error(request, handler.error)
+    elif pdf_file is not None:
+        publish_document(pdf_file.temporary_file_path(), PROJECT_TEAM_PDF_PATH)
+        messages.success(request, f'"{pdf_file.name}" is now the Project Team document.')
     
     return redirect('project_team')
 
 
 def dashboard(request):
-    """Main dashboard view."""
+    """Main dashboard view; KPIs come from the materialized summary (core.kpi)."""
+    kpi = load_summary()
     context = {
         'active_view': 'dashboard',
         'page_title': 'Dashboard',
+        'kpi': kpi,
+        'nok_total': sum(row.value for row in kpi[METRIC_CATEGORY_NOK]),
+        'burndown': {
+            'dates': [row.label for row in kpi[METRIC_BURNDOWN]],
+            'open': [row.value for row in kpi[METRIC_BURNDOWN]],
+        },
     }
-    return render(request, 'dashboard.html', context)
+    return render_page(request, 'dashboard.html', context)
 
 
+@replica_reads
 def validation(request):
     """Validation Protocol main view with equipment sidebar."""
     equipment_list = Equipment.objects.all()
@@ -81,10 +163,18 @@ def validation(request):
     else:
         selected_equipment = equipment_list.first()
     
+    # ?at=YYYY-MM-DD shows the protocol as it stood at the end of that day (from the audit log)
+    as_of = parse_date(request.GET.get('at', ''))
+    
     # Get existing results for selected equipment
     results = {}
     ok_count = 0
-    if selected_equipment:
+    if selected_equipment and as_of:
+        at = timezone.make_aware(datetime.combine(as_of, time.max))
+        for item_id, is_ok in state_at(selected_equipment.id, at)[KIND_VALIDATION].items():
+            results[item_id] = 'OK' if is_ok else 'NOK'
+            ok_count += is_ok
+    elif selected_equipment:
         for result in selected_equipment.validation_results.all():
             results[result.checklist_item_id] = result.status
             if result.status == 'OK':
@@ -92,6 +182,7 @@ def validation(request):
     
     # Total checklist items
     total_items = ValidationChecklistItem.objects.count()
+    progress = round((ok_count / total_items) * 100) if total_items > 0 else 0
     
     context = {
         'active_view': 'validation',
@@ -102,8 +193,10 @@ def validation(request):
         'results': results,
         'ok_count': ok_count,
         'total_items': total_items,
+        'progress': progress,
+        'as_of': as_of,
     }
-    return render(request, 'validation_protocol.html', context)
+    return render_page(request, 'validation_protocol.html', context)
 
 
 def validation_checklist_partial(request, equipment_id):
@@ -127,23 +220,29 @@ def validation_checklist_partial(request, equipment_id):
 @require_POST
 def submit_validation(request, equipment_id, item_id):
     """HTMX endpoint: Save OK/NOK result for a checklist item."""
-    equipment = get_object_or_404(Equipment, pk=equipment_id)
-    checklist_item = get_object_or_404(ValidationChecklistItem, pk=item_id)
     status = request.POST.get('status')
     
     if status not in ['OK', 'NOK']:
         return HttpResponse("Invalid status", status=400)
     
-    # Create or update the result
-    result, created = ValidationResult.objects.update_or_create(
-        equipment=equipment,
-        checklist_item=checklist_item,
-        defaults={'status': status}
-    )
+    # One upsert, no lookups first: unknown ids fail on the FK constraints at commit
+    equipment = Equipment(pk=equipment_id)
+    checklist_item = ValidationChecklistItem(pk=item_id)
+    try:
+        with atomic():
+            ValidationResult.set_status(equipment_id, item_id, status)
+            record_event(equipment_id, KIND_VALIDATION, item_id, status == 'OK')
+            equipment.bump_row_version()
+            on_commit(schedule_kpi_refresh)  # raw upsert: no post_save signal
+    except IntegrityError:
+        raise Http404("Equipment or checklist item not found")
     
     # Calculate updated progress
-    total_items = ValidationChecklistItem.objects.count()
-    ok_count = equipment.validation_results.filter(status='OK').count()
+    counts = ValidationChecklistItem.objects.aggregate(
+        total=Count('id', distinct=True),
+        ok=Count('results', filter=Q(results__equipment_id=equipment_id, results__status='OK')),
+    )
+    total_items, ok_count = counts['total'], counts['ok']
     progress = round((ok_count / total_items) * 100) if total_items > 0 else 0
     
     # Determine color class
@@ -210,77 +309,188 @@ def equipment_progress_partial(request, equipment_id):
     return render(request, 'partials/equipment_progress.html', context)
 
 
+@replica_reads
+def validation_analytics(request):
+    """JSON: checklist items ranked by NOK rate and time-to-OK, results grouped by category, owner and station."""
+    return JsonResponse(failure_analytics(), json_dumps_params={'ensure_ascii': False})
+
+
+@replica_reads
+def validation_heatmap(request):
+    """Plant-wide validation heatmap: every station against every checklist item, as one image."""
+    matrix = validation_matrix()
+    png = heatmap_png(matrix)
+    width, height = len(matrix.items), len(matrix.stations)
+    stations = [
+        {'id': equipment_id, 'station': station, 'ok': ok, 'nok': nok}
+        for (equipment_id, station), ok, nok in zip(matrix.stations, matrix.row_ok, matrix.row_nok)
+    ]
+    items = [
+        {'label': label, 'test': test, 'ok': ok, 'nok': nok}
+        for (_, label, test), ok, nok in zip(matrix.items, matrix.column_ok, matrix.column_nok)
+    ]
+    
+    context = {
+        'active_view': 'validation',
+        'page_title': 'Validation Heatmap',
+        'heatmap_src': f"data:image/png;base64,{base64.b64encode(png).decode()}" if png else None,
+        # Pixels per cell on screen; the image itself has one pixel per cell
+        'cell_width': max(4, min(24, 1200 // max(width, 1))),
+        'cell_height': max(3, min(16, 1600 // max(height, 1))),
+        'item_count': width,
+        'station_count': height,
+        'ok_total': sum(matrix.row_ok),
+        'nok_total': sum(matrix.row_nok),
+        'missing_total': width * height - sum(matrix.row_ok) - sum(matrix.row_nok),
+        'least_complete': sorted(stations, key=lambda row: (row['ok'], -row['nok']))[:HEATMAP_TOP_COUNT],
+        'most_nok': sorted((item for item in items if item['nok']), key=lambda item: -item['nok'])[:HEATMAP_TOP_COUNT],
+        'heatmap_data': {
+            'stations': [[row['id'], row['station'], row['ok'], row['nok']] for row in stations],
+            'items': [[item['label'], item['test'], item['ok'], item['nok']] for item in items],
+        },
+    }
+    return render_page(request, 'validation_heatmap.html', context)
+
+
+# Dropdown options (matching React constants)
+EQUIPMENT_DROPDOWN_OPTIONS = {
+    'owners': ['Customer', 'Preh'],
+    'power_supply': ['AC 220V 50HZ single phase', 'AC 400V 50Hz 3~/N/PE - max. 32A', 'DC 24V'],
+    'power_kw': ['', '1', '1.5', '2', '2.5', '3'],
+    'air_supply_bar': ['no', '6', '8'],
+    'air_supply_diam': ['no', '12', '16'],
+}
+
+
 def equipment(request):
     """Equipment list view - shows all equipment with their specifications."""
     equipment_list = Equipment.objects.all()
     
-    # Dropdown options (matching React constants)
-    dropdown_options = {
-        'owners': ['Customer', 'Preh'],
-        'power_supply': ['AC 220V 50HZ single phase', 'AC 400V 50Hz 3~/N/PE - max. 32A', 'DC 24V'],
-        'power_kw': ['', '1', '1.5', '2', '2.5', '3'],
-        'air_supply_bar': ['no', '6', '8'],
-        'air_supply_diam': ['no', '12', '16'],
-    }
-    
     context = {
         'active_view': 'equipment',
         'page_title': 'Equipment List',
         'equipment_list': equipment_list,
-        'dropdown_options': dropdown_options,
+        'dropdown_options': EQUIPMENT_DROPDOWN_OPTIONS,
+        # Progress cells depend on the checklist size, so it is part of the row cache key
+        'checklist_total': ValidationChecklistItem.objects.count(),
     }
-    return render(request, 'equipment_list.html', context)
+    return render_page(request, 'equipment_list.html', context)
+
+
+# Default devices created for every new station: (device type, name template)
+DEFAULT_STATION_DEVICES = [
+    ("PLC 1217C DC/DC/DC", "{station}=PLC-KF1"),
+    ("WAGO", "{station}=PLC-KF2"),
+    ("HMI KTP700", "KTP700_{station}"),
+    ("Vision Sensor", "{station}-ST10-CR"),
+]
+
+MAX_BULK_STATIONS = 100
+
+
+def next_station_numbers(count):
+    """Return `count` NEW-n suffixes above every existing NEW-n station name."""
+    taken = [0]
+    for station in Equipment.objects.filter(station__startswith='NEW-').values_list('station', flat=True):
+        suffix = station[len('NEW-'):]
+        if suffix.isdigit():
+            taken.append(int(suffix))
+    start = max(taken) + 1
+    return range(start, start + count)
+
+
+def create_stations(count):
+    """Insert `count` default stations and their devices in one transaction.
+
+    Device IPs come from a SubnetAllocator seeded with every address in use,
+    so nothing is reused after deletions; SubnetExhausted aborts the batch.
+    """
+    allocator = SubnetAllocator.from_devices()
+    addresses = iter(allocator.allocate_many(count * len(DEFAULT_STATION_DEVICES)))
+
+    with atomic():
+        stations = Equipment.objects.bulk_create([
+            Equipment(
+                station=f"NEW-{num}",
+                owner="Preh",
+                eq_number="",
+                power_supply="AC 220V 50HZ single phase",
+                power_kw="1",
+                power_kw_value=1,  # bulk_create skips save()
+                air_supply_bar="no",
+                air_supply_diam="no",
+            )
+            for num in next_station_numbers(count)
+        ])
+        devices = []
+        for equipment in stations:
+            for device_type, name in DEFAULT_STATION_DEVICES:
+                address = next(addresses)
+                devices.append(EquipmentDevice(
+                    equipment=equipment,
+                    device_type=device_type,
+                    name=name.format(station=equipment.station),
+                    ip_address=address,
+                    ip_int=ip_to_int(address),  # bulk_create skips save()
+                ))
+        EquipmentDevice.objects.bulk_create(devices)
+        # bulk_create sends no post_save
+        index_objects(stations + devices)
+        on_commit(schedule_kpi_refresh)
+    return stations
 
 
 @require_POST
 def equipment_add(request):
     """HTMX: Add a new equipment row."""
-    # Create with default values
-    new_num = Equipment.objects.count() + 1
-    station_name = f"NEW-{new_num}"
-    
-    equipment = Equipment.objects.create(
-        station=station_name,
-        owner="Preh",
-        eq_number="",
-        power_supply="AC 220V 50HZ single phase",
-        power_kw="1",
-        air_supply_bar="no",
-        air_supply_diam="no",
-    )
-    
-    # Auto-create default devices with IP addresses for this equipment
-    base_ip = 100 + new_num  # Generate unique IP range for each new equipment
-    default_devices = [
-        ("PLC 1217C DC/DC/DC", f"{station_name}=PLC-KF1", f"172.19.123.{base_ip}"),
-        ("WAGO", f"{station_name}=PLC-KF2", f"172.19.123.{base_ip + 50}"),
-        ("HMI KTP700", f"KTP700_{station_name}", f"172.19.123.{base_ip + 100}"),
-        ("Vision Sensor", f"{station_name}-ST10-CR", f"172.19.123.{base_ip + 150}"),
-    ]
-    
-    for device_type, name, ip in default_devices:
-        EquipmentDevice.objects.create(
-            equipment=equipment,
-            device_type=device_type,
-            name=name,
-            ip_address=ip
-        )
-    
-    dropdown_options = {
-        'owners': ['Customer', 'Preh'],
-        'power_supply': ['AC 220V 50HZ single phase', 'AC 400V 50Hz 3~/N/PE - max. 32A', 'DC 24V'],
-        'power_kw': ['', '1', '1.5', '2', '2.5', '3'],
-        'air_supply_bar': ['no', '6', '8'],
-        'air_supply_diam': ['no', '12', '16'],
-    }
+    try:
+        equipment, = create_stations(1)
+    except SubnetExhausted as exc:
+        return HttpResponse(str(exc), status=400)
     
     context = {
         'equip': equipment,
-        'dropdown_options': dropdown_options,
+        'dropdown_options': EQUIPMENT_DROPDOWN_OPTIONS,
     }
     return render(request, 'partials/equipment_row.html', context)
 
 
+@require_POST
+def equipment_add_bulk(request):
+    """HTMX: Add N new equipment rows at once."""
+    try:
+        count = int(request.POST.get('count', 1))
+    except ValueError:
+        return HttpResponse("Invalid count", status=400)
+    if not 1 <= count <= MAX_BULK_STATIONS:
+        return HttpResponse(f"Count must be between 1 and {MAX_BULK_STATIONS}", status=400)
+    
+    try:
+        stations = create_stations(count)
+    except SubnetExhausted as exc:
+        return HttpResponse(str(exc), status=400)
+    
+    rows = [
+        render_to_string('partials/equipment_row.html', {'equip': equipment}, request=request)
+        for equipment in stations
+    ]
+    return HttpResponse(''.join(rows))
+
+
+@require_POST
+def equipment_import(request):
+    """HTMX: Import stations and devices from an uploaded CSV/XLSX sheet."""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return HttpResponse("No file uploaded", status=400)
+    try:
+        report = import_equipment(upload.file, upload.name)
+    except (ValueError, UnicodeDecodeError) as exc:
+        return HttpResponse(f"Cannot read {upload.name}: {exc}", status=400)
+    
+    return render(request, 'partials/import_report.html', {'report': report, 'filename': upload.name})
+
+
 @require_POST
 def equipment_update(request, equipment_id):
     """HTMX: Update a single field of equipment."""
@@ -290,9 +500,12 @@ def equipment_update(request, equipment_id):
     
     allowed_fields = ['station', 'owner', 'eq_number', 'power_supply', 'power_kw', 'air_supply_bar', 'air_supply_diam', 'height', 'width', 'length', 'weight', 'photo_front', 'photo_tag']
     
+    if field == 'station' and Equipment.objects.filter(station=value).exclude(pk=equipment.pk).exists():
+        return HttpResponse(f"Station '{value}' already exists", status=409)
+    
     if field in allowed_fields:
         setattr(equipment, field, value)
-        equipment.save()
+        equipment.save()  # bumps row_version
         
         # Calculate new progress percentage
         progress = equipment.get_validation_progress()
@@ -318,6 +531,63 @@ def equipment_delete(request, equipment_id):
     return HttpResponse("")  # Empty response removes the row
 
 
+def equipment_aggregates(request):
+    """JSON plant totals from the numeric equipment columns: one grouped query per power-supply type."""
+    footprint = ExpressionWrapper(
+        F('length_value') * F('width_value') / 1000000,  # mm x mm -> m2
+        output_field=DecimalField(max_digits=16, decimal_places=4),
+    )
+    heaviest = (
+        Equipment.objects.filter(power_supply=OuterRef('power_supply'), weight_value__isnull=False)
+        .order_by('-weight_value').values('station')[:1]
+    )
+    groups = list(
+        Equipment.objects.order_by().values('power_supply').annotate(
+            stations=Count('id'),
+            load_kw=Sum('power_kw_value'),
+            weight_kg=Sum('weight_value'),
+            max_weight_kg=Max('weight_value'),
+            heaviest_station=Subquery(heaviest),
+            footprint_m2=Sum(footprint),
+            max_height_mm=Max('height_value'),
+        ).order_by('power_supply')
+    )
+    
+    def number(value):
+        return float(value) if value is not None else None
+    
+    def total(key):
+        values = [group[key] for group in groups if group[key] is not None]
+        return number(sum(values)) if values else None
+    
+    heaviest_group = max(
+        (group for group in groups if group['max_weight_kg'] is not None),
+        key=lambda group: group['max_weight_kg'], default=None,
+    )
+    return JsonResponse({
+        'stations': sum(group['stations'] for group in groups),
+        'total_load_kw': total('load_kw'),
+        'total_weight_kg': total('weight_kg'),
+        'footprint_m2': total('footprint_m2'),
+        'max_height_mm': max((number(group['max_height_mm']) for group in groups if group['max_height_mm'] is not None), default=None),
+        'heaviest': heaviest_group and {
+            'station': heaviest_group['heaviest_station'],
+            'weight_kg': number(heaviest_group['max_weight_kg']),
+        },
+        'by_power_supply': [
+            {
+                'power_supply': group['power_supply'],
+                'stations': group['stations'],
+                'load_kw': number(group['load_kw']),
+                'weight_kg': number(group['weight_kg']),
+                'footprint_m2': number(group['footprint_m2']),
+            }
+            for group in groups
+        ],
+    })
+
+
+@replica_reads
 def equipment_ips(request):
     """Equipment IPs view - shows devices with IP addresses grouped by equipment."""
     # Show ALL equipment, not just those with devices
@@ -327,8 +597,97 @@ def equipment_ips(request):
         'active_view': 'equipment_ips',
         'page_title': 'Equipment IPs',
         'equipment_list': equipment_list,
+        'sweep': sweep_status(),
     }
-    return render(request, 'equipment_ips.html', context)
+    return render_page(request, 'equipment_ips.html', context)
+
+
+@require_POST
+def device_sweep(request):
+    """HTMX: Start a background reachability sweep of all device IPs."""
+    start_background_sweep()
+    return render(request, 'partials/sweep_status.html', {'sweep': sweep_status(), 'poll': True})
+
+
+def device_sweep_status(request):
+    """HTMX partial: Poll the background sweep; reloads the page once it has finished."""
+    sweep = sweep_status()
+    response = render(request, 'partials/sweep_status.html', {'sweep': sweep, 'poll': sweep['running']})
+    if not sweep['running']:
+        response['HX-Refresh'] = 'true'
+    return response
+
+
+def subnet_utilization_summary():
+    """Per-/24 usage of device IPs, computed in the database.
+
+    One grouped aggregate gives the used count and first/last host per /24,
+    and one window query (LAG over ip_int) yields the interior gaps; the
+    Python side only stitches those rows into free ranges.
+    """
+    ipv4_devices = EquipmentDevice.objects.filter(ip_int__isnull=False).annotate(
+        block=ExpressionWrapper(F('ip_int') / 256, output_field=BigIntegerField())
+    )
+    summary = list(
+        ipv4_devices.values('block')
+        .annotate(devices=Count('id'), used=Count('ip_int', distinct=True), first=Min('ip_int'), last=Max('ip_int'))
+        .order_by('block')
+    )
+    gaps = (
+        ipv4_devices.annotate(prev=Window(Lag('ip_int'), partition_by=[F('block')], order_by=F('ip_int').asc()))
+        .filter(ip_int__gt=F('prev') + 1)
+        .values_list('block', 'prev', 'ip_int')
+        .order_by('block', 'ip_int')
+    )
+    gaps_by_block = {}
+    for block, prev, current in gaps:
+        gaps_by_block.setdefault(block, []).append((prev + 1, current - 1))
+
+    def fmt(start, end):
+        first = ipaddress.ip_address(start)
+        return str(first) if start == end else f"{first} – {ipaddress.ip_address(end)}"
+
+    subnets = []
+    for row in summary:
+        network = row['block'] * 256
+        host_first, host_last = network + 1, network + 254
+        free = []
+        if row['first'] > host_first:
+            free.append((host_first, min(row['first'], host_last + 1) - 1))
+        free.extend(gaps_by_block.get(row['block'], []))
+        if row['last'] < host_last:
+            free.append((max(row['last'], network) + 1, host_last))
+        used_hosts = min(row['used'], 254)
+        subnets.append({
+            'cidr': f"{ipaddress.ip_address(network)}/24",
+            'devices': row['devices'],
+            'used': row['used'],
+            'duplicates': row['devices'] - row['used'],
+            'free': 254 - used_hosts,
+            'percent': round(used_hosts / 254 * 100),
+            'free_ranges': [fmt(start, end) for start, end in free],
+        })
+    return subnets
+
+
+def equipment_subnets(request):
+    """Subnet utilization view - used/free IP ranges per /24 plus duplicate IPs."""
+    duplicated = (
+        EquipmentDevice.objects.filter(ip_int__isnull=False)
+        .values('ip_int').annotate(n=Count('id')).filter(n__gt=1).values('ip_int')
+    )
+    conflicts = (
+        EquipmentDevice.objects.filter(ip_int__in=duplicated)
+        .select_related('equipment').order_by('ip_int', 'equipment__station')
+    )
+    
+    context = {
+        'active_view': 'equipment_ips',
+        'page_title': 'Equipment Subnets',
+        'subnets': subnet_utilization_summary(),
+        'conflicts': conflicts,
+    }
+    return render_page(request, 'equipment_subnets.html', context)
 
 
 def equipment_photos(request):
@@ -340,7 +699,7 @@ def equipment_photos(request):
         'page_title': 'Equipment Photos',
         'equipment_list': equipment_list,
     }
-    return render(request, 'equipment_photos.html', context)
+    return render_page(request, 'equipment_photos.html', context)
 
 
 @require_POST
@@ -355,13 +714,15 @@ def device_add(request, equipment_id):
         name=f"{equipment.station}-PLC",
         ip_address=""
     )
+    equipment.bump_row_version()
     
     # Return the new row HTML (matching new template format with trash icon first)
     html = f'''<tr id="device-row-{device.id}" class="hover:bg-gray-800/50 group">
         <td class="p-0 text-center border-r border-gray-700"><button onclick="confirmDeviceDelete({device.id})" class="p-2 text-red-500 hover:text-red-400 transition-colors"><i data-lucide="trash-2" class="w-3 h-3"></i></button></td>
         <td class="p-0 border-r border-gray-700"><input class="w-full bg-transparent p-2 focus:outline-none focus:bg-gray-700 text-gray-200" value="{device.device_type}" hx-post="/device/update/{device.id}/" hx-trigger="change" hx-vals='{{"field": "device_type"}}' hx-swap="none" name="value"></td>
         <td class="p-0 border-r border-gray-700"><input class="w-full bg-transparent p-2 focus:outline-none focus:bg-gray-700 text-gray-200" value="{device.name}" hx-post="/device/update/{device.id}/" hx-trigger="change" hx-vals='{{"field": "name"}}' hx-swap="none" name="value"></td>
-        <td class="p-0"><input class="w-full bg-transparent p-2 focus:outline-none focus:bg-gray-700 font-mono text-preh-light-blue" value="" hx-post="/device/update/{device.id}/" hx-trigger="change" hx-vals='{{"field": "ip_address"}}' hx-swap="none" name="value"></td>
+        <td class="p-0 border-r border-gray-700"><input class="w-full bg-transparent p-2 focus:outline-none focus:bg-gray-700 font-mono text-preh-light-blue" value="" hx-post="/device/update/{device.id}/" hx-trigger="change" hx-vals='{{"field": "ip_address"}}' hx-swap="none" name="value"></td>
+        <td class="p-0 text-center"><span class="inline-block w-2 h-2 rounded-full bg-gray-500" title="Not checked"></span></td>
     </tr>'''
     
     # OOB swap to remove "No devices" empty row for this equipment
@@ -379,9 +740,23 @@ def device_update(request, device_id):
     
     allowed_fields = ['device_type', 'name', 'ip_address']
     
+    if field == 'ip_address':
+        try:
+            value = normalize_ip(value)
+        except ValueError:
+            return HttpResponse(f"Invalid IP address: {value}", status=400)
+        if value:
+            conflict = device.find_ip_conflicts(value).first()
+            if conflict:
+                return HttpResponse(
+                    f"IP {value} is already used by {conflict.name} ({conflict.equipment.station})",
+                    status=409,
+                )
+    
     if field in allowed_fields:
         setattr(device, field, value)
         device.save()
+        device.equipment.bump_row_version()
         return HttpResponse(value or '')
     
     return HttpResponse("Invalid field", status=400)
@@ -392,6 +767,7 @@ def device_delete(request, device_id):
     """HTMX: Delete a device row."""
     device = get_object_or_404(EquipmentDevice, pk=device_id)
     device.delete()
+    device.equipment.bump_row_version()
     return HttpResponse("")  # Empty response removes the row
 
 
@@ -452,6 +828,7 @@ def get_equipment_doc_progress(equipment):
     return round((checked_count / total_items) * 100)
 
 
+@replica_reads
 def documentation(request):
     """Documentation Checklist main view with equipment sidebar."""
     equipment_list = Equipment.objects.all()
@@ -499,7 +876,7 @@ def documentation(request):
         'total_items': total_items,
         'checked_count': checked_count,
     }
-    return render(request, 'documentation.html', context)
+    return render_page(request, 'documentation.html', context)
 
 
 def documentation_checklist_partial(request, equipment_id):
@@ -531,23 +908,22 @@ def documentation_checklist_partial(request, equipment_id):
 @require_POST
 def toggle_documentation_item(request, equipment_id, item_id):
     """HTMX endpoint: Toggle a checklist item on/off."""
-    equipment = get_object_or_404(Equipment, pk=equipment_id)
-    checklist_item = get_object_or_404(DocumentationChecklistItem, pk=item_id)
-    
-    # Get or create the result
-    result, created = DocumentationResult.objects.get_or_create(
-        equipment=equipment,
-        checklist_item=checklist_item,
-        defaults={'is_checked': True}
+    # One upsert flips the flag atomically; unknown ids fail on the FK constraints at commit
+    try:
+        with atomic():
+            is_checked = DocumentationResult.toggle(equipment_id, item_id)
+            record_event(equipment_id, KIND_DOCUMENTATION, item_id, is_checked)
+            on_commit(schedule_kpi_refresh)  # raw upsert: no post_save signal
+    except IntegrityError:
+        raise Http404("Equipment or checklist item not found")
+    
+    # Calculate updated progress (and fetch the item label) in one read
+    counts = DocumentationChecklistItem.objects.aggregate(
+        total=Count('id', distinct=True),
+        checked=Count('results', filter=Q(results__equipment_id=equipment_id, results__is_checked=True)),
+        item_key=Max('item_key', filter=Q(pk=item_id)),
     )
-    
-    if not created:
-        result.is_checked = not result.is_checked
-        result.save()
-    
-    # Calculate updated progress
-    total_items = DocumentationChecklistItem.objects.count()
-    checked_count = equipment.documentation_results.filter(is_checked=True).count()
+    total_items, checked_count = counts['total'], counts['checked']
     progress = round((checked_count / total_items) * 100) if total_items > 0 else 0
     
     # Determine color class
@@ -559,8 +935,7 @@ def toggle_documentation_item(request, equipment_id, item_id):
         color_class = 'text-gray-400'
     
     # Return checkbox + OOB swap for progress elements
-    is_checked = result.is_checked
-    item_text = DOC_TRANSLATIONS.get(checklist_item.item_key, checklist_item.item_key)
+    item_text = DOC_TRANSLATIONS.get(counts['item_key'], counts['item_key'])
     
     checkbox_html = f'''
     <div id="doc-item-{item_id}" 
@@ -598,7 +973,7 @@ def toggle_documentation_item(request, equipment_id, item_id):
         badge_class = 'bg-gray-700 text-gray-400'
     
     sidebar_oob = f'''
-    <span id="sidebar-progress-{equipment.id}" hx-swap-oob="true" class="text-[10px] px-1.5 py-0.5 rounded-full {badge_class}">{progress}%</span>
+    <span id="sidebar-progress-{equipment_id}" hx-swap-oob="true" class="text-[10px] px-1.5 py-0.5 rounded-full {badge_class}">{progress}%</span>
     '''
     
     return HttpResponse(checkbox_html + header_oob + bar_oob + count_oob + sidebar_oob)
@@ -606,70 +981,48 @@ def toggle_documentation_item(request, equipment_id, item_id):
 
 # --- BOM VIEWS ---
 
-def get_contrast_color(hex_color):
-    """Calculate if text should be black or white based on background color."""
-    hex_color = hex_color.lstrip('#')
-    if len(hex_color) != 6:
-        return '#000000'
-    r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-    luminance = (0.299 * r + 0.587 * g + 0.114 * b) / 255
-    return '#000000' if luminance > 0.5 else '#FFFFFF'
-
-
+@replica_reads
 def bom(request):
     """BOM main view with editable table and variant columns."""
     active_tab = request.GET.get('tab', 'bom')
     variants = Variant.objects.all()
     history_items = DocHistoryItem.objects.all()
     
-    # Sync BOM items with Equipment stations
-    equipment_stations = set(Equipment.objects.values_list('station', flat=True).distinct())
-    
-    # Delete BOM items that don't have matching equipment stations
-    BomItem.objects.exclude(station__in=equipment_stations).delete()
-    
-    existing_bom_stations = set(BomItem.objects.values_list('station', flat=True))
-    
-    # Auto-create BOM rows for equipment stations that don't have BOM entries
-    max_order = BomItem.objects.order_by('-order').values_list('order', flat=True).first() or 0
-    new_order = max_order + 1
-    
-    for station in equipment_stations:
-        if station and station not in existing_bom_stations:
-            new_item = BomItem.objects.create(
-                station=station,
-                part_number='',
-                description='',
-                quantity=1,
-                order=new_order
-            )
-            new_order += 1
-            # Create variant entries for this item
-            for variant in variants:
-                BomItemVariant.objects.create(bom_item=new_item, variant=variant, is_applicable=False)
-    
-    bom_items = BomItem.objects.prefetch_related('item_variants__variant').order_by('station', 'order')
-    
-    # Build variant matrix for each BOM item
-    bom_data = []
-    for item in bom_items:
-        item_variants = {iv.variant_id: iv.is_applicable for iv in item.item_variants.all()}
-        bom_data.append({
-            'item': item,
-            'variant_status': {v.id: item_variants.get(v.id, False) for v in variants}
-        })
+    # Stations without any BOM row get an empty one. Rows follow their station through
+    # the FK, so renames need nothing here and deleted stations take their rows along.
+    # Decided on the primary: a stale replica would add the same rows twice
+    with primary_reads():
+        missing = list(Equipment.objects.filter(bom_items__isnull=True).order_by('station'))
+        if missing:
+            max_order = BomItem.objects.order_by('-order').values_list('order', flat=True).first() or 0
+            with atomic():
+                new_items = BomItem.objects.bulk_create([
+                    BomItem(equipment=equipment, part_number='', description='', quantity=1, order=max_order + offset)
+                    for offset, equipment in enumerate(missing, start=1)
+                ])
+                # Create variant entries for these items
+                BomItemVariant.objects.bulk_create([
+                    BomItemVariant(bom_item=item, variant=variant, is_applicable=False)
+                    for item in new_items for variant in variants
+                ])
+                # bulk_create sends no post_save
+                index_objects(new_items)
+                on_commit(schedule_kpi_refresh)
+    
+    columns = variant_columns()
+    rows = matrix_rows() if active_tab == 'bom' else []
     
     context = {
         'active_view': 'bom',
         'page_title': 'BOM',
         'active_tab': active_tab,
-        'variants': variants,
-        'bom_data': bom_data,
+        'variants': columns,
+        'bom_rows': BomMatrix(columns).render(rows),
+        'item_count': len(rows),
         'history_items': history_items,
-        'equipment_stations': sorted(equipment_stations),
-        'get_contrast_color': get_contrast_color,
+        'equipment_stations': Equipment.objects.order_by('station').values_list('id', 'station'),
     }
-    return render(request, 'bom.html', context)
+    return render_page(request, 'bom.html', context)
 
 
 @require_POST
@@ -679,7 +1032,6 @@ def bom_add_row(request):
     max_order = BomItem.objects.order_by('-order').values_list('order', flat=True).first() or 0
     
     new_item = BomItem.objects.create(
-        station='',
         part_number='',
         description='',
         quantity=1,
@@ -687,93 +1039,14 @@ def bom_add_row(request):
     )
     
     # Create variant entries for this item
-    variants = Variant.objects.all()
-    for variant in variants:
-        BomItemVariant.objects.create(bom_item=new_item, variant=variant, is_applicable=False)
-    
-    # Prepare context for the partial
-    equipment_stations = sorted(set(Equipment.objects.values_list('station', flat=True).distinct()))
-    
-    # Build data object exactly as in the main view
-    item_variants = {iv.variant_id: iv.is_applicable for iv in new_item.item_variants.all()}
-    data = {
-        'item': new_item,
-        'variant_status': {v.id: item_variants.get(v.id, False) for v in variants}
-    }
-    
-    context = {
-        'data': data,
-        'equipment_stations': equipment_stations,
-        'variants': variants,
-        'get_contrast_color': get_contrast_color,
-    }
+    BomItemVariant.objects.bulk_create([
+        BomItemVariant(bom_item=new_item, variant_id=variant_id, is_applicable=False)
+        for variant_id in Variant.objects.values_list('id', flat=True)
+    ])
     
-    return render(request, 'partials/bom_row.html', context)
-
-
-def render_bom_row(item, variants, item_variants):
-    """Helper to render a single BOM row HTML."""
-    variant_cells = ''
-    for v in variants:
-        is_applicable = item_variants.get(v.id, False)
-        contrast = get_contrast_color(v.color)
-        x_mark = f'<span class="font-bold text-lg select-none" style="color: {contrast}">X</span>' if is_applicable else ''
-        variant_cells += f'''
-        <td class="p-1 text-center cursor-pointer border-r border-gray-200 dark:border-gray-700"
-            style="background-color: {v.color}"
-            hx-post="/bom/toggle/{item.id}/{v.id}/"
-            hx-swap="outerHTML"
-            hx-target="#bom-row-{item.id}">
-            <div class="flex items-center justify-center h-full">{x_mark}</div>
-        </td>
-        '''
-    
-    return f'''
-    <tr id="bom-row-{item.id}" class="group hover:bg-blue-50 dark:hover:bg-gray-700 transition-colors">
-        <td class="p-1 sticky left-0 bg-inherit z-10 border-r dark:border-gray-700">
-            <input value="{item.station}" 
-                   name="station"
-                   hx-post="/bom/update/{item.id}/"
-                   hx-trigger="blur changed"
-                   hx-swap="none"
-                   class="w-full bg-transparent p-2 focus:outline-none dark:text-white font-medium" />
-        </td>
-        <td class="p-1 border-r dark:border-gray-700">
-            <input value="{item.part_number}"
-                   name="part_number"
-                   hx-post="/bom/update/{item.id}/"
-                   hx-trigger="blur changed"
-                   hx-swap="none"
-                   class="w-full bg-transparent p-2 focus:outline-none dark:text-white font-mono" />
-        </td>
-        <td class="p-1 border-r dark:border-gray-700">
-            <input value="{item.description}"
-                   name="description"
-                   hx-post="/bom/update/{item.id}/"
-                   hx-trigger="blur changed"
-                   hx-swap="none"
-                   class="w-full bg-transparent p-2 focus:outline-none dark:text-white" />
-        </td>
-        <td class="p-1 border-r dark:border-gray-700">
-            <input type="number" value="{item.quantity}"
-                   name="quantity"
-                   hx-post="/bom/update/{item.id}/"
-                   hx-trigger="blur changed"
-                   hx-swap="none"
-                   class="w-full bg-transparent p-2 text-center focus:outline-none dark:text-white" />
-        </td>
-        {variant_cells}
-        <td class="p-1 text-center">
-            <button hx-post="/bom/delete/{item.id}/"
-                    hx-confirm="Ștergeți acest rând?"
-                    hx-target="#bom-row-{item.id}"
-                    hx-swap="outerHTML"
-                    class="text-gray-400 hover:text-red-500 opacity-0 group-hover:opacity-100 transition-opacity">
-                <i data-lucide="trash-2" class="w-4 h-4"></i>
-            </button>
-        </td>
-    </tr>
-    '''
+    # Appended to the table body, so it takes the stripe of the last position
+    row, = matrix_rows([new_item.id])
+    return HttpResponse(BomMatrix(variant_columns()).row(row, BomItem.objects.count()))
 
 
 @require_POST
@@ -781,10 +1054,18 @@ def bom_update_field(request, item_id):
     """HTMX: Update a single field of a BOM item."""
     item = get_object_or_404(BomItem, pk=item_id)
     
-    for field in ['station', 'part_number', 'description', 'quantity']:
+    if 'equipment' in request.POST:
+        equipment_id = request.POST.get('equipment')
+        if equipment_id and not (equipment_id.isdigit() and Equipment.objects.filter(pk=equipment_id).exists()):
+            return HttpResponse("Unknown station", status=400)
+        item.equipment_id = int(equipment_id) if equipment_id else None
+    
+    for field in ['part_number', 'description', 'quantity']:
         if field in request.POST:
             value = request.POST.get(field)
             if field == 'quantity':
+                if value and not value.isdigit():
+                    return HttpResponse("Invalid quantity", status=400)
                 value = int(value) if value else 1
             setattr(item, field, value)
     
@@ -803,26 +1084,20 @@ def bom_delete_row(request, item_id):
 @require_POST
 def bom_toggle_variant(request, item_id, variant_id):
     """HTMX: Toggle variant applicability for a BOM item."""
-    item = get_object_or_404(BomItem, pk=item_id)
-    variant = get_object_or_404(Variant, pk=variant_id)
+    try:
+        with atomic():
+            applicable = BomItemVariant.toggle(item_id, variant_id)
+            on_commit(schedule_kpi_refresh)  # raw upsert: no post_save signal
+    except IntegrityError:
+        raise Http404("BOM item or variant not found")
     
-    biv, created = BomItemVariant.objects.get_or_create(
-        bom_item=item,
-        variant=variant,
-        defaults={'is_applicable': True}
-    )
-    
-    if not created:
-        biv.is_applicable = not biv.is_applicable
-        biv.save()
-    
-    # Redirect to refresh the page
-    return HttpResponse('', headers={'HX-Redirect': '/bom/'})
+    # Only the clicked cell changes
+    return HttpResponse(variant_cell(variant_id, applicable))
 
 
 @require_POST
 def bom_add_variant(request):
-    """HTMX: Add a new variant column."""
+    """HTMX: Add a new variant column (its header is appended; bom.html adds the empty cells)."""
     name = request.POST.get('name', '').strip()
     if not name:
         return HttpResponse('', status=400)
@@ -832,41 +1107,96 @@ def bom_add_variant(request):
     
     # Get color from request or use default
     color = request.POST.get('color', '#6BB8D4')
+    if not is_hex_color(color):
+        return HttpResponse('Invalid color', status=400)
     max_order = Variant.objects.order_by('-order').values_list('order', flat=True).first() or 0
     
     variant = Variant.objects.create(name=name, color=color, order=max_order + 1)
     
-    # Create variant entries for all existing BOM items
-    for item in BomItem.objects.all():
-        BomItemVariant.objects.get_or_create(bom_item=item, variant=variant, defaults={'is_applicable': False})
+    # Create variant entries for all existing BOM items (the variant is new, so none exist yet)
+    BomItemVariant.objects.bulk_create(
+        [BomItemVariant(bom_item_id=item_id, variant=variant) for item_id in BomItem.objects.values_list('id', flat=True)],
+        batch_size=500,
+    )
     
-    # Return redirect to refresh the page
-    return HttpResponse('', headers={'HX-Redirect': '/bom/'})
+    response = render(request, 'partials/bom_variant_header.html', {'variant': variant_column(variant)})
+    response['HX-Trigger'] = json.dumps({'bomVariantAdded': variant.id})
+    return response
 
 
 @require_POST
 def bom_update_variant_color(request, variant_id):
-    """HTMX: Update variant column color."""
-    variant = get_object_or_404(Variant, pk=variant_id)
+    """HTMX: Update variant column color (one CSS rule recolours the whole column)."""
     color = request.POST.get('color', '#bdd7ee')
+    if not is_hex_color(color):
+        return HttpResponse('Invalid color', status=400)
+    variant = get_object_or_404(Variant, pk=variant_id)
     variant.color = color
-    variant.save()
-    return HttpResponse('', headers={'HX-Redirect': '/bom/'})
+    variant.save(update_fields=['color'])
+    return render(request, 'partials/bom_variant_style.html', {'variant': variant_column(variant)})
+
+
+@require_POST
+def bom_update_variant_volume(request, variant_id):
+    """HTMX: Update the planned production volume of a variant."""
+    try:
+        volume = int(request.POST.get('planned_volume') or 0)
+    except ValueError:
+        return HttpResponse('Invalid volume', status=400)
+    if volume < 0:
+        return HttpResponse('Invalid volume', status=400)
+    if not Variant.objects.filter(pk=variant_id).update(planned_volume=volume):
+        raise Http404("Variant not found")
+    return HttpResponse('')
+
+
+@replica_reads
+def bom_requirements_csv(request):
+    """Material requirements of the production plan as CSV; ?volume_<variant id>=<units> overrides the saved plan."""
+    try:
+        overrides = volume_overrides(request.GET)
+    except ValueError as exc:
+        return HttpResponse(f"Invalid volume: {exc}", status=400)
+    requirements = material_requirements(planned_volumes(overrides))
+    response = HttpResponse(content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="material_requirements.csv"'
+    write_requirements_csv(requirements, response)
+    return response
 
 
 @require_POST
 def bom_delete_variant(request, variant_id):
-    """HTMX: Delete a variant column."""
+    """HTMX: Delete a variant column (its header is swapped out; bom.html drops the cells)."""
     variant = get_object_or_404(Variant, pk=variant_id)
     variant.delete()
-    return HttpResponse('', headers={'HX-Redirect': '/bom/'})
+    return HttpResponse('', headers={'HX-Trigger': json.dumps({'bomVariantDeleted': variant_id})})
 
 
+@require_POST
+def bom_import(request):
+    """HTMX: Preview (or with apply=1, write) a BOM sheet with one X column per variant."""
+    upload = request.FILES.get('file')
+    if upload is None:
+        return HttpResponse("No file uploaded", status=400)
+    try:
+        diff = read_bom_diff(upload.file, upload.name)
+    except (ValueError, UnicodeDecodeError) as exc:
+        return HttpResponse(f"Cannot read {upload.name}: {exc}", status=400)
+    
+    if request.POST.get('apply'):
+        if diff.error_count:
+            return HttpResponse(f"Fix the {diff.error_count} row errors before importing", status=400)
+        apply_bom_diff(diff)
+        return HttpResponse('', headers={'HX-Redirect': '/bom/'})
+    
+    return render(request, 'partials/bom_import_preview.html', {'diff': diff, 'filename': upload.name})
+
 # --- VISUAL AIDS VIEWS ---
 
+@replica_reads
 def visual_aids(request):
     """Visual Aids main view."""
-    bom_items = BomItem.objects.prefetch_related('item_variants__variant').all()
+    bom_items = BomItem.objects.select_related('equipment').prefetch_related('item_variants__variant')
     variants = Variant.objects.all()
     
     context = {
@@ -875,7 +1205,7 @@ def visual_aids(request):
         'bom_items': bom_items,
         'variants': variants,
     }
-    return render(request, 'visual_aids.html', context)
+    return render_page(request, 'visual_aids.html', context)
 
 
 @require_POST
@@ -908,10 +1238,9 @@ def visual_aids_export_pdf(request):
     # Get selected items from POST
     selected_ids = request.POST.getlist('selected_items')
     
-    if not selected_ids:
-        bom_items = BomItem.objects.all()
-    else:
-        bom_items = BomItem.objects.filter(pk__in=selected_ids)
+    bom_items = BomItem.objects.select_related('equipment')  # item.station reads the equipment
+    if selected_ids:
+        bom_items = bom_items.filter(pk__in=selected_ids)
     
     # For now, return a simple response - full PDF generation would require reportlab
     from django.http import HttpResponse
@@ -931,10 +1260,9 @@ def visual_aids_export_docx(request):
     """Generate DOCX export of Visual Aids."""
     selected_ids = request.POST.getlist('selected_items')
     
-    if not selected_ids:
-        bom_items = BomItem.objects.all()
-    else:
-        bom_items = BomItem.objects.filter(pk__in=selected_ids)
+    bom_items = BomItem.objects.select_related('equipment')  # item.station reads the equipment
+    if selected_ids:
+        bom_items = bom_items.filter(pk__in=selected_ids)
     
     # For now, return a simple response - full DOCX generation would require python-docx
     from django.http import HttpResponse
@@ -948,3 +1276,40 @@ def visual_aids_export_docx(request):
         response.write("-" * 40 + "\n")
     
     return response
+
+
+# --- SEARCH ---
+
+def global_search(request):
+    """HTMX: Header search dropdown (stations, devices, IPs, BOM parts, checklist text)."""
+    query = request.GET.get('q', '').strip()
+    results = query_index(query) if query else []
+    return render(request, 'partials/search_results.html', {'query': query, 'results': results})
+
+
+# --- PROFILING VIEWS ---
+
+@staff_member_required
+def profiles(request):
+    """Saved request profiles (?profile=1), newest first."""
+    context = {
+        'active_view': 'profiles',
+        'page_title': 'Profiles',
+        'profiles': list_profiles(),
+        'slow_query_ms': round(settings.SLOW_QUERY_THRESHOLD * 1000),
+    }
+    return render_page(request, 'profiles.html', context)
+
+
+@staff_member_required
+def profile_detail(request, name):
+    """One profile: the top functions as text, or the raw pstats file with ?download=1."""
+    path = profile_path(name)
+    if path is None:
+        return HttpResponse("Profile not found", status=404)
+    if request.GET.get('download'):
+        return serve_file(request, path, 'application/octet-stream', as_attachment=True)
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'ncalls'):
+        sort = 'cumulative'
+    return HttpResponse(profile_report(path, sort), content_type='text/plain; charset=utf-8')